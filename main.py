@@ -2,7 +2,12 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from src.controllers.extraction_controller import router as extraction_router
 from src.controllers.templates_controller import router as templates_router
-from src.config import create_template_engine
+from src.controllers.jobs_controller import router as jobs_router
+from src.config import create_template_engine, peek_db_pool
+from src.services.extractors.ocr_cache import get_ocr_cache
+from src.services.cache.result_cache import get_result_cache
+from src.services.extractionExecutor import get_extraction_executor
+from src.services.jobs.runner import get_job_manager
 
 app = FastAPI(title="PDF Text Extractor API", version="1.0.0")
 
@@ -21,10 +26,16 @@ template_engine = create_template_engine()
 # Incluir routers
 app.include_router(extraction_router)
 app.include_router(templates_router) 
+app.include_router(jobs_router)
 
 def get_template_engine():
     return template_engine
 
+@app.on_event("startup")
+def resume_jobs():
+    # Re-encola los jobs que quedaron pendientes antes del reinicio
+    get_job_manager()
+
 @app.get("/")
 async def root():
     return {
@@ -37,6 +48,13 @@ async def root():
             "DELETE /api/v1/templates/{id}": "Eliminar plantilla",
             # Extracción
             "POST /api/v1/extract-text/{plantilla_id}": "Extracción con plantilla",
+            "POST /api/v1/extract-text/batch": "Varios PDFs o zip, resultado por archivo",
+            # Jobs
+            "POST /api/v1/jobs": "Encola una extracción (plantilla_id opcional)",
+            "GET /api/v1/jobs/{id}": "Estado y progreso por página",
+            "GET /api/v1/jobs/{id}/result": "Resultado del job terminado",
+            # Métricas
+            "GET /stats": "Contadores de caches, del pool de conexiones y del executor de extracción",
         },
     }
 
@@ -44,6 +62,19 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "PDF Text Extractor"}
 
+@app.get("/stats")
+def stats():
+    ocr_cache = get_ocr_cache()
+    result_cache = get_result_cache()
+    db_pool = peek_db_pool()
+    return {
+        "ocr_cache": ocr_cache.stats() if ocr_cache else {"enabled": False},
+        "result_cache": result_cache.stats() if result_cache else {"enabled": False},
+        "template_cache": template_engine.repo.stats() if hasattr(template_engine.repo, "stats") else {"enabled": False},
+        "db_pool": db_pool.stats() if db_pool else {"enabled": False},
+        "executor": get_extraction_executor().stats(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,113 @@
+# scripts/bench_merge_dedupe.py
+"""
+Benchmark de CombinedExtractor._merge_dedupe (grilla) contra la versión
+anterior que comparaba cada bloque OCR con todos los ya aceptados.
+Genera páginas densas sintéticas: bloques nativos, líneas y palabras OCR, una
+parte duplicando lo nativo (como dicts para la versión anterior y como BlockTable
+para la actual). Verifica que ambos den el mismo resultado.
+
+Uso (desde la raíz del repo):
+  python -m scripts.bench_merge_dedupe [--native 200] [--ocr-words 1500] [--pages 5]
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from src.services.extractors.block_table import BlockTable
+from src.services.extractors.combined import _iou, _merge_dedupe, _norm_text
+
+PAGE_W, PAGE_H = 595.0, 842.0
+
+
+def merge_dedupe_bruteforce(native_blocks: List[Dict], ocr_blocks: List[Dict], iou_thr=0.7) -> List[Dict]:
+    """Implementación previa (cuadrática), como referencia."""
+    merged: List[Dict] = list(native_blocks)
+    for ob in ocr_blocks:
+        ob_norm = _norm_text(ob.get("text", ""))
+        dup = False
+        for nb in merged:
+            if _iou(ob["coordinates"], nb["coordinates"]) >= iou_thr:
+                if _norm_text(nb.get("text", "")) == ob_norm or len(ob_norm) <= 2:
+                    dup = True
+                    break
+        if not dup:
+            merged.append(ob)
+    return merged
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,") for _ in range(rng.randint(1, 9)))
+
+
+def dense_page(rng: random.Random, n_native: int, n_words: int) -> Dict[str, List[Dict]]:
+    native = []
+    for _ in range(n_native):
+        x0, y0 = rng.uniform(20, PAGE_W - 220), rng.uniform(20, PAGE_H - 40)
+        native.append({"coordinates": [x0, y0, x0 + rng.uniform(40, 200), y0 + rng.uniform(10, 30)],
+                       "text": " ".join(_word(rng) for _ in range(rng.randint(1, 6)))})
+
+    words, lines = [], []
+    y = 20.0
+    while len(words) < n_words and y < PAGE_H - 20:
+        x, line_words = 20.0, []
+        while x < PAGE_W - 60 and len(words) < n_words:
+            w = rng.uniform(12, 50)
+            line_words.append({"coordinates": [x, y, x + w, y + 10], "text": _word(rng)})
+            x += w + rng.uniform(3, 8)
+        words.extend(line_words)
+        lines.append({"coordinates": [line_words[0]["coordinates"][0], y, x, y + 10],
+                      "text": " ".join(b["text"] for b in line_words)})
+        y += rng.uniform(11, 14)
+        if y >= PAGE_H - 20:
+            y = 20.0 + rng.uniform(0, 5)
+
+    # Parte de lo nativo reaparece en el OCR casi en la misma caja (duplicados)
+    dups = []
+    for nb in rng.sample(native, k=n_native // 3):
+        j = [c + rng.uniform(-1.0, 1.0) for c in nb["coordinates"]]
+        dups.append({"coordinates": j, "text": nb["text"] if rng.random() < 0.8 else _word(rng)[:2]})
+    ocr = lines + words + dups
+    rng.shuffle(ocr)
+    return {"native": native, "ocr": ocr}
+
+
+def _time(fn, pages) -> float:
+    t0 = time.perf_counter()
+    for p in pages:
+        fn(p["native"], p["ocr"])
+    return time.perf_counter() - t0
+
+
+def _rows(blocks: List[Dict]) -> List[tuple]:
+    return [(b["coordinates"], b["text"]) for b in blocks]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--native", type=int, default=200, help="bloques nativos por página")
+    ap.add_argument("--ocr-words", type=int, default=1500, help="palabras OCR por página (más sus líneas)")
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [dense_page(rng, args.native, args.ocr_words) for _ in range(args.pages)]
+    tables = [{k: BlockTable.from_dicts(v) for k, v in p.items()} for p in pages]
+
+    for p, t in zip(pages, tables):
+        merged = _merge_dedupe(t["native"], t["ocr"]).to_json()
+        if _rows(merged) != _rows(merge_dedupe_bruteforce(p["native"], p["ocr"])):
+            raise SystemExit("ERROR: la grilla no da el mismo resultado que la versión anterior")
+
+    n_ocr = sum(len(p["ocr"]) for p in pages) / len(pages)
+    old = _time(merge_dedupe_bruteforce, pages)
+    new = _time(_merge_dedupe, tables)
+    print(f"{args.pages} páginas, {args.native} nativos + {n_ocr:.0f} OCR por página (resultados idénticos)")
+    print(f"  anterior (todos contra todos): {old * 1000 / args.pages:8.1f} ms/página")
+    print(f"  grilla:                        {new * 1000 / args.pages:8.1f} ms/página")
+    print(f"  speedup: x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,64 @@
 # config.py
 import os
+import threading
 from dotenv import load_dotenv
-import pyodbc
-from src.services.templates_pdf.engine import TemplateEngine
-from src.services.templates_pdf.repo import SQLTemplateRepository
 load_dotenv()
 
 
-def create_template_engine():
-    repo = SQLTemplateRepository()
-    return TemplateEngine(repo=repo)
+def get_pdf_workers() -> int:
+    # Procesos para extraer páginas en paralelo (1 = secuencial)
+    return int(os.getenv('PDF_WORKERS', '1'))
+
+
+def get_pdf_chunk_size() -> int:
+    # Páginas por tarea cuando PDF_WORKERS > 1
+    return int(os.getenv('PDF_CHUNK_SIZE', '4'))
+
+
+def get_pdf_max_pages_in_memory() -> int:
+    # Tope de páginas extraídas retenidas a la vez al iterar un PDF (NDJSON y workers en paralelo;
+    # las respuestas no-stream incluyen todas las páginas y las retienen igual)
+    return int(os.getenv('PDF_MAX_PAGES_IN_MEMORY', '32'))
+
+
+def get_native_mode() -> str:
+    # Granularidad del texto nativo: "blocks" (bloques de PyMuPDF) o "words" (líneas + palabras)
+    return os.getenv('NATIVE_MODE', 'blocks')
+
+
+def get_region_ocr_margin() -> float:
+    # Holgura (puntos PDF) alrededor de boxes/searchBox en el OCR guiado por plantilla
+    return float(os.getenv('REGION_OCR_MARGIN', '18'))
+
+
+def get_batch_workers() -> int:
+    # Procesos para extraer en paralelo los archivos de un batch
+    return int(os.getenv('BATCH_WORKERS', str(os.cpu_count() or 1)))
+
+
+def get_batch_max_files() -> int:
+    # Máximo de PDFs por batch (incluye los que vienen dentro de zips)
+    return int(os.getenv('BATCH_MAX_FILES', '500'))
+
+
+def get_singleflight_timeout() -> float:
+    # Segundos que un request duplicado espera a la extracción en curso antes de dar 504
+    return float(os.getenv('SINGLEFLIGHT_TIMEOUT_S', '300'))
+
+
+def get_extract_deadline_s() -> float:
+    # Presupuesto de tiempo por request de extracción (0 = sin límite); deadline_s lo puede acotar
+    return float(os.getenv('EXTRACT_DEADLINE_S', '0'))
+
+
+def get_max_upload_mb() -> int:
+    # Tamaño máximo de un PDF subido (413 si se supera)
+    return int(os.getenv('MAX_UPLOAD_MB', '100'))
+
+
+def get_upload_in_memory_max_mb() -> int:
+    # PDFs de hasta este tamaño se abren desde memoria sin archivo temporal (0 = siempre a disco)
+    return int(os.getenv('UPLOAD_IN_MEMORY_MAX_MB', '8'))
 
 
 def get_db_connection_string():
@@ -27,6 +76,7 @@ def get_db_connection_string():
         "SQL Server"
     ]
 
+    import pyodbc  # sólo con base configurada: el resto del módulo no requiere el runtime ODBC
     available_drivers = [d for d in pyodbc.drivers() if any(
         pd in d for pd in possible_drivers)]
 
@@ -64,8 +114,67 @@ def get_db_connection_string():
     )
 
 
+def get_template_cache_ttl_s() -> float:
+    # Segundos que una plantilla cacheada se usa sin verificar su updated_at (0 = verificar siempre)
+    return float(os.getenv('TEMPLATE_CACHE_TTL_S', '30'))
+
+
+def get_template_cache_max_entries() -> int:
+    # Plantillas retenidas en el cache de lectura del repositorio (LRU)
+    return int(os.getenv('TEMPLATE_CACHE_MAX_ENTRIES', '256'))
+
+
+def get_db_pool_min_size() -> int:
+    # Conexiones ociosas que el pool conserva aunque no se usen
+    return int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+
+
+def get_db_pool_max_size() -> int:
+    # Conexiones abiertas a la vez como máximo
+    return int(os.getenv('DB_POOL_MAX_SIZE', '5'))
+
+
+def get_db_pool_timeout_s() -> float:
+    # Espera máxima por una conexión libre antes de fallar con PoolTimeout
+    return float(os.getenv('DB_POOL_TIMEOUT_S', '10'))
+
+
+def get_db_pool_check_idle_s() -> float:
+    # Las conexiones ociosas más de estos segundos se verifican (SELECT 1) antes de reusarlas
+    return float(os.getenv('DB_POOL_CHECK_IDLE_S', '30'))
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """Pool de conexiones a la base compartido por proceso (las conexiones se abren a demanda)."""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                import pyodbc
+                from src.services.templates_pdf.pool import ConnectionPool
+                conn_string = get_db_connection_string()
+                _db_pool = ConnectionPool(lambda: pyodbc.connect(conn_string),
+                                          min_size=get_db_pool_min_size(),
+                                          max_size=get_db_pool_max_size(),
+                                          timeout=get_db_pool_timeout_s(),
+                                          check_idle_s=get_db_pool_check_idle_s())
+    return _db_pool
+
+
+def peek_db_pool():
+    """El pool si ya se creó, si no None; no intenta crearlo (métricas sin base disponible)."""
+    return _db_pool
+
+
 def create_template_engine():
-    from src.services.templates_pdf.repo import SQLTemplateRepository
-    repo = SQLTemplateRepository(get_db_connection_string())
+    from src.services.templates_pdf.repo import SQLTemplateRepository, get_cached_template_repository
+    # Un único repositorio cacheado por proceso (los engines se crean por request)
+    repo = get_cached_template_repository(lambda: SQLTemplateRepository(pool=get_db_pool()),
+                                          max_entries=get_template_cache_max_entries(),
+                                          ttl_seconds=get_template_cache_ttl_s())
     from src.services.templates_pdf.engine import TemplateEngine
     return TemplateEngine(repo)
@@ -1,51 +1,272 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query
-from fastapi.responses import JSONResponse
+import json
+import os
+from typing import List, Optional
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import logging
 
 from src.services.uploads import Uploads
 from src.services.pdfProcessor import PdfProcessor
-from src.services.pageExtractor import PageExtractor
-from src.services.extractors.combined import CombinedExtractor
+from src.services.pageSelection import PageSelection, parse_page_selection
+from src.services.deadline import Deadline, make_deadline
+from src.services.serialization import ResultJSONResponse, dumps
+from src.services.pageExtractorFactory import build_pdf_processor
+from src.services.cache.result_cache import ResultCache, get_result_cache
+from src.services.singleflight import SingleFlight, SingleFlightTimeout
+from src.services.extractionExecutor import BoundedExecutor, ExecutorBusy, get_extraction_executor
+from src.services.templateExtraction import iter_template_extraction, run_template_extraction
+from src.services.batchExtraction import load_templates, run_batch
 
-from src.services.fields.totals import extract_totals, infer_proveedor_from_template_id
-
-from src.config import create_template_engine
+from src.config import (create_template_engine, get_region_ocr_margin, get_singleflight_timeout,
+                        get_batch_workers, get_batch_max_files, get_max_upload_mb,
+                        get_upload_in_memory_max_mb, get_extract_deadline_s)
 from src.services.templates_pdf.engine import TemplateEngine
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/extract-text", tags=["Extraction"])
 
+CACHE_HEADER = "X-Cache"
+COALESCED_HEADER = "X-Coalesced"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+DEADLINE_DESC = "Tiempo máximo (s); al agotarse se devuelven las páginas hechas y 'partial'"
+
+# Requests concurrentes con el mismo PDF y opciones comparten una sola extracción
+_flight = SingleFlight()
+
 
 # -------------------- Dependencias --------------------
 def get_uploads() -> Uploads:
-    return Uploads()
+    return Uploads(max_bytes=get_max_upload_mb() * 1024 * 1024,
+                   in_memory_max_bytes=get_upload_in_memory_max_mb() * 1024 * 1024)
 
 def get_pdf_processor() -> PdfProcessor:
-    strategies = [CombinedExtractor(ocr_always=True, dpi=300, lang="spa+eng", min_conf=40)]
-    page_extractor = PageExtractor(strategies)
-    return PdfProcessor(page_extractor)
+    return build_pdf_processor()
 
 def get_template_engine() -> TemplateEngine:
     return create_template_engine()
 
+def get_cache() -> Optional[ResultCache]:
+    return get_result_cache()
+
+def get_flight() -> SingleFlight:
+    return _flight
+
+def get_executor() -> BoundedExecutor:
+    return get_extraction_executor()
+
+
+# -------------------- Helpers --------------------
+def _page_selection(pages: Optional[str]) -> Optional[PageSelection]:
+    try:
+        return parse_page_selection(pages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _deadline(deadline_s: Optional[float]) -> Optional[Deadline]:
+    """Deadline del request: el menor entre EXTRACT_DEADLINE_S y deadline_s (si hay alguno)."""
+    return make_deadline(get_extract_deadline_s(), deadline_s)
+
+
+async def _run_once(flight: SingleFlight, executor: BoundedExecutor, key: str,
+                    cache: Optional[ResultCache], use_cache: bool, compute, release,
+                    deadline: Optional[Deadline] = None):
+    """
+    Cache + singleflight alrededor de `compute` (sync, corre en el executor acotado).
+    `compute` retorna (result, cacheable). Retorna la JSONResponse con X-Cache y X-Coalesced.
+    `release` libera el upload del request y pasa a ser responsabilidad de _run_once:
+    si este request lanza la extracción compartida, la llama la task al terminar (aunque
+    el cliente del líder se desconecte, los seguidores siguen leyendo el archivo); si no,
+    se llama al salir.
+    Sólo se coalescen requests con el mismo presupuesto de tiempo: un request sin
+    deadline (o con uno mayor) no recibe el resultado parcial de un líder apurado.
+    """
+    flight_key = key if deadline is None else f"{key}|deadline={deadline.seconds:g}"
+    led = False
+
+    def compute_and_store():
+        result, cacheable = compute()
+        if use_cache and cacheable:
+            cache.put(key, result)
+        return result
+
+    async def run_and_release():
+        try:
+            return await executor.run(compute_and_store)
+        finally:
+            release()
+
+    def lead():
+        nonlocal led
+        led = True
+        return run_and_release()
+
+    try:
+        if use_cache:
+            cached = await run_in_threadpool(cache.get, key)
+            if cached is not None:
+                return ResultJSONResponse(content=cached, headers={CACHE_HEADER: "HIT"})
+        result, coalesced = await flight.do(flight_key, lead, get_singleflight_timeout())
+    except SingleFlightTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+    finally:
+        if not led:
+            release()
+
+    headers = {CACHE_HEADER: "MISS" if use_cache else "BYPASS"}
+    if coalesced:
+        headers[COALESCED_HEADER] = "1"
+    return ResultJSONResponse(content=result, headers=headers)
+
+
+def _ndjson_response(executor: BoundedExecutor, make_events, cleanup) -> StreamingResponse:
+    """
+    Respuesta NDJSON: una línea por evento a medida que se generan (ver PdfProcessor.stream).
+    Un error a mitad de camino se informa como línea {"type": "error"}; `cleanup` corre al terminar.
+    """
+    try:
+        events = executor.iterate(make_events)
+    except ExecutorBusy as e:
+        cleanup()
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+
+    async def body():
+        try:
+            async for event in events:
+                yield dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.exception("Error en extracción NDJSON")
+            yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+        finally:
+            await events.aclose()
+            cleanup()
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers={CACHE_HEADER: "BYPASS"})
+
 
 # -------------------- Endpoints --------------------
 @router.post("/")
 async def extract_text_from_pdf(
     file: UploadFile = File(...),
+    no_cache: bool = Query(False, description="Ignora el cache de resultados"),
+    stream: bool = Query(False, description="NDJSON: una línea por página y una final con stats"),
+    pages: Optional[str] = Query(None, description='Páginas a extraer, p. ej. "1-2,5" o "3-" (por defecto todas)'),
+    deadline_s: Optional[float] = Query(None, gt=0, description=DEADLINE_DESC),
     uploads: Uploads = Depends(get_uploads),
     pdf: PdfProcessor = Depends(get_pdf_processor),
+    cache: Optional[ResultCache] = Depends(get_cache),
+    flight: SingleFlight = Depends(get_flight),
+    executor: BoundedExecutor = Depends(get_executor),
 ):
-    """Extracción automática"""
-    tmp_path = uploads.save_temp_pdf(file)
+    """Extracción automática. Con stream=True no usa cache ni coalescencia."""
+    selection = _page_selection(pages)
+    deadline = _deadline(deadline_s)
+    upload = await run_in_threadpool(uploads.receive_pdf, file)
+    source = upload.source
+    if stream:
+        return _ndjson_response(executor, lambda: pdf.stream(source, pages=selection, deadline=deadline),
+                                lambda: uploads.release(upload))
+    owned = True  # hasta que el upload pasa a _run_once
     try:
-        result = pdf.process(tmp_path)
-        return JSONResponse(content=result)
+        key = ResultCache.make_key(upload.sha256, {
+            "route": "auto",
+            "pdf": pdf.config(),
+            "pages": str(selection) if selection is not None else None,
+        })
+
+        def compute():
+            # Los resultados parciales (deadline agotado) no se cachean
+            result = pdf.process(source, pages=selection, deadline=deadline)
+            return result, "partial" not in result
+
+        use_cache = cache is not None and not no_cache
+        owned = False
+        return await _run_once(flight, executor, key, cache, use_cache, compute,
+                               lambda: uploads.release(upload), deadline)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al extraer texto: {str(e)}")
     finally:
-        uploads.cleanup_temp_file(tmp_path)
+        if owned:
+            uploads.release(upload)
+
+
+@router.post("/batch")
+async def extract_text_batch(
+    files: List[UploadFile] = File(..., description="PDFs y/o .zip con PDFs"),
+    plantilla_id: Optional[str] = Query(None, description="Plantilla para todos los archivos"),
+    plantillas: Optional[str] = Form(None, description='JSON {"archivo.pdf": "plantilla_id"} por archivo'),
+    debug: bool = Query(False, description="Devuelve info de anclas y transformaciones"),
+    region_ocr: bool = Query(True, description="OCR sólo de las zonas que lee la plantilla"),
+    pages: Optional[str] = Query(None, description='Páginas a extraer de cada archivo, p. ej. "1-2,5" (con plantilla, por defecto las que usa)'),
+    deadline_s: Optional[float] = Query(None, gt=0, description=DEADLINE_DESC),
+    uploads: Uploads = Depends(get_uploads),
+    tpl_engine: TemplateEngine = Depends(get_template_engine),
+    executor: BoundedExecutor = Depends(get_executor),
+):
+    """
+    Extrae varios PDFs (o los de un zip) en paralelo. Cada archivo usa su plantilla de
+    `plantillas` (por nombre, o por nombre dentro del zip), si no `plantilla_id`, si no
+    extracción automática. Un archivo que falla queda con status=error sin cortar el batch.
+    """
+    try:
+        per_file = json.loads(plantillas) if plantillas else {}
+        if not isinstance(per_file, dict):
+            raise ValueError("se esperaba un objeto")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"'plantillas' inválido: {str(e)}")
+    selection = _page_selection(pages)
+    deadline = _deadline(deadline_s)
+
+    max_files = get_batch_max_files()
+    saved = []
+    try:
+        for f in files:
+            saved.extend(await run_in_threadpool(uploads.save_temp_batch, f, max_files))
+            if len(saved) > max_files:
+                raise HTTPException(status_code=413, detail=f"El batch supera {max_files} PDFs")
+        if not saved:
+            raise HTTPException(status_code=400, detail="El batch no contiene PDFs")
+
+        items = [{
+            "filename": name,
+            "path": path,
+            "plantilla": per_file.get(name) or per_file.get(os.path.basename(name)) or plantilla_id,
+        } for name, path in saved]
+
+        # Una sola lectura por plantilla distinta para todo el batch
+        templates, missing = await run_in_threadpool(
+            load_templates, tpl_engine, [i["plantilla"] for i in items if i["plantilla"]])
+        for item in items:
+            if item["plantilla"] in missing:
+                item["error"] = missing[item["plantilla"]]
+
+        try:
+            results = await executor.run(run_batch, items, templates,
+                                         workers=get_batch_workers(), debug=debug,
+                                         region_ocr=region_ocr, region_margin=get_region_ocr_margin(),
+                                         pages=selection, deadline=deadline)
+        except ExecutorBusy as e:
+            raise HTTPException(status_code=503, detail=str(e),
+                                headers={"Retry-After": str(e.retry_after)})
+
+        ok = sum(1 for r in results if r["status"] == "ok")
+        return ResultJSONResponse(content={"total": len(results), "ok": ok,
+                                           "errors": len(results) - ok, "results": results})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en extracción batch: {str(e)}")
+    finally:
+        uploads.cleanup_temp_files([p for _, p in saved])
 
 
 @router.post("/{plantilla_id}")
@@ -53,97 +274,89 @@ async def extract_text_with_template(
     plantilla_id: str,
     file: UploadFile = File(...),
     debug: bool = Query(False, description="Devuelve info de anclas y transformaciones"),
+    region_ocr: bool = Query(True, description="OCR sólo de las zonas que lee la plantilla"),
+    no_cache: bool = Query(False, description="Ignora el cache de resultados"),
+    stream: bool = Query(False, description="NDJSON: una línea por página y una final con stats y plantilla"),
+    pages: Optional[str] = Query(None, description='Páginas a extraer, p. ej. "1-2,5" ("all" = todas; por defecto las que usa la plantilla)'),
+    deadline_s: Optional[float] = Query(None, gt=0, description=DEADLINE_DESC),
     uploads: Uploads = Depends(get_uploads),
     pdf: PdfProcessor = Depends(get_pdf_processor),
     tpl_engine: TemplateEngine = Depends(get_template_engine),
+    cache: Optional[ResultCache] = Depends(get_cache),
+    flight: SingleFlight = Depends(get_flight),
+    executor: BoundedExecutor = Depends(get_executor),
 ):
     """
     Extrae texto y aplica una plantilla. Devuelve:
       - result.pages (lo que devuelva tu PdfProcessor)
       - template_based_extraction con values y, si debug=True, anclas/transform.
+    Con region_ocr=True sólo se OCRean los boxes y searchBox de anclas de la plantilla;
+    las páginas donde no aparece ninguna ancla se re-extraen con OCR de página completa.
+    Con stream=True responde NDJSON (ver iter_template_extraction), sin cache ni coalescencia.
+    Sin `pages` sólo se extraen las páginas que referencian los boxes y meta.pages de la plantilla.
     """
-    tmp_path = uploads.save_temp_pdf(file)
+    selection = _page_selection(pages)
+    deadline = _deadline(deadline_s)
+    upload = await run_in_threadpool(uploads.receive_pdf, file)
+    source = upload.source
+    owned = True  # hasta que el upload pasa a la respuesta NDJSON o a _run_once
+    use_cache = cache is not None and not no_cache
     try:
-        # 1) Extracción general
-        result = pdf.process(tmp_path)
-
-        # 2) Aplanar blocks, metadatos de tamaño y origen top-left
-        all_blocks = []
-        pages = result.get("pages", []) or []
-
-        for idx, p in enumerate(pages, start=1):
-            pw = p.get("width") or p.get("page_width")
-            ph = p.get("height") or p.get("page_height")
-            page_num = int(p.get("page", idx))
-            origin = (p.get("origin") or "top-left").lower()
-
-            for blk in (p.get("blocks") or []):
-                x0, y0, x1, y1 = blk.get("coordinates", [0, 0, 0, 0])
-
-                # Si el extractor trae origen bottom-left, convertir a top-left
-                if origin == "bottom-left" and ph:
-                    y0, y1 = float(ph) - float(y1), float(ph) - float(y0)
-
-                all_blocks.append({
-                    "page": page_num,
-                    "coordinates": [float(x0), float(y0), float(x1), float(y1)],
-                    "text": blk.get("text", "") or "",
-                    "page_width": float(pw) if pw else None,
-                    "page_height": float(ph) if ph else None,
-                    "source": blk.get("source"),
-                    "kind": blk.get("kind"),
-                    "conf": blk.get("conf"),
-                })
-
-        if not all_blocks:
-            result["template_based_extraction"] = {
-                "warning": "No se encontraron bloques de texto para aplicar la plantilla",
-                "plantilla": plantilla_id,
-            }
-            return JSONResponse(content=result)
-
-        # 3) Aplicar plantilla con anclas
+        # La versión sólo hace falta para la clave del cache y para responder 404 antes de
+        # empezar el NDJSON; sin cache, compute valida el id al compilar la plantilla
+        version = None
+        if use_cache or stream:
+            try:
+                version = await run_in_threadpool(tpl_engine.get_template_version, plantilla_id)
+            except ValueError as ve:
+                raise HTTPException(status_code=404, detail=str(ve))
+        margin = get_region_ocr_margin()
+        region_pdf_factory = build_pdf_processor if region_ocr else None
+
+        if stream:
+            response = _ndjson_response(
+                executor,
+                lambda: iter_template_extraction(source, plantilla_id, pdf, tpl_engine, debug=debug,
+                                                 region_pdf_factory=region_pdf_factory,
+                                                 region_margin=margin, pages=selection,
+                                                 deadline=deadline),
+                lambda: uploads.release(upload))
+            owned = False  # el upload lo libera la respuesta
+            return response
+
+        key = ResultCache.make_key(upload.sha256, {
+            "route": "template",
+            "pdf": pdf.config(),
+            "plantilla": plantilla_id,
+            "version": version,
+            "debug": debug,
+            "region_ocr": region_ocr,
+            "region_margin": margin,
+            "pages": str(selection) if selection is not None else None,
+        })
+
+        def compute():
+            # No se cachean resultados con error al aplicar la plantilla
+            return run_template_extraction(
+                source, plantilla_id, pdf, tpl_engine,
+                debug=debug,
+                region_pdf_factory=region_pdf_factory,
+                region_margin=margin,
+                pages=selection,
+                deadline=deadline,
+            )
+
+        owned = False
         try:
-            values = tpl_engine.apply_template(plantilla_id, all_blocks, include_debug=debug)
-            result["template_based_extraction"] = {
-                "plantilla": plantilla_id,
-                **values
-            }
+            return await _run_once(flight, executor, key, cache, use_cache, compute,
+                                   lambda: uploads.release(upload), deadline)
         except ValueError as ve:
             raise HTTPException(status_code=404, detail=str(ve))
-        except Exception as e:
-            logger.exception("Error aplicando plantilla")
-            result["template_based_extraction"] = {
-                "error": f"Error aplicando plantilla: {str(e)}",
-                "plantilla": plantilla_id,
-            }
-
-        # 4) Totales por proveedor (Guerrini, Pirelli, etc.)
-        try:
-            proveedor = infer_proveedor_from_template_id(plantilla_id)
-            totals = extract_totals(all_blocks, proveedor=proveedor, y_tolerance=24, x_min_gap=6.0)
-            tbx = result.get("template_based_extraction", {})
-            vals = tbx.setdefault("values", {})
-
-            if totals.get("SUBTOTAL"):
-                    vals["subtotal"] = totals["SUBTOTAL"]
-            if totals.get("IVA_21"):
-                    vals["iva_21"] = totals["IVA_21"]
-            if totals.get("PERCEP"):
-                    # si tenés campos separados de IIBB/perc, adaptá aquí
-                    vals["percep_iibb"] = totals["PERCEP"]
-            if totals.get("TOTAL") and (not vals.get("total") or vals.get("total") == vals.get("subtotal")):
-                    vals["total"] = totals["TOTAL"]
-
-            result["template_based_extraction"]["values"] = vals
-        except Exception:
-            pass
-
-        return JSONResponse(content=result)
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en extracción con plantilla: {str(e)}")
     finally:
-        uploads.cleanup_temp_file(tmp_path)
+        if owned:
+            uploads.release(upload)
@@ -0,0 +1,95 @@
+from typing import Optional
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from src.services.uploads import Uploads
+from src.services.pageSelection import parse_page_selection
+from src.services.jobs.runner import JobManager, get_job_manager
+from src.services.jobs.store import COMPLETED, FAILED
+from src.config import create_template_engine, get_max_upload_mb
+from src.services.templates_pdf.engine import TemplateEngine
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["Jobs"])
+
+
+# -------------------- Dependencias --------------------
+def get_uploads() -> Uploads:
+    # Los jobs siempre van a disco: el archivo se mueve al directorio del job
+    return Uploads(max_bytes=get_max_upload_mb() * 1024 * 1024)
+
+def get_template_engine() -> TemplateEngine:
+    return create_template_engine()
+
+def get_jobs() -> JobManager:
+    return get_job_manager()
+
+
+def _job_view(job: dict) -> dict:
+    total = job["pages_total"]
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "plantilla": job["plantilla_id"],
+        "pages_done": job["pages_done"],
+        "pages_total": total,
+        "progress": round(job["pages_done"] / total, 3) if total else 0.0,
+        "error": job["error"],
+        "result_url": f"{router.prefix}/{job['id']}/result" if job["status"] == COMPLETED else None,
+    }
+
+
+# -------------------- Endpoints --------------------
+@router.post("", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    plantilla_id: Optional[str] = Query(None, description="Plantilla a aplicar (opcional)"),
+    debug: bool = Query(False, description="Devuelve info de anclas y transformaciones"),
+    region_ocr: bool = Query(True, description="OCR sólo de las zonas que lee la plantilla"),
+    pages: Optional[str] = Query(None, description='Páginas a extraer, p. ej. "1-2,5" (con plantilla, por defecto las que usa)'),
+    uploads: Uploads = Depends(get_uploads),
+    tpl_engine: TemplateEngine = Depends(get_template_engine),
+    jobs: JobManager = Depends(get_jobs),
+):
+    """Encola la extracción (con plantilla si se indica) y devuelve el id del job sin esperar."""
+    try:
+        parse_page_selection(pages)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    if plantilla_id:
+        try:
+            await run_in_threadpool(tpl_engine.get_template_version, plantilla_id)
+        except ValueError as ve:
+            raise HTTPException(status_code=404, detail=str(ve))
+
+    tmp_path = await run_in_threadpool(uploads.save_temp_pdf, file)
+    try:
+        job_id = await run_in_threadpool(jobs.submit, tmp_path, plantilla_id,
+                                         {"debug": debug, "region_ocr": region_ocr, "pages": pages})
+    except Exception as e:
+        uploads.cleanup_temp_file(tmp_path)
+        raise HTTPException(status_code=500, detail=f"Error encolando job: {str(e)}")
+    job = await run_in_threadpool(jobs.get, job_id)
+    return JSONResponse(status_code=202, content=_job_view(job))
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, jobs: JobManager = Depends(get_jobs)):
+    """Estado y progreso por página del job."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' no encontrado")
+    return _job_view(job)
+
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str, jobs: JobManager = Depends(get_jobs)):
+    """Resultado del job terminado (mismo formato que /api/v1/extract-text)."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' no encontrado")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"El job falló: {job['error']}")
+    if job["status"] != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"El job todavía no terminó (estado: {job['status']})")
+    return FileResponse(job["result_path"], media_type="application/json")
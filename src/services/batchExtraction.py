@@ -0,0 +1,99 @@
+# services/batchExtraction.py
+"""
+Extracción de muchos PDFs en una sola llamada.
+Cada archivo se procesa en un proceso del pool (BATCH_WORKERS) con su propio
+PdfProcessor secuencial; las plantillas se leen una vez por batch y viajan a
+los workers en un InMemoryTemplateRepository (el TemplateEngine, con su cache
+de compiladas y lock, no es picklable: cada worker arma el suyo y compila cada
+plantilla una vez). El error de un archivo queda en su resultado y no corta el resto.
+"""
+import functools
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .pageExtractorFactory import build_pdf_processor
+from .deadline import Deadline
+from .pageSelection import PageSelection
+from .pdfProcessor import get_process_pool
+from .templateExtraction import run_template_extraction
+from .templates_pdf.engine import TemplateEngine
+from .templates_pdf.repo import InMemoryTemplateRepository
+
+logger = logging.getLogger(__name__)
+
+
+def load_templates(tpl_engine: TemplateEngine,
+                   template_ids: List[str]) -> Tuple[InMemoryTemplateRepository, Dict[str, str]]:
+    """
+    Lee cada plantilla distinta una sola vez.
+    Retorna (repositorio en memoria para los workers, {id: error} de las que no existen).
+    """
+    templates, missing = [], {}
+    for tid in sorted(set(template_ids)):
+        template = tpl_engine.get_template(tid)
+        if template is None:
+            missing[tid] = f"Template '{tid}' no encontrado"
+        else:
+            templates.append(template)
+    return InMemoryTemplateRepository(templates), missing
+
+
+def _extract_one(file_path: str, plantilla_id: Optional[str], templates: InMemoryTemplateRepository,
+                 debug: bool, region_ocr: bool, region_margin: float,
+                 pages: Optional[PageSelection], deadline: Optional[Deadline]) -> Dict[str, Any]:
+    """Worker: un archivo del batch (workers=1, el paralelismo es por archivo)."""
+    pdf = build_pdf_processor(workers=1)
+    if not plantilla_id:
+        return pdf.process(file_path, pages=pages, deadline=deadline)
+    # Usa el cache de compiladas del proceso worker: cada plantilla se compila una vez por worker
+    result, _ = run_template_extraction(
+        file_path, plantilla_id, pdf, TemplateEngine(repo=templates),
+        debug=debug,
+        region_pdf_factory=functools.partial(build_pdf_processor, workers=1) if region_ocr else None,
+        region_margin=region_margin,
+        pages=pages,
+        deadline=deadline,
+    )
+    return result
+
+
+def run_batch(
+    items: List[Dict[str, Any]],
+    templates: InMemoryTemplateRepository,
+    *,
+    workers: int,
+    debug: bool = False,
+    region_ocr: bool = True,
+    region_margin: float = 18.0,
+    pages: Optional[PageSelection] = None,
+    deadline: Optional[Deadline] = None,
+) -> List[Dict[str, Any]]:
+    """
+    items: [{"filename", "path", "plantilla", "error"?}] (error = ya falló antes de extraer).
+    `templates`: las plantillas del batch, de load_templates.
+    `deadline` es el del request entero: los archivos que no llegan quedan con páginas salteadas.
+    Retorna un resultado por item, en el mismo orden:
+      {"filename", "plantilla", "status": "ok"|"error", "result"|"error"}
+    """
+    pool = get_process_pool(workers)
+    futures = []
+    for item in items:
+        if item.get("error"):
+            futures.append(None)
+        else:
+            futures.append(pool.submit(_extract_one, item["path"], item["plantilla"], templates,
+                                       debug, region_ocr, region_margin, pages, deadline))
+
+    out = []
+    for item, fut in zip(items, futures):
+        entry = {"filename": item["filename"], "plantilla": item["plantilla"]}
+        if fut is None:
+            entry.update(status="error", error=item["error"])
+        else:
+            try:
+                entry.update(status="ok", result=fut.result())
+            except Exception as e:
+                logger.warning("Batch: falló %s: %s", item["filename"], e)
+                entry.update(status="error", error=str(e))
+        out.append(entry)
+    return out
@@ -0,0 +1,67 @@
+# src/services/cache/result_cache.py
+"""
+Cache de resultados completos de extracción.
+
+Clave: SHA-256 del PDF subido + configuración del pipeline (extractores y,
+en la ruta con plantilla, id/versión de la plantilla y opciones del request).
+Valor: el JSON que devuelve el endpoint.
+
+Configuración:
+  RESULT_CACHE_ENABLED      (default "1")
+  RESULT_CACHE_PATH         (default <tmp>/pdf_extractor/result_cache.sqlite)
+  RESULT_CACHE_TTL_S        (default 86400)
+  RESULT_CACHE_MAX_MB       (default 256)
+  RESULT_CACHE_MAX_ENTRIES  (default 1000)
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from .sqlite_cache import SqliteLRUCache
+from src.services.serialization import json_default
+
+
+class ResultCache:
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float, max_entries: int):
+        self._store = SqliteLRUCache(path, max_bytes, ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+    @staticmethod
+    def make_key(pdf_sha256: str, config: Dict[str, Any]) -> str:
+        raw = json.dumps({"pdf": pdf_sha256, "config": config}, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self._store.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        self._store.put(key, json.dumps(value, separators=(",", ":"), default=json_default).encode("utf-8"))
+
+    def stats(self) -> Dict:
+        return self._store.stats()
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Cache compartido por proceso, o None si está deshabilitado."""
+    global _cache
+    if os.getenv("RESULT_CACHE_ENABLED", "1") != "1":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                path = os.getenv("RESULT_CACHE_PATH") or os.path.join(
+                    tempfile.gettempdir(), "pdf_extractor", "result_cache.sqlite")
+                _cache = ResultCache(
+                    path,
+                    max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024),
+                    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_S", "86400")),
+                    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000")),
+                )
+    return _cache
@@ -0,0 +1,150 @@
+# src/services/cache/sqlite_cache.py
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class SqliteLRUCache:
+    """
+    Cache clave -> bytes persistido en un archivo SQLite local.
+    - LRU aproximado: una lectura actualiza last_access sólo si tiene más de
+      `touch_interval_s`, y esas actualizaciones se acumulan y se escriben juntas
+      (cada `touch_batch` o antes de desalojar); al superar max_bytes se borran
+      las entradas menos usadas recientemente.
+    - TTL opcional: entradas más viejas que ttl_seconds cuentan como miss.
+    Seguro entre hilos y procesos (una conexión por hilo y proceso, WAL).
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None,
+                 touch_interval_s: float = 60.0, touch_batch: int = 64):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.touch_interval_s = touch_interval_s
+        self.touch_batch = max(1, touch_batch)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._touches: Dict[str, float] = {}  # key -> last_access pendiente de escribir
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_last_access ON cache(last_access)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Conexión del hilo; se reabre en un proceso hijo (no se comparten tras fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        with conn:  # commit / rollback
+            yield conn
+
+    def _touch(self, key: str, now: float) -> None:
+        with self._lock:
+            self._touches[key] = now
+            if len(self._touches) < self.touch_batch:
+                return
+        self._flush_touches()
+
+    def _flush_touches(self, conn: Optional[sqlite3.Connection] = None) -> None:
+        with self._lock:
+            touches, self._touches = self._touches, {}
+        if not touches:
+            return
+        rows = [(ts, key) for key, ts in touches.items()]
+        if conn is not None:
+            conn.executemany("UPDATE cache SET last_access = ? WHERE key = ?", rows)
+            return
+        with self._connect() as conn:
+            conn.executemany("UPDATE cache SET last_access = ? WHERE key = ?", rows)
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created_at, last_access FROM cache WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                row = None
+        if row and now - row[2] > self.touch_interval_s:
+            self._touch(key, now)
+        self._count(bool(row))
+        return bytes(row[0]) if row else None
+
+    def put(self, key: str, value: bytes) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            # Antes del INSERT (no pisa el last_access de la clave nueva); cuentan para desalojar
+            self._flush_touches(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), size, now, now),
+            )
+            self._evict(conn)
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total, count = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM cache").fetchone()
+        if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+                break
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            total -= size
+            count -= 1
+            evicted += 1
+        with self._lock:
+            self._evictions += evicted
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache")
+
+    def stats(self) -> Dict:
+        """Contadores del proceso actual + tamaño persistido."""
+        with self._connect() as conn:
+            total, count = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM cache").fetchone()
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "entries": count,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,66 @@
+# services/deadline.py
+"""
+Presupuesto de tiempo por request.
+
+El vencimiento es un instante absoluto (time.time()), así el mismo Deadline
+viaja tal cual a los procesos de PdfProcessor. PdfProcessor lo revisa entre
+páginas y lo deja activo mientras extrae cada una; el OCR lo lee con
+current_deadline() antes de cada llamada y lo usa como timeout de Tesseract.
+
+Las páginas afectadas quedan marcadas en "truncated":
+  SKIPPED      no se llegaron a extraer
+  OCR_CUT_OFF  se cortó el OCR (queda lo nativo)
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+SKIPPED = "skipped"
+OCR_CUT_OFF = "ocr_cut_off"
+
+
+class DeadlineExceeded(Exception):
+    """Se agotó el tiempo de extracción del request."""
+
+    def __init__(self, message: str = "Tiempo de extracción agotado"):
+        super().__init__(message)
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = float(seconds)
+        self.expires_at = time.time() + self.seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded()
+
+
+def make_deadline(*seconds: Optional[float]) -> Optional[Deadline]:
+    """Deadline con el menor de los presupuestos positivos; None si no hay ninguno."""
+    budgets = [float(s) for s in seconds if s and float(s) > 0]
+    return Deadline(min(budgets)) if budgets else None
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("extraction_deadline", default=None)
+
+
+@contextmanager
+def active(deadline: Optional[Deadline]) -> Iterator[None]:
+    """Deja `deadline` como el del contexto actual (lo lee el OCR)."""
+    token = _current.set(deadline)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
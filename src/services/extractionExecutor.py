@@ -0,0 +1,176 @@
+# src/services/extractionExecutor.py
+"""
+Ejecución acotada de extracciones fuera del event loop.
+
+Como máximo EXTRACT_MAX_CONCURRENCY extracciones corren a la vez y hasta
+EXTRACT_MAX_QUEUE esperan turno; con la cola llena `run` falla de inmediato
+con ExecutorBusy (el endpoint responde 503 + Retry-After) en lugar de dejar
+que el request muera por timeout del gateway.
+
+Configuración:
+  EXTRACT_MAX_CONCURRENCY  (default 2)
+  EXTRACT_MAX_QUEUE        (default 8)
+  EXTRACT_RETRY_AFTER_S    (default 5)
+"""
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+_END = object()
+
+
+class ExecutorBusy(Exception):
+    """No hay lugar ni en ejecución ni en la cola de espera."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Servicio saturado, reintentar más tarde")
+        self.retry_after = retry_after
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class BoundedExecutor:
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: int = 5):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                        thread_name_prefix="extract")
+        self._lock = threading.Lock()
+        self._admitted = 0   # en ejecución + en cola
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._admitted >= self.max_concurrency + self.max_queue:
+                self._rejected += 1
+                raise ExecutorBusy(self.retry_after)
+            self._admitted += 1
+
+    def _wrap(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._admitted -= 1
+                self._completed += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._admitted -= 1
+
+    def _submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Admite y encola; si la tarea se cancela antes de arrancar, libera su lugar."""
+        self._admit()
+        try:
+            fut = self._pool.submit(self._wrap, fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        fut.add_done_callback(lambda f: self._release() if f.cancelled() else None)
+        return fut
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecuta fn(*args, **kwargs) en el pool; lanza ExecutorBusy si la cola está llena."""
+        return await asyncio.wrap_future(self._submit(fn, *args, **kwargs))
+
+    def iterate(self, make_iter: Callable[[], Iterator[Any]], buffer: int = 4,
+                idle_timeout: float = 300.0) -> AsyncIterator[Any]:
+        """
+        Consume make_iter() en el pool (ocupa un lugar mientras dura) y entrega sus items
+        al event loop a medida que salen. Con `buffer` items sin leer el productor espera,
+        así un cliente lento no acumula páginas en memoria. Si el consumidor deja de leer
+        (cliente desconectado, o `idle_timeout` segundos sin leer) el iterador se cierra.
+        La admisión es inmediata: lanza ExecutorBusy antes de empezar a responder.
+        """
+        q: "queue.Queue" = queue.Queue(maxsize=max(1, buffer))
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            waited = 0.0
+            while not stop.is_set() and waited < idle_timeout:
+                try:
+                    q.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    waited += 0.5
+            stop.set()
+            return False
+
+        def produce() -> None:
+            if stop.is_set():
+                return
+            it = make_iter()
+            try:
+                for item in it:
+                    if not put(item):
+                        break
+            except BaseException as e:
+                put(_Failure(e))
+            finally:
+                close = getattr(it, "close", None)
+                if close:
+                    close()
+                put(_END)
+
+        fut = self._submit(produce)
+
+        async def drain() -> AsyncIterator[Any]:
+            loop = asyncio.get_running_loop()
+            try:
+                while True:
+                    try:
+                        # timeout: que el hilo no quede bloqueado si se cancela la espera
+                        item = await loop.run_in_executor(None, q.get, True, 1.0)
+                    except queue.Empty:
+                        continue
+                    if item is _END:
+                        break
+                    if isinstance(item, _Failure):
+                        raise item.error
+                    yield item
+            finally:
+                stop.set()
+                fut.cancel()  # si todavía no arrancó
+
+        return drain()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._admitted - self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+_executor: Optional[BoundedExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_extraction_executor() -> BoundedExecutor:
+    """Executor compartido por proceso."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedExecutor(
+                    int(os.getenv("EXTRACT_MAX_CONCURRENCY", "2")),
+                    int(os.getenv("EXTRACT_MAX_QUEUE", "8")),
+                    retry_after=int(os.getenv("EXTRACT_RETRY_AFTER_S", "5")),
+                )
+    return _executor
@@ -1,6 +1,8 @@
 #extractors/base
 
-from typing import Tuple, List, Dict, Protocol, runtime_checkable
+from typing import Tuple, List, Dict, Protocol, Union, runtime_checkable
+
+from .block_table import BlockTable
 
 @runtime_checkable
 class IPageExtractor(Protocol):
@@ -10,11 +12,13 @@ class IPageExtractor(Protocol):
         """Indica si esta estrategia puede manejar la página."""
         return True
 
-    def extract(self, page, page_num: int) -> Tuple[str, List[Dict]]:
+    def extract(self, page, page_num: int) -> Tuple[str, Union[BlockTable, List[Dict]]]:
         """
         Extrae texto (y opcionalmente bloques) de la página.
-        Retorna: (text, blocks)
+        Retorna: (text, blocks) o (text, blocks, info)
         - text: str con el texto plano
-        - blocks: lista de bloques enriquecidos (puede ser [])
+        - blocks: BlockTable (o lista de dicts, que PageExtractor convierte; puede ser vacía)
+        - info: dict opcional con metadatos de la página (p.ej. "ocr_stats")
+          que se agrega tal cual al resultado de la página
         """
         ...
@@ -0,0 +1,271 @@
+# src/services/extractors/block_table.py
+"""
+Bloques de texto de una o varias páginas en columnas, en lugar de un dict por bloque:
+  coords     (n, 4) float64  x0, y0, x1, y1 (top-left)
+  page       (n,)   int32
+  page_size  (n, 2) float64  ancho y alto de la página (NaN = desconocido)
+  conf       (n,)   float32  confianza OCR (NaN = None)
+  source     (n,)   uint8    código en SOURCES
+  kind       (n,)   uint8    código en KINDS
+  text       lista de n str
+  block_number / flags (n,) int32, opcionales: ids de PyMuPDF/Tesseract que
+  conservan las estrategias NativeExtractor / OCRExtractor.
+
+Las tablas no se modifican: take/with_page/concat devuelven tablas nuevas que
+comparten las columnas que no cambian. Los dicts por bloque se arman recién al
+serializar (to_json, ver services/serialization.py).
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+NATIVE, OCR = "native", "ocr"
+# Valores internados de source/kind: la columna guarda el índice (otros valores => None)
+SOURCES = (None, NATIVE, OCR)
+KINDS = (None, "block", "line", "word")
+_SOURCE_CODE = {v: i for i, v in enumerate(SOURCES)}
+_KIND_CODE = {v: i for i, v in enumerate(KINDS)}
+
+
+def _code(value: Optional[str], codes: Dict[Optional[str], int]) -> int:
+    return codes.get(value, 0)
+
+
+def _column(value, n: int, dtype) -> np.ndarray:
+    """Array de n elementos a partir de un escalar o de una secuencia."""
+    if np.ndim(value) == 0:
+        return np.full(n, value, dtype=dtype)
+    return np.asarray(value, dtype=dtype)
+
+
+def _num(value) -> Optional[Union[int, float]]:
+    if np.isnan(value):
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class BlockTable:
+    __slots__ = ("coords", "page", "page_size", "conf", "source", "kind", "text",
+                 "block_number", "flags")
+
+    def __init__(self, coords: np.ndarray, text: List[str], page: np.ndarray, page_size: np.ndarray,
+                 conf: np.ndarray, source: np.ndarray, kind: np.ndarray,
+                 block_number: Optional[np.ndarray] = None, flags: Optional[np.ndarray] = None):
+        self.coords = coords
+        self.text = text
+        self.page = page
+        self.page_size = page_size
+        self.conf = conf
+        self.source = source
+        self.kind = kind
+        self.block_number = block_number
+        self.flags = flags
+
+    # -------------------- construcción --------------------
+
+    @classmethod
+    def build(cls, coords, text: List[str], *, page=0, page_width=np.nan, page_height=np.nan,
+              conf=np.nan, source: Optional[str] = None, kind: Optional[str] = None,
+              block_number=None, flags=None) -> "BlockTable":
+        """Tabla a partir de columnas; page/page_size/conf/source/kind aceptan un valor para todas las filas."""
+        n = len(text)
+        coords = np.asarray(coords, dtype=np.float64).reshape(n, 4)
+        page_size = np.empty((n, 2), dtype=np.float64)
+        page_size[:, 0] = _column(np.nan if page_width is None else page_width, n, np.float64)
+        page_size[:, 1] = _column(np.nan if page_height is None else page_height, n, np.float64)
+        return cls(
+            coords, list(text),
+            page=_column(page, n, np.int32),
+            page_size=page_size,
+            conf=_column(conf, n, np.float32),
+            source=np.full(n, _code(source, _SOURCE_CODE), dtype=np.uint8),
+            kind=np.full(n, _code(kind, _KIND_CODE), dtype=np.uint8),
+            block_number=None if block_number is None else _column(block_number, n, np.int32),
+            flags=None if flags is None else _column(flags, n, np.int32),
+        )
+
+    @classmethod
+    def empty(cls) -> "BlockTable":
+        return cls.build([], [])
+
+    @classmethod
+    def from_dicts(cls, blocks: Iterable[Dict[str, Any]], *, source: Optional[str] = None,
+                   kind: Optional[str] = None) -> "BlockTable":
+        """
+        Tabla a partir de bloques dict (payloads externos, entradas viejas del cache OCR).
+        `source`/`kind` se usan para los bloques que no los traen.
+        """
+        blocks = list(blocks or [])
+        if not blocks:
+            return cls.empty()
+        with_ids = all("block_number" in b for b in blocks)
+        table = cls.build(
+            [[float(c) for c in b.get("coordinates", [0, 0, 0, 0])] for b in blocks],
+            [b.get("text", "") or "" for b in blocks],
+            page=[int(b.get("page", 1)) for b in blocks],
+            page_width=[b.get("page_width") or np.nan for b in blocks],
+            page_height=[b.get("page_height") or np.nan for b in blocks],
+            conf=[np.nan if b.get("conf") is None else b["conf"] for b in blocks],
+            block_number=[b["block_number"] for b in blocks] if with_ids else None,
+            flags=[b.get("flags", 0) for b in blocks] if with_ids else None,
+        )
+        table.source[:] = [_code(b.get("source", source), _SOURCE_CODE) for b in blocks]
+        table.kind[:] = [_code(b.get("kind", kind), _KIND_CODE) for b in blocks]
+        return table
+
+    @classmethod
+    def from_columns(cls, data: Dict[str, Any]) -> "BlockTable":
+        """Inversa de to_columns()."""
+        return cls(
+            np.asarray(data["coords"], dtype=np.float64).reshape(-1, 4),
+            list(data["text"]),
+            page=np.asarray(data["page"], dtype=np.int32),
+            page_size=np.asarray([[np.nan if v is None else v for v in row] for row in data["page_size"]],
+                                 dtype=np.float64).reshape(-1, 2),
+            conf=np.asarray([np.nan if v is None else v for v in data["conf"]], dtype=np.float32),
+            source=np.asarray([_code(v, _SOURCE_CODE) for v in data["source"]], dtype=np.uint8),
+            kind=np.asarray([_code(v, _KIND_CODE) for v in data["kind"]], dtype=np.uint8),
+            block_number=None if data.get("block_number") is None else np.asarray(data["block_number"], dtype=np.int32),
+            flags=None if data.get("flags") is None else np.asarray(data["flags"], dtype=np.int32),
+        )
+
+    @classmethod
+    def concat(cls, tables: Sequence["BlockTable"]) -> "BlockTable":
+        """Una tabla con las filas de todas, en orden. block_number/flags sólo si todas los tienen."""
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+        with_ids = all(t.block_number is not None for t in tables)
+        return cls(
+            np.concatenate([t.coords for t in tables]),
+            [s for t in tables for s in t.text],
+            page=np.concatenate([t.page for t in tables]),
+            page_size=np.concatenate([t.page_size for t in tables]),
+            conf=np.concatenate([t.conf for t in tables]),
+            source=np.concatenate([t.source for t in tables]),
+            kind=np.concatenate([t.kind for t in tables]),
+            block_number=np.concatenate([t.block_number for t in tables]) if with_ids else None,
+            flags=np.concatenate([t.flags for t in tables]) if with_ids else None,
+        )
+
+    # -------------------- consultas --------------------
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __repr__(self) -> str:
+        return f"BlockTable({len(self)} bloques)"
+
+    def is_source(self, source: str) -> np.ndarray:
+        return self.source == _SOURCE_CODE[source]
+
+    def by_page(self) -> Dict[int, "BlockTable"]:
+        """Una tabla por página, en el orden en que aparece cada página."""
+        pages, first = np.unique(self.page, return_index=True)
+        if len(pages) == 1:
+            return {int(pages[0]): self}
+        return {int(p): self.take(np.flatnonzero(self.page == p)) for p in pages[np.argsort(first)]}
+
+    # -------------------- transformaciones --------------------
+
+    def take(self, idx) -> "BlockTable":
+        """Filas `idx` (índices o máscara booleana), en ese orden."""
+        idx = np.asarray(idx)
+        if idx.dtype == bool:
+            idx = np.flatnonzero(idx)
+        idx = idx.astype(np.int64, copy=False)
+        return BlockTable(
+            self.coords[idx], [self.text[i] for i in idx.tolist()],
+            page=self.page[idx], page_size=self.page_size[idx], conf=self.conf[idx],
+            source=self.source[idx], kind=self.kind[idx],
+            block_number=None if self.block_number is None else self.block_number[idx],
+            flags=None if self.flags is None else self.flags[idx],
+        )
+
+    def with_page(self, page_num: int, width: Optional[float] = None, height: Optional[float] = None,
+                  *, keep_size: bool = False) -> "BlockTable":
+        """
+        Las mismas filas en la página `page_num` con tamaño (width, height).
+        keep_size=True sólo completa el tamaño de las filas que no lo tienen.
+        """
+        n = len(self)
+        size = np.array([np.nan if width is None else width, np.nan if height is None else height],
+                        dtype=np.float64)
+        page_size = np.where(np.isnan(self.page_size), size, self.page_size) if keep_size \
+            else np.broadcast_to(size, (n, 2)).copy()
+        return BlockTable(self.coords, self.text, page=np.full(n, page_num, dtype=np.int32),
+                          page_size=page_size, conf=self.conf, source=self.source, kind=self.kind,
+                          block_number=self.block_number, flags=self.flags)
+
+    def shifted(self, dx: float, dy: float, first_id: int = 0) -> "BlockTable":
+        """Coordenadas desplazadas (dx, dy) y block_number corrido en first_id."""
+        return BlockTable(self.coords + np.array([dx, dy, dx, dy]), self.text, page=self.page,
+                          page_size=self.page_size, conf=self.conf, source=self.source, kind=self.kind,
+                          block_number=None if self.block_number is None else self.block_number + first_id,
+                          flags=self.flags)
+
+    def flipped_y(self, height: float) -> "BlockTable":
+        """Convierte coordenadas bottom-left a top-left en una página de alto `height`."""
+        coords = self.coords.copy()
+        coords[:, 1] = height - self.coords[:, 3]
+        coords[:, 3] = height - self.coords[:, 1]
+        return BlockTable(coords, self.text, page=self.page, page_size=self.page_size, conf=self.conf,
+                          source=self.source, kind=self.kind, block_number=self.block_number,
+                          flags=self.flags)
+
+    def plain(self) -> "BlockTable":
+        """Sin block_number/flags (esquema unificado de CombinedExtractor)."""
+        if self.block_number is None and self.flags is None:
+            return self
+        return BlockTable(self.coords, self.text, page=self.page, page_size=self.page_size,
+                          conf=self.conf, source=self.source, kind=self.kind)
+
+    # -------------------- serialización --------------------
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        """Un dict por bloque (formato de "blocks" en la respuesta)."""
+        coords = self.coords.tolist()
+        sizes = [[None if v != v else v for v in row] for row in self.page_size.tolist()]
+        ids = self.block_number.tolist() if self.block_number is not None else None
+        flags = self.flags.tolist() if self.flags is not None else None
+        out: List[Dict[str, Any]] = []
+        for i, (page, src, kind, conf) in enumerate(zip(self.page.tolist(), self.source.tolist(),
+                                                        self.kind.tolist(), self.conf.tolist())):
+            b: Dict[str, Any] = {"page": page}
+            if ids is not None:
+                b["block_number"] = ids[i]
+            b["coordinates"] = coords[i]
+            b["text"] = self.text[i]
+            if ids is not None:
+                b["type"] = 0
+                b["flags"] = flags[i]
+            b["page_width"], b["page_height"] = sizes[i]
+            b["source"] = SOURCES[src]
+            b["kind"] = KINDS[kind]
+            b["conf"] = _num(conf)
+            out.append(b)
+        return out
+
+    def to_columns(self) -> Dict[str, Any]:
+        """Columnas como listas (JSON compacto, p. ej. para el cache OCR)."""
+        return {
+            "coords": self.coords.tolist(),
+            "text": self.text,
+            "page": self.page.tolist(),
+            "page_size": [[None if v != v else v for v in row] for row in self.page_size.tolist()],
+            "conf": [_num(v) for v in self.conf.tolist()],
+            "source": [SOURCES[v] for v in self.source.tolist()],
+            "kind": [KINDS[v] for v in self.kind.tolist()],
+            "block_number": None if self.block_number is None else self.block_number.tolist(),
+            "flags": None if self.flags is None else self.flags.tolist(),
+        }
+
+
+def as_block_table(blocks: Union[BlockTable, Iterable[Dict[str, Any]], None]) -> BlockTable:
+    """BlockTable tal cual; listas de dicts (p. ej. un resultado leído del cache) se convierten."""
+    if isinstance(blocks, BlockTable):
+        return blocks
+    return BlockTable.from_dicts(blocks or [])
@@ -1,43 +1,18 @@
 # src/services/extractors/combined.py
 from typing import Tuple, List, Dict, Optional
 from .base import IPageExtractor
-from .native_text import extract_text_from_page, extract_text_blocks_from_page
-from .ocr_text import (
-    extract_text_from_page_with_ocr,
-    extract_text_blocks_from_page_with_ocr_words_and_lines,
-)
+from .block_table import BlockTable
+from .native_text import extract_text_from_page, extract_text_blocks_from_page, native_page
+from .native_words import NativeWords
+from .spatial_index import GridIndex
+from .ocr_text import extract_page_with_ocr, extract_regions_with_ocr
+from .ocr_gate import classify_page, page_image_rects
+from .regions import uncovered_regions
+from src.services.deadline import DeadlineExceeded, OCR_CUT_OFF
 
-def _norm_native_blocks(blocks: List[Dict], page_num: int, pw: float, ph: float) -> List[Dict]:
-    res: List[Dict] = []
-    for b in blocks or []:
-        nb = {
-            "page": page_num,
-            "coordinates": [float(c) for c in b.get("coordinates", [0,0,0,0])],
-            "text": b.get("text", ""),
-            "page_width": float(pw),
-            "page_height": float(ph),
-            "source": "native",
-            "kind": "block",
-            "conf": None,
-        }
-        res.append(nb)
-    return res
-
-def _norm_ocr_blocks(blocks: List[Dict], page_num: int, pw: float, ph: float) -> List[Dict]:
-    res: List[Dict] = []
-    for b in blocks or []:
-        nb = {
-            "page": page_num,
-            "coordinates": [float(c) for c in b.get("coordinates", [0,0,0,0])],
-            "text": b.get("text", ""),
-            "page_width": float(pw),
-            "page_height": float(ph),
-            "source": "ocr",
-            "kind": b.get("kind", "line"),
-            "conf": b.get("conf", None),
-        }
-        res.append(nb)
-    return res
+def _norm_blocks(blocks: BlockTable, page_num: int, pw: float, ph: float) -> BlockTable:
+    """Bloques en el esquema unificado: página y tamaño de página, sin ids de PyMuPDF/Tesseract."""
+    return blocks.plain().with_page(page_num, pw, ph)
 
 def _iou(a, b):
     ax0, ay0, ax1, ay1 = a; bx0, by0, bx1, by1 = b
@@ -53,54 +28,142 @@ def _iou(a, b):
 def _norm_text(s: str) -> str:
     return (s or "").strip().replace(" ", "").replace("\n", "")
 
-def _merge_dedupe(native_blocks: List[Dict], ocr_blocks: List[Dict], iou_thr=0.7) -> List[Dict]:
-    """Mantiene nativos; agrega OCR si aporta algo en caja distinta."""
-    merged: List[Dict] = list(native_blocks)
-    for ob in ocr_blocks:
-        ob_norm = _norm_text(ob.get("text", ""))
-        dup = False
-        for nb in merged:
-            if _iou(ob["coordinates"], nb["coordinates"]) >= iou_thr:
-                if _norm_text(nb.get("text", "")) == ob_norm or len(ob_norm) <= 2:
-                    dup = True
-                    break
+def _merge_dedupe(native_blocks: BlockTable, ocr_blocks: BlockTable, iou_thr=0.7,
+                  cell_size: float = 32.0) -> BlockTable:
+    """
+    Mantiene nativos; agrega OCR si aporta algo en caja distinta.
+    Los candidatos a duplicado salen de una grilla (GridIndex) con los bloques ya
+    aceptados, en lugar de comparar contra todos; el texto se normaliza una vez por bloque.
+    """
+    rects: List[List[float]] = native_blocks.coords.tolist()
+    norms = [_norm_text(t) for t in native_blocks.text]
+    index = GridIndex(cell_size)
+    for i, r in enumerate(rects):
+        index.insert(i, r)
+
+    keep: List[int] = []
+    for j, (coords, text) in enumerate(zip(ocr_blocks.coords.tolist(), ocr_blocks.text)):
+        ob_norm = _norm_text(text)
+        # Con iou_thr > 0 sólo puede ser duplicado un bloque que se superpone (comparte celda)
+        candidates = index.query(coords) if iou_thr > 0 else range(len(rects))
+        dup = any(
+            (len(ob_norm) <= 2 or norms[i] == ob_norm)
+            and _iou(coords, rects[i]) >= iou_thr
+            for i in candidates
+        )
         if not dup:
-            merged.append(ob)
-    return merged
+            index.insert(len(rects), coords)
+            rects.append(coords)
+            norms.append(ob_norm)
+            keep.append(j)
+    return BlockTable.concat([native_blocks, ocr_blocks.take(keep)])
 
 class CombinedExtractor(IPageExtractor):
     """
     Corre Nativo y OCR, normaliza y une resultados en un esquema unificado.
-    - ocr_always=True: siempre ejecuta OCR (recomendado para robustez).
-    - Si ocr_always=False: ejecuta OCR sólo si el texto nativo es pobre (< ocr_min_native_chars).
+    - ocr_always=True: siempre ejecuta OCR.
+    - Si ocr_always=False: un clasificador (ocr_gate.classify_page) decide por página
+      con señales baratas (densidad de texto nativo, cobertura de imágenes, glifos
+      sin unicode, < ocr_min_native_chars). La decisión y el motivo quedan en
+      "ocr_decision" del resultado de la página.
+    - ocr_regions={page: [rects] | None}: OCR guiado por plantilla; sólo se OCRean
+      esos recortes (coords PDF). None => página completa; páginas ausentes no se OCRean.
+    - ocr_scope="images": fuera del modo plantilla, si la página va a OCR por cobertura de
+      imágenes (reason "image_coverage") sólo se OCRean las partes de las imágenes que no
+      cubre el texto nativo (el texto nativo se enmascara). Con cualquier otro motivo (poco
+      o ningún texto nativo: puede haber texto vectorial fuera de las imágenes) se OCRea la
+      página completa, igual que con "page".
+    - Si se agota el deadline del request durante el OCR, la página queda con lo nativo
+      y "truncated": "ocr_cut_off".
+    - native_mode="words": lo nativo sale por línea (kind "line") en lugar de por bloque
+      de PyMuPDF, y las palabras van en "native_words" (NativeWords, arrays compactos)
+      para que la plantilla lea sus boxes palabra por palabra. "blocks": bloques de PyMuPDF.
     """
-    def __init__(self, ocr_always: bool = True, ocr_min_native_chars: int = 0, dpi=300, lang="spa+eng", min_conf=40):
+    def __init__(self, ocr_always: bool = True, ocr_min_native_chars: int = 0, dpi=300, lang="spa+eng", min_conf=40,
+                 ocr_regions: Optional[Dict[int, Optional[List]]] = None, ocr_scope: str = "page",
+                 native_mode: str = "blocks"):
         self.ocr_always = ocr_always
         self.ocr_min_native_chars = ocr_min_native_chars
         self.dpi = dpi
         self.lang = lang
         self.min_conf = min_conf
+        self.ocr_regions = ocr_regions
+        self.ocr_scope = ocr_scope
+        self.native_mode = native_mode
 
     def can_handle(self, page) -> bool:
         return True
 
-    def extract(self, page, page_num: int) -> Tuple[str, List[Dict]]:
+    def config(self) -> Dict:
+        """Parámetros que afectan el resultado (p.ej. para claves de cache)."""
+        return {
+            "ocr_always": self.ocr_always,
+            "ocr_min_native_chars": self.ocr_min_native_chars,
+            "dpi": self.dpi,
+            "lang": self.lang,
+            "min_conf": self.min_conf,
+            "ocr_regions": self.ocr_regions,
+            "ocr_scope": self.ocr_scope,
+            "native_mode": self.native_mode,
+        }
+
+    def extract(self, page, page_num: int) -> Tuple[str, BlockTable, Dict]:
         pw, ph = float(page.rect.width), float(page.rect.height)
 
         # Nativo
         text_nat = extract_text_from_page(page)
-        blocks_nat_raw = extract_text_blocks_from_page(page, page_num)
-        blocks_nat = _norm_native_blocks(blocks_nat_raw, page_num, pw, ph)
+        info: Dict = {}
+        if self.native_mode == "words":
+            words = NativeWords.from_page(page)
+            blocks_nat = _norm_blocks(words.lines(), page_num, pw, ph)
+            info["native_words"] = words
+        else:
+            blocks_nat = _norm_blocks(extract_text_blocks_from_page(page, page_num), page_num, pw, ph)
 
         # OCR condicional
-        do_ocr = self.ocr_always or (len((text_nat or "").strip()) < self.ocr_min_native_chars)
-        text_ocr, blocks_ocr = "", []
-        if do_ocr:
-            text_ocr = extract_text_from_page_with_ocr(page, dpi=self.dpi, lang=self.lang)
-            blocks_ocr_raw = extract_text_blocks_from_page_with_ocr_words_and_lines(
-                page, page_num, dpi=self.dpi, lang=self.lang, min_conf=self.min_conf
-            )
-            blocks_ocr = _norm_ocr_blocks(blocks_ocr_raw, page_num, pw, ph)
+        image_rects = None
+        if self.ocr_always:
+            decision = {"ocr": True, "reason": "ocr_always"}
+        else:
+            image_rects = page_image_rects(page)
+            decision = classify_page(page, text_nat, image_rects=image_rects,
+                                     missing_unicode=native_page(page).missing_unicode(),
+                                     min_native_chars=self.ocr_min_native_chars)
+        regions, masks, scope = None, None, "regions"
+        if decision["ocr"] and self.ocr_regions is not None:
+            if page_num not in self.ocr_regions:
+                decision = {**decision, "ocr": False, "reason": "outside_template"}
+            else:
+                regions = self.ocr_regions[page_num]
+        elif decision["ocr"] and self.ocr_scope == "images" and decision["reason"] == "image_coverage":
+            if image_rects is None:
+                image_rects = page_image_rects(page)
+            if image_rects:
+                masks = [tuple(r) for r in blocks_nat.coords.tolist()]
+                regions = uncovered_regions([tuple(r) for r in image_rects], masks)
+                scope = "images"
+                if not regions:
+                    decision = {**decision, "ocr": False, "reason": "images_covered_by_native_text"}
+
+        text_ocr, blocks_ocr = "", BlockTable.empty()
+        info["ocr_decision"] = decision
+        if decision["ocr"]:
+            try:
+                if regions is not None:
+                    decision["scope"] = scope
+                    text_ocr, blocks_ocr_raw, info["ocr_stats"] = extract_regions_with_ocr(
+                        page, page_num, regions, dpi=self.dpi, lang=self.lang, min_conf=self.min_conf,
+                        masks=masks,
+                    )
+                else:
+                    # Una sola rasterización + una sola corrida de Tesseract
+                    decision["scope"] = "page"
+                    text_ocr, blocks_ocr_raw, info["ocr_stats"] = extract_page_with_ocr(
+                        page, page_num, dpi=self.dpi, lang=self.lang, min_conf=self.min_conf
+                    )
+                blocks_ocr = _norm_blocks(blocks_ocr_raw, page_num, pw, ph)
+            except DeadlineExceeded:
+                info["truncated"] = OCR_CUT_OFF
 
         # Merge
         blocks = _merge_dedupe(blocks_nat, blocks_ocr, iou_thr=0.7)
@@ -113,4 +176,4 @@ class CombinedExtractor(IPageExtractor):
             if ot and ot not in nt:
                 combined_text = (combined_text + "\n\n" + text_ocr).strip()
 
-        return combined_text, blocks
+        return combined_text, blocks, info
@@ -1,19 +1,19 @@
 # extractors/native
 
 
-from typing import Tuple, List, Dict
+from typing import Tuple
 from .base import IPageExtractor
-from .native_text import extract_text_from_page, extract_text_blocks_from_page
+from .block_table import BlockTable
+from .native_text import extract_text_from_page, extract_text_blocks_from_page, has_native_text
 
 class NativeExtractor(IPageExtractor):
     """Estrategia para páginas con texto nativo (PyMuPDF)."""
 
     def can_handle(self, page) -> bool:
-        # Si la página devuelve algo de texto -> es nativa
-        txt = page.get_text("text").strip()
-        return len(txt) > 0
+        # Si la página devuelve algo de texto -> es nativa (mismo TextPage que extract)
+        return has_native_text(page)
 
-    def extract(self, page, page_num: int) -> Tuple[str, List[Dict]]:
+    def extract(self, page, page_num: int) -> Tuple[str, BlockTable]:
         text = extract_text_from_page(page)
         blocks = extract_text_blocks_from_page(page, page_num)
         return text, blocks
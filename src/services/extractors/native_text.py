@@ -1,38 +1,118 @@
 # src/services/extractors/native_text.py
+"""
+Capa de texto nativo de PyMuPDF.
+Cada página arma un único TextPage (NativePage) y de él salen el texto, los
+bloques, las palabras y la señal de selección de estrategia (has_native_text),
+en lugar de que cada page.get_text(...) vuelva a parsear la página.
+El NativePage vive mientras vive el objeto Page.
+"""
+from typing import List, Optional, Tuple
 import fitz
 
+from .block_table import BlockTable, NATIVE
+
+# Mismos flags que usa get_text para "text", "blocks" y "words" (el resultado no cambia)
+TEXT_FLAGS = fitz.TEXTFLAGS_TEXT
+# Sin TEXT_CID_FOR_UNKNOWN_UNICODE: los glifos sin unicode salen como U+FFFD y no como el CID crudo
+STRICT_TEXT_FLAGS = TEXT_FLAGS & ~fitz.TEXT_CID_FOR_UNKNOWN_UNICODE
+REPLACEMENT_CHAR = "\ufffd"
+_ATTR = "_native_page"
+
+
+class NativePage:
+    """Texto nativo de una página, derivado de un solo TextPage."""
+
+    def __init__(self, page: "fitz.Page"):
+        self.page = page
+        self._textpage: Optional["fitz.TextPage"] = None
+        self._text: Optional[str] = None
+        self._missing_unicode: Optional[int] = None
+
+    @property
+    def textpage(self) -> "fitz.TextPage":
+        if self._textpage is None:
+            self._textpage = self.page.get_textpage(flags=TEXT_FLAGS)
+        return self._textpage
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.page.get_text("text", textpage=self.textpage).strip()
+        return self._text
+
+    def _fonts_without_unicode(self) -> bool:
+        """Alguna fuente compuesta (Type0) o Type3 de la página no tiene /ToUnicode."""
+        doc = self.page.parent
+        for font in self.page.get_fonts(full=True):
+            xref, font_type = font[0], font[2]
+            if xref and font_type in ("Type0", "Type3") and doc.xref_get_key(xref, "ToUnicode")[0] == "null":
+                return True
+        return False
+
+    def missing_unicode(self) -> int:
+        """
+        Glifos que PyMuPDF no pudo mapear a unicode (texto basura). text() los trae como
+        CIDs crudos, así que sólo si hay fuentes sin /ToUnicode se vuelve a leer el texto
+        con STRICT_TEXT_FLAGS y se cuentan los U+FFFD.
+        """
+        if self._missing_unicode is None:
+            missing = 0
+            if self.text() and self._fonts_without_unicode():
+                missing = self.page.get_text("text", flags=STRICT_TEXT_FLAGS).count(REPLACEMENT_CHAR)
+            self._missing_unicode = missing
+        return self._missing_unicode
+
+    def has_text(self) -> bool:
+        """Señal para elegir estrategia: la página tiene texto nativo."""
+        return len(self.text()) > 0
+
+    def raw_blocks(self) -> List[Tuple]:
+        # [(x0,y0,x1,y1,text, block_no, block_type, flags)]
+        return self.page.get_text("blocks", textpage=self.textpage)
+
+    def words(self) -> List[Tuple]:
+        # [(x0,y0,x1,y1,word, block_no, line_no, word_no)]
+        return self.page.get_text("words", textpage=self.textpage)
+
+
+def native_page(page: "fitz.Page") -> NativePage:
+    """NativePage de la página: se crea la primera vez y se reutiliza en las siguientes."""
+    native = getattr(page, _ATTR, None)
+    if native is None:
+        native = NativePage(page)
+        setattr(page, _ATTR, native)
+    return native
+
+
+def has_native_text(page) -> bool:
+    return native_page(page).has_text()
+
+
 def extract_text_from_page(page):
     try:
-        return page.get_text("text").strip()
+        return native_page(page).text()
     except Exception as e:
         raise Exception(f"Error extrayendo texto: {str(e)}")
 
-def extract_text_blocks_from_page(page, page_num):
-    """Bloques nativos de PyMuPDF. Solo texto (type==0)."""
-    all_blocks = []
+def extract_text_blocks_from_page(page, page_num) -> BlockTable:
+    """Bloques nativos de PyMuPDF (BlockTable, source "native", kind "block"). Solo texto (type==0)."""
+    coords, texts, ids, flags = [], [], [], []
     try:
-        blocks = page.get_text("blocks")  # [(x0,y0,x1,y1,text, block_no, block_type, flags)]
+        blocks = native_page(page).raw_blocks()
         for block in blocks:
             if len(block) < 7:
                 continue
-            x0, y0, x1, y1 = float(block[0]), float(block[1]), float(block[2]), float(block[3])
             text = (block[4] or "").strip()
-            block_no = int(block[5])
             block_type = int(block[6])  # 0=text
-            flags = int(block[7]) if len(block) >= 8 else 0
             if block_type != 0 or not text:
                 continue
-            all_blocks.append({
-                "page": page_num,
-                "block_number": block_no,
-                "coordinates": [x0, y0, x1, y1],
-                "text": text,
-                "type": 0,
-                "flags": flags,
-            })
+            coords.append((float(block[0]), float(block[1]), float(block[2]), float(block[3])))
+            texts.append(text)
+            ids.append(int(block[5]))
+            flags.append(int(block[7]) if len(block) >= 8 else 0)
     except Exception as e:
         raise Exception(f"Error extrayendo bloques: {str(e)}")
-    return all_blocks
+    return BlockTable.build(coords, texts, page=page_num,
+                            source=NATIVE, kind="block", block_number=ids, flags=flags)
 
 def extract_text(pdf_file):
     text = ""
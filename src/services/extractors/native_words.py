@@ -0,0 +1,81 @@
+# src/services/extractors/native_words.py
+"""
+Palabras nativas de una página (page.get_text("words") sobre el TextPage
+compartido) guardadas en arrays paralelos en lugar de un dict por palabra:
+coordenadas en float32 (n, 4), texto en una lista y el índice de línea de
+cada palabra. Una página con miles de palabras ocupa unos pocos arrays.
+
+Las líneas (bloque + línea de PyMuPDF) se derivan de las palabras como BlockTable;
+los dicts sólo se arman al serializar.
+"""
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from .block_table import BlockTable, NATIVE
+from .native_text import native_page
+
+
+class NativeWords:
+    __slots__ = ("coords", "text", "line")
+
+    def __init__(self, coords: np.ndarray, text: List[str], line: np.ndarray):
+        self.coords = coords  # (n, 4) float32: x0, y0, x1, y1 (top-left)
+        self.text = text      # n palabras
+        self.line = line      # (n,) int32: línea de cada palabra, en orden de lectura de PyMuPDF
+
+    @classmethod
+    def from_page(cls, page) -> "NativeWords":
+        words = native_page(page).words()  # (x0, y0, x1, y1, word, block_no, line_no, word_no)
+        n = len(words)
+        coords = np.empty((n, 4), dtype=np.float32)
+        line = np.empty(n, dtype=np.int32)
+        text: List[str] = []
+        line_ids: Dict[tuple, int] = {}
+        for i, w in enumerate(words):
+            coords[i] = w[:4]
+            text.append(w[4])
+            line[i] = line_ids.setdefault((w[5], w[6]), len(line_ids))
+        return cls(coords, text, line)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def lines(self) -> BlockTable:
+        """Una fila por línea (caja = unión de sus palabras), source "native", kind "line"."""
+        return self._group(np.arange(len(self), dtype=np.int64))
+
+    def lines_in_rect(self, rect: Sequence[float], tol: float = 0.0) -> BlockTable:
+        """
+        Como lines() pero sólo con las palabras cuyo centro cae dentro de `rect`
+        (coords PDF, ampliado `tol`): las palabras que apenas tocan el borde no entran.
+        """
+        if not len(self):
+            return BlockTable.empty()
+        x0, y0, x1, y1 = (float(v) for v in rect)
+        cx = (self.coords[:, 0] + self.coords[:, 2]) * 0.5
+        cy = (self.coords[:, 1] + self.coords[:, 3]) * 0.5
+        inside = (cx >= x0 - tol) & (cx <= x1 + tol) & (cy >= y0 - tol) & (cy <= y1 + tol)
+        return self._group(np.flatnonzero(inside))
+
+    def _group(self, idx: np.ndarray) -> BlockTable:
+        if not len(idx):
+            return BlockTable.empty()
+        # Estable: dentro de cada línea las palabras quedan en orden de lectura
+        idx = idx[np.argsort(self.line[idx], kind="stable")]
+        starts = np.flatnonzero(np.diff(self.line[idx], prepend=-1))
+        box = self.coords[idx]
+        coords = np.stack([np.minimum.reduceat(box[:, 0], starts), np.minimum.reduceat(box[:, 1], starts),
+                           np.maximum.reduceat(box[:, 2], starts), np.maximum.reduceat(box[:, 3], starts)],
+                          axis=1)
+        order = idx.tolist()
+        bounds = starts.tolist() + [len(order)]
+        text = [" ".join(self.text[i] for i in order[a:b]) for a, b in zip(bounds, bounds[1:])]
+        return BlockTable.build(coords, text, source=NATIVE, kind="line")
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "text": self.text,
+            "coordinates": np.round(self.coords.astype(np.float64), 2).tolist(),
+            "line": self.line.tolist(),
+        }
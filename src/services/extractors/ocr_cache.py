@@ -0,0 +1,77 @@
+# src/services/extractors/ocr_cache.py
+"""
+Cache persistente de resultados OCR direccionado por contenido.
+
+Clave: digest de los píxeles que recibe Tesseract (página o recorte ya
+rasterizado y enmascarado) + configuración OCR (dpi, lang, psm, min_conf) +
+versión del formato (CACHE_FORMAT).
+Valor: texto y bloques de línea/palabra (columnas de BlockTable) en coordenadas locales a la imagen;
+al leerlos se reubican en la página y el número de página actuales, por eso
+páginas idénticas de documentos distintos (condiciones, membretes) se reutilizan.
+
+Configuración:
+  OCR_CACHE_ENABLED  (default "1")
+  OCR_CACHE_PATH     (default <tmp>/pdf_extractor/ocr_cache.sqlite)
+  OCR_CACHE_MAX_MB   (default 512)
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+from src.services.cache.sqlite_cache import SqliteLRUCache
+from .block_table import BlockTable
+from .raster import RasterPage
+
+
+# Formato de los valores: cambiarlo invalida las entradas guardadas con otro
+CACHE_FORMAT = 2  # 2: bloques como columnas de BlockTable
+
+
+def ocr_cache_key(raster: RasterPage, lang: str, psm: int, min_conf: int) -> str:
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_FORMAT}|{raster.dpi}|{lang}|{psm}|{min_conf}|{raster.width}x{raster.height}|".encode())
+    h.update(raster.samples())
+    return h.hexdigest()
+
+
+class OCRCache:
+    """Envoltorio de SqliteLRUCache que serializa (text, blocks) de una imagen OCReada."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self._store = SqliteLRUCache(path, max_bytes)
+
+    def get(self, key: str) -> Optional[Tuple[str, BlockTable]]:
+        raw = self._store.get(key)
+        if raw is None:
+            return None
+        payload = json.loads(raw)
+        return payload["text"], BlockTable.from_columns(payload["blocks"])
+
+    def put(self, key: str, text: str, blocks: BlockTable) -> None:
+        payload = json.dumps({"text": text, "blocks": blocks.to_columns()}, separators=(",", ":"))
+        self._store.put(key, payload.encode("utf-8"))
+
+    def stats(self) -> Dict:
+        return self._store.stats()
+
+
+_cache: Optional[OCRCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """Cache compartido por proceso, o None si está deshabilitado."""
+    global _cache
+    if os.getenv("OCR_CACHE_ENABLED", "1") != "1":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                path = os.getenv("OCR_CACHE_PATH") or os.path.join(
+                    tempfile.gettempdir(), "pdf_extractor", "ocr_cache.sqlite")
+                max_mb = float(os.getenv("OCR_CACHE_MAX_MB", "512"))
+                _cache = OCRCache(path, int(max_mb * 1024 * 1024))
+    return _cache
@@ -0,0 +1,75 @@
+# src/services/extractors/ocr_gate.py
+"""
+Clasificador barato para decidir si una página necesita OCR.
+Usa sólo señales que PyMuPDF ya tiene sin rasterizar:
+  - densidad de caracteres nativos (chars por pulgada cuadrada de página)
+  - cobertura de imágenes (rects donde se dibujan imágenes / área de página)
+  - glifos sin unicode (NativePage.missing_unicode: fuentes sin /ToUnicode)
+"""
+from typing import Dict, List, Optional
+import fitz
+
+from .native_text import REPLACEMENT_CHAR
+
+MIN_CHARS_PER_SQ_INCH = 2.0     # una factura digital típica tiene >10
+MAX_IMAGE_COVERAGE = 0.35       # más de esto: página escaneada o con imágenes grandes
+MAX_MISSING_UNICODE_RATIO = 0.05
+
+
+def page_image_rects(page: "fitz.Page") -> List["fitz.Rect"]:
+    """Rects (coords de página) donde se dibujan imágenes, recortados a la página."""
+    rects = []
+    for info in page.get_image_info():
+        r = fitz.Rect(info.get("bbox") or (0, 0, 0, 0)) & page.rect
+        if not r.is_empty:
+            rects.append(r)
+    return rects
+
+
+def classify_page(
+    page: "fitz.Page",
+    native_text: str,
+    *,
+    image_rects: Optional[List["fitz.Rect"]] = None,
+    missing_unicode: Optional[int] = None,
+    min_native_chars: int = 0,
+    min_chars_per_sq_inch: float = MIN_CHARS_PER_SQ_INCH,
+    max_image_coverage: float = MAX_IMAGE_COVERAGE,
+    max_missing_unicode_ratio: float = MAX_MISSING_UNICODE_RATIO,
+) -> Dict:
+    """
+    Retorna {"ocr": bool, "reason": str, "signals": {...}}.
+    reason: no_native_text | missing_unicode | low_text_density | image_coverage | native_text_ok
+    missing_unicode: glifos sin unicode (NativePage.missing_unicode); None => los U+FFFD de
+    native_text (el texto de NativePage trae CIDs crudos en su lugar, no U+FFFD).
+    """
+    text = native_text or ""
+    chars = sum(1 for ch in text if not ch.isspace())
+    missing = text.count(REPLACEMENT_CHAR) if missing_unicode is None else missing_unicode
+
+    pw, ph = float(page.rect.width), float(page.rect.height)
+    page_area = max(pw * ph, 1e-6)
+    area_sq_in = page_area / (72.0 * 72.0)
+
+    if image_rects is None:
+        image_rects = page_image_rects(page)
+    image_area = sum(r.width * r.height for r in image_rects)
+
+    signals = {
+        "native_chars": chars,
+        "chars_per_sq_inch": round(chars / area_sq_in, 2),
+        "image_coverage": round(min(image_area / page_area, 1.0), 3),
+        "missing_unicode_ratio": round(missing / chars, 3) if chars else 0.0,
+    }
+
+    if chars == 0 or chars < min_native_chars:
+        reason = "no_native_text"
+    elif signals["missing_unicode_ratio"] > max_missing_unicode_ratio:
+        reason = "missing_unicode"
+    elif signals["chars_per_sq_inch"] < min_chars_per_sq_inch:
+        reason = "low_text_density"
+    elif signals["image_coverage"] > max_image_coverage:
+        reason = "image_coverage"
+    else:
+        return {"ocr": False, "reason": "native_text_ok", "signals": signals}
+    return {"ocr": True, "reason": reason, "signals": signals}
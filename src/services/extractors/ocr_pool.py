@@ -0,0 +1,202 @@
+# src/services/extractors/ocr_pool.py
+"""
+Pool de workers OCR de larga vida.
+
+Con `tesserocr` instalado cada worker mantiene su propio motor de Tesseract
+(PyTessBaseAPI) con los traineddata ya cargados y recibe la imagen en memoria:
+no hay fork de `tesseract` ni archivos temporales por llamada.
+Sin `tesserocr` (p. ej. en Windows, donde no hay wheels oficiales) queda un
+modo degradado: pytesseract, con un subproceso `tesseract` por llamada, igualmente
+a través del pool para acotar la cantidad de OCR concurrentes. Se avisa una vez
+al crear el pool; `OCRPool.persistent` indica el modo.
+
+Los traineddata se buscan en TESSDATA_PREFIX (directorio tessdata); sin esa
+variable, en la instalación por defecto de Windows si existe, si no donde
+tesserocr fue compilado.
+
+Tamaño configurable con OCR_POOL_SIZE (default: cantidad de CPUs). En los
+procesos worker de PdfProcessor (PDF_WORKERS > 1) ese total se reparte entre
+los procesos (ver init_worker_ocr_pool).
+
+Con un Deadline (ver services/deadline.py) la espera en la cola y la corrida
+de Tesseract quedan acotadas al tiempo restante: pytesseract mata el
+subproceso y tesserocr cancela Recognize; en ambos casos DeadlineExceeded.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+
+import pytesseract
+from PIL import Image
+
+from src.services.deadline import Deadline, DeadlineExceeded
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+_WINDOWS_TESSDATA = r"C:\Program Files\Tesseract-OCR\tessdata"
+
+
+def tessdata_path() -> Optional[str]:
+    """Directorio tessdata a usar: TESSDATA_PREFIX o el de Windows por defecto (None = el de tesserocr)."""
+    path = os.getenv("TESSDATA_PREFIX")
+    if path:
+        return path
+    return _WINDOWS_TESSDATA if os.path.isdir(_WINDOWS_TESSDATA) else None
+
+# Columnas de image_to_data (mismo formato que pytesseract.Output.DICT)
+_TSV_INT_COLS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                 "left", "top", "width", "height")
+
+
+def _parse_tsv(tsv: str) -> Dict[str, List]:
+    """Convierte la salida TSV de Tesseract al dict de pytesseract.image_to_data."""
+    data: Dict[str, List] = {k: [] for k in _TSV_INT_COLS}
+    data["conf"] = []
+    data["text"] = []
+    for row in (tsv or "").splitlines():
+        cols = row.split("\t")
+        if len(cols) < 11 or cols[0] == "level":
+            continue
+        for k, v in zip(_TSV_INT_COLS, cols):
+            data[k].append(int(v))
+        data["conf"].append(float(cols[10]))
+        data["text"].append(cols[11] if len(cols) > 11 else "")
+    return data
+
+
+class OCRPool:
+    """Ejecuta image_to_data en un pool acotado de workers que reutilizan su motor OCR."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = max(1, int(size or os.cpu_count() or 1))
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="ocr")
+        self._local = threading.local()
+        self._engines: List = []
+        self._lock = threading.Lock()
+        if tesserocr is None:
+            logger.warning("tesserocr no está instalado: OCR degradado a un subproceso "
+                           "tesseract por llamada (pytesseract)")
+
+    @property
+    def persistent(self) -> bool:
+        """True si los workers mantienen el motor cargado (tesserocr)."""
+        return tesserocr is not None
+
+    def _engine(self, lang: str, psm: int):
+        """Motor tesserocr del worker actual para (lang, psm); se crea una sola vez."""
+        engines = getattr(self._local, "engines", None)
+        if engines is None:
+            engines = self._local.engines = {}
+        api = engines.get((lang, psm))
+        if api is None:
+            kwargs = {"lang": lang, "psm": psm, "oem": tesserocr.OEM.DEFAULT}
+            path = tessdata_path()
+            if path:
+                kwargs["path"] = path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            engines[(lang, psm)] = api
+            with self._lock:
+                self._engines.append(api)
+        return api
+
+    def _run(self, img: Image.Image, lang: str, psm: int,
+             deadline: Optional[Deadline] = None) -> Dict[str, List]:
+        # timeout 0 = sin límite (en ambos motores)
+        timeout = 0.0
+        if deadline is not None:
+            deadline.check()
+            timeout = max(deadline.remaining(), 0.001)
+        if tesserocr is None:
+            try:
+                return pytesseract.image_to_data(
+                    img,
+                    output_type=pytesseract.Output.DICT,
+                    lang=lang,
+                    config=f"--oem 3 --psm {psm}",
+                    timeout=timeout,
+                )
+            except RuntimeError as e:
+                # pytesseract mata el subproceso y lanza RuntimeError("Tesseract process timeout")
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded() from e
+                raise
+        api = self._engine(lang, psm)
+        api.SetImage(img)
+        if not api.Recognize(int(timeout * 1000)):
+            raise DeadlineExceeded()
+        return _parse_tsv(api.GetTSVText(0))
+
+    def submit(self, img: Image.Image, lang: str = "spa+eng", psm: int = 6,
+               deadline: Optional[Deadline] = None) -> "Future[Dict[str, List]]":
+        """Encola la imagen y devuelve un Future con el dict de image_to_data."""
+        return self._executor.submit(self._run, img, lang, psm, deadline)
+
+    def image_to_data(self, img: Image.Image, lang: str = "spa+eng", psm: int = 6,
+                      deadline: Optional[Deadline] = None) -> Dict[str, List]:
+        """Equivalente bloqueante de pytesseract.image_to_data(..., Output.DICT)."""
+        if deadline is None:
+            return self.submit(img, lang, psm).result()
+        deadline.check()
+        fut = self.submit(img, lang, psm, deadline)
+        try:
+            return fut.result(timeout=deadline.remaining())
+        except FutureTimeout:
+            fut.cancel()  # si sigue en cola; si ya corre, lo corta su propio timeout
+            raise DeadlineExceeded()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for api in self._engines:
+                try:
+                    api.End()
+                except Exception:
+                    pass
+            self._engines.clear()
+
+
+_pool: Optional[OCRPool] = None
+_pool_lock = threading.Lock()
+_processes = 1  # procesos que comparten el total de OCR_POOL_SIZE (>1 en workers de PdfProcessor)
+
+
+def get_ocr_pool() -> OCRPool:
+    """Pool compartido por proceso (se crea en el primer uso)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                size = os.getenv("OCR_POOL_SIZE")
+                total = int(size) if size else (os.cpu_count() or 1)
+                _pool = OCRPool(max(1, total // _processes))
+    return _pool
+
+
+def init_worker_ocr_pool(processes: int) -> None:
+    """
+    Initializer de los procesos worker de PdfProcessor: descarta el pool heredado
+    del padre (sus hilos no existen en el hijo) y reparte OCR_POOL_SIZE entre los
+    `processes` workers, para no correr PDF_WORKERS × CPUs Tesseract a la vez.
+    """
+    global _processes
+    _reset_after_fork()
+    _processes = max(1, processes)
+
+
+def _reset_after_fork() -> None:
+    # Los hilos del pool no sobreviven a un fork (workers de PdfProcessor):
+    # el hijo crea su propio pool en el primer uso.
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
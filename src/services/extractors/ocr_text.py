@@ -1,11 +1,17 @@
 # src/services/extractors/ocr_text.py (patched to include 'conf' per word)
-import io
 import os
 import subprocess
-from typing import Dict, List, Tuple
+import time
+from typing import Dict, List, Optional, Tuple
 import fitz
 import pytesseract
+import numpy as np
 from PIL import Image
+from .block_table import BlockTable, OCR
+from .raster import RasterPage, render_gray
+from .ocr_pool import get_ocr_pool
+from .ocr_cache import get_ocr_cache, ocr_cache_key
+from src.services.deadline import current_deadline
 
 TESSERACT_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 if os.path.exists(TESSERACT_PATH):
@@ -18,41 +24,72 @@ else:
     except Exception:
         print("❌ ADVERTENCIA: Tesseract no encontrado. Ajusta TESSERACT_PATH o agrega al PATH.")
 
+OCR_PSM = 6
+
 def _page_to_pil(page: "fitz.Page", dpi: int = 300, mode: str = "L") -> Image.Image:
-    mat = fitz.Matrix(dpi / 72.0, dpi / 72.0)
-    pix = page.get_pixmap(matrix=mat)
-    return Image.open(io.BytesIO(pix.tobytes("ppm"))).convert(mode)
+    img = render_gray(page, dpi=dpi).to_pil()
+    return img if mode == "L" else img.convert(mode)
 
 def extract_text_from_page_with_ocr(page: "fitz.Page", dpi: int = 300, lang: str = "spa+eng") -> str:
-    img = _page_to_pil(page, dpi=dpi, mode="L")
-    return (pytesseract.image_to_string(img, lang=lang, config="--oem 3 --psm 6") or "").strip()
+    text, _, _, _ = _ocr_raster(render_gray(page, dpi=dpi), 0, lang, min_conf=40)
+    return text
 
 def _to_pdf_rect(ix0:int, iy0:int, iw:int, ih:int, scale:float) -> Tuple[float,float,float,float]:
     x0 = ix0 / scale; y0 = iy0 / scale
     x1 = (ix0 + iw) / scale; y1 = (iy0 + ih) / scale
     return float(x0), float(y0), float(x1), float(y1)
 
-def extract_text_blocks_from_page_with_ocr_words_and_lines(
-    page: "fitz.Page",
-    page_num: int,
-    dpi: int = 300,
-    lang: str = "spa+eng",
-    min_conf: int = 40,
-) -> List[Dict]:
+def _ocr_data(img: Image.Image, lang: str) -> Dict[str, List]:
     """
-    Devuelve bloques de LINEA (primero) y de PALABRA (después)
-    Cada block: { page, block_number, coordinates:[x0,y0,x1,y1], text, type:0, flags:0, kind:"line"|"word", conf: int|None }
+    Una única corrida de Tesseract (image_to_data) sobre la imagen, vía el pool OCR.
+    Con un deadline activo lanza DeadlineExceeded si se agota (ver services/deadline.py).
     """
-    scale = dpi / 72.0
-    img = _page_to_pil(page, dpi=dpi, mode="L")
+    return get_ocr_pool().image_to_data(img, lang=lang, psm=OCR_PSM, deadline=current_deadline())
+
+def _text_from_ocr_data(data: Dict[str, List]) -> str:
+    """
+    Reconstruye el texto plano desde la salida de image_to_data
+    (equivalente a image_to_string): palabras por línea, líneas con '\n'
+    y párrafos separados por una línea en blanco.
+    """
+    words = data.get("text", [])
+    bnums = data.get("block_num", [])
+    pnums = data.get("par_num", [])
+    lnums = data.get("line_num", [])
+
+    paragraphs: List[List[Tuple[int,int,int]]] = []
+    lines: Dict[Tuple[int,int,int], List[str]] = {}
+    par_index: Dict[Tuple[int,int], int] = {}
+
+    for i in range(len(words)):
+        w = (words[i] or "").strip()
+        if not w:
+            continue
+        par_key = (int(bnums[i]), int(pnums[i]))
+        line_key = (par_key[0], par_key[1], int(lnums[i]))
+        if par_key not in par_index:
+            par_index[par_key] = len(paragraphs)
+            paragraphs.append([])
+        if line_key not in lines:
+            lines[line_key] = []
+            paragraphs[par_index[par_key]].append(line_key)
+        lines[line_key].append(w)
 
-    data = pytesseract.image_to_data(
-        img,
-        output_type=pytesseract.Output.DICT,
-        lang=lang,
-        config="--oem 3 --psm 6",
-    )
+    out = []
+    for par in paragraphs:
+        out.append("\n".join(" ".join(lines[k]) for k in par))
+    return "\n\n".join(out).strip()
 
+def _blocks_from_ocr_data(
+    data: Dict[str, List],
+    page_num: int,
+    scale: float,
+    min_conf: int,
+) -> BlockTable:
+    """
+    Convierte la salida de image_to_data en bloques de LINEA + PALABRA (coords de la imagen),
+    source "ocr". block_number numera primero las palabras y después las líneas.
+    """
     words   = data.get("text", [])
     confs   = data.get("conf", [])
     lefts   = data.get("left", [])
@@ -65,8 +102,9 @@ def extract_text_blocks_from_page_with_ocr_words_and_lines(
     n = len(words)
 
     line_groups: Dict[Tuple[int,int,int], List[int]] = {}
-    word_blocks: List[Dict] = []
-    next_id = 0
+    w_coords: List[Tuple[float, float, float, float]] = []
+    w_text: List[str] = []
+    w_conf: List[int] = []
 
     for i in range(n):
         w = (words[i] or "").strip()
@@ -82,50 +120,153 @@ def extract_text_blocks_from_page_with_ocr_words_and_lines(
         ix0 = int(lefts[i]); iy0 = int(tops[i])
         iw  = int(widths[i]); ih = int(heights[i])
 
-        x0, y0, x1, y1 = _to_pdf_rect(ix0, iy0, iw, ih, scale)
-
-        word_blocks.append({
-            "page": page_num,
-            "block_number": next_id,
-            "coordinates": [x0, y0, x1, y1],
-            "text": w,
-            "type": 0,
-            "flags": 0,
-            "kind": "word",
-            "conf": c,
-        })
-        next_id += 1
+        w_coords.append(_to_pdf_rect(ix0, iy0, iw, ih, scale))
+        w_text.append(w)
+        w_conf.append(c)
 
         key = (int(bnums[i]), int(pnums[i]), int(lnums[i]))
-        line_groups.setdefault(key, []).append(len(word_blocks) - 1)
+        line_groups.setdefault(key, []).append(len(w_text) - 1)
 
-    line_blocks: List[Dict] = []
+    l_coords: List[Tuple[float, float, float, float]] = []
+    l_text: List[str] = []
+    l_conf: List[float] = []
     for key, idxs in line_groups.items():
         if not idxs:
             continue
-        xs0 = []; ys0 = []; xs1 = []; ys1 = []; parts = []; confs_line = []
-        for wi in idxs:
-            wb = word_blocks[wi]
-            x0, y0, x1, y1 = wb["coordinates"]
-            xs0.append(x0); ys0.append(y0); xs1.append(x1); ys1.append(y1)
-            parts.append(wb["text"])
-            if wb.get("conf") is not None:
-                confs_line.append(wb["conf"])
-        lx0, ly0, lx1, ly1 = min(xs0), min(ys0), max(xs1), max(ys1)
-        text_line = " ".join(parts).strip()
+        text_line = " ".join(w_text[wi] for wi in idxs).strip()
         if not text_line:
             continue
-        avg_conf = int(sum(confs_line)/len(confs_line)) if confs_line else None
-        line_blocks.append({
-            "page": page_num,
-            "block_number": next_id,
-            "coordinates": [float(lx0), float(ly0), float(lx1), float(ly1)],
-            "text": text_line,
-            "type": 0,
-            "flags": 0,
-            "kind": "line",
-            "conf": avg_conf,
-        })
-        next_id += 1
-
-    return line_blocks + word_blocks
+        l_coords.append((min(w_coords[wi][0] for wi in idxs), min(w_coords[wi][1] for wi in idxs),
+                         max(w_coords[wi][2] for wi in idxs), max(w_coords[wi][3] for wi in idxs)))
+        l_text.append(text_line)
+        l_conf.append(int(sum(w_conf[wi] for wi in idxs) / len(idxs)))
+
+    nw, nl = len(w_text), len(l_text)
+    return BlockTable.concat([
+        BlockTable.build(l_coords, l_text, page=page_num, conf=l_conf, source=OCR, kind="line",
+                         block_number=np.arange(nw, nw + nl), flags=0),
+        BlockTable.build(w_coords, w_text, page=page_num, conf=w_conf, source=OCR, kind="word",
+                         block_number=np.arange(nw), flags=0),
+    ])
+
+def extract_text_blocks_from_page_with_ocr_words_and_lines(
+    page: "fitz.Page",
+    page_num: int,
+    dpi: int = 300,
+    lang: str = "spa+eng",
+    min_conf: int = 40,
+) -> BlockTable:
+    """
+    Devuelve bloques de LINEA (primero) y de PALABRA (después)
+    Cada fila: page, block_number, coordinates [x0,y0,x1,y1], text, flags 0, kind "line"|"word", conf
+    """
+    _, blocks, _, _ = _ocr_raster(render_gray(page, dpi=dpi), page_num, lang, min_conf)
+    return blocks
+
+def _place_blocks(local: BlockTable, page_num: int, origin: Tuple[float, float], first_id: int) -> BlockTable:
+    """Reubica bloques en coords locales de la imagen en la página (origen del recorte, nro de página)."""
+    ox, oy = origin
+    return local.shifted(ox, oy, first_id).with_page(page_num, keep_size=True)
+
+def _ocr_raster(
+    raster: RasterPage,
+    page_num: int,
+    lang: str,
+    min_conf: int,
+    first_id: int = 0,
+) -> Tuple[str, BlockTable, float, bool]:
+    """
+    OCR de una imagen ya rasterizada, pasando por el cache de contenido si está habilitado.
+    Retorna (text, blocks, ocr_ms, cache_hit) con los bloques ya ubicados en la página.
+    """
+    cache = get_ocr_cache()
+    key = ocr_cache_key(raster, lang, OCR_PSM, min_conf) if cache else None
+    cached = cache.get(key) if cache else None
+
+    t0 = time.perf_counter()
+    if cached is None:
+        data = _ocr_data(raster.to_pil(), lang)
+        text = _text_from_ocr_data(data)
+        local = _blocks_from_ocr_data(data, 0, raster.scale, min_conf)
+        if cache:
+            cache.put(key, text, local)
+    else:
+        text, local = cached
+    ocr_ms = (time.perf_counter() - t0) * 1000.0
+
+    return text, _place_blocks(local, page_num, raster.origin, first_id), ocr_ms, cached is not None
+
+def extract_page_with_ocr(
+    page: "fitz.Page",
+    page_num: int,
+    dpi: int = 300,
+    lang: str = "spa+eng",
+    min_conf: int = 40,
+) -> Tuple[str, BlockTable, Dict]:
+    """
+    OCR en una sola pasada: rasteriza la página una vez (en gris, sin copias)
+    y corre un único image_to_data. Texto, líneas y palabras salen del mismo resultado.
+    Retorna (text, blocks, stats): los bloques son los mismos que
+    extract_text_blocks_from_page_with_ocr_words_and_lines y stats trae
+    memoria/tiempos de la rasterización y del OCR.
+    """
+    raster = render_gray(page, dpi=dpi)
+    text, blocks, ocr_ms, hit = _ocr_raster(raster, page_num, lang, min_conf)
+
+    stats = raster.stats()
+    stats["ocr_ms"] = round(ocr_ms, 2)
+    stats["cache_hits"] = int(hit)
+    stats["cache_misses"] = int(not hit)
+    return text, blocks, stats
+
+def extract_regions_with_ocr(
+    page: "fitz.Page",
+    page_num: int,
+    rects: List[Tuple[float, float, float, float]],
+    dpi: int = 300,
+    lang: str = "spa+eng",
+    min_conf: int = 40,
+    masks: Optional[List[Tuple[float, float, float, float]]] = None,
+) -> Tuple[str, BlockTable, Dict]:
+    """
+    OCR sólo de los recortes `rects` (coords PDF, top-left) de la página.
+    Cada recorte se rasteriza y se pasa por Tesseract una vez; las coordenadas
+    de los bloques vuelven mapeadas al espacio de la página.
+    masks: zonas (coords PDF) que se pintan de blanco antes del OCR, p.ej. texto nativo ya extraído.
+    Retorna (text, blocks, stats) como extract_page_with_ocr.
+    """
+    texts: List[str] = []
+    blocks: List[BlockTable] = []
+    n_blocks = 0
+    stats = {
+        "dpi": dpi, "regions": 0, "ocr_pixels": 0, "raster_bytes": 0,
+        "render_ms": 0.0, "ocr_ms": 0.0, "process_peak_rss_mb": None,
+        "cache_hits": 0, "cache_misses": 0,
+    }
+
+    for rect in rects:
+        clip = fitz.Rect(rect) & page.rect
+        if clip.is_empty:
+            continue
+        raster = render_gray(page, dpi=dpi, clip=clip)
+        for m in masks or []:
+            if fitz.Rect(m).intersects(clip):
+                raster.blank_rect(m)
+        text, region_blocks, ocr_ms, hit = _ocr_raster(raster, page_num, lang, min_conf, first_id=n_blocks)
+        if text:
+            texts.append(text)
+        blocks.append(region_blocks)
+        n_blocks += len(region_blocks)
+
+        rs = raster.stats()
+        stats["regions"] += 1
+        stats["ocr_pixels"] += raster.width * raster.height
+        stats["raster_bytes"] += rs["raster_bytes"]
+        stats["render_ms"] += rs["render_ms"]
+        stats["ocr_ms"] += ocr_ms
+        stats["process_peak_rss_mb"] = rs["process_peak_rss_mb"]
+        stats["cache_hits" if hit else "cache_misses"] += 1
+
+    stats["render_ms"] = round(stats["render_ms"], 2)
+    stats["ocr_ms"] = round(stats["ocr_ms"], 2)
+    return "\n\n".join(texts), BlockTable.concat(blocks), stats
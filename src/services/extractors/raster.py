@@ -0,0 +1,94 @@
+# src/services/extractors/raster.py
+import sys
+import time
+from typing import Dict, Optional
+
+import fitz
+import numpy as np
+from PIL import Image
+
+try:
+    import resource  # no disponible en Windows
+except ImportError:
+    resource = None
+
+
+def _process_peak_rss_mb() -> Optional[float]:
+    """
+    Pico de memoria residente del proceso desde que arrancó (MB), no el de una página;
+    None si la plataforma no lo expone.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reporta bytes; Linux y el resto, KB
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+class RasterPage:
+    """
+    Página (o recorte) rasterizada directamente en escala de grises.
+    La imagen PIL y el array NumPy comparten los samples del pixmap (sin copias),
+    por eso este objeto mantiene vivo el pixmap mientras se usen.
+    """
+
+    def __init__(self, pix: "fitz.Pixmap", dpi: int, clip: Optional["fitz.Rect"], render_ms: float):
+        self._pix = pix
+        self.dpi = dpi
+        self.scale = dpi / 72.0
+        self.width = pix.width
+        self.height = pix.height
+        self.stride = pix.stride
+        self.origin = (float(clip.x0), float(clip.y0)) if clip is not None else (0.0, 0.0)
+        self.render_ms = render_ms
+
+    @property
+    def nbytes(self) -> int:
+        return self.stride * self.height
+
+    def blank_rect(self, rect) -> None:
+        """Pinta de blanco un rect (coords PDF de página) para que el OCR lo ignore."""
+        ox, oy = self.origin
+        irect = fitz.IRect(
+            int((rect[0] - ox) * self.scale), int((rect[1] - oy) * self.scale),
+            int((rect[2] - ox) * self.scale) + 1, int((rect[3] - oy) * self.scale) + 1,
+        ) & fitz.IRect(0, 0, self.width, self.height)
+        if not irect.is_empty:
+            self._pix.set_rect(irect, (255,))
+
+    def samples(self):
+        """Buffer de píxeles (fila a fila, `stride` bytes por fila)."""
+        # samples_mv es una vista sobre la memoria del pixmap; samples (bytes) copia
+        return getattr(self._pix, "samples_mv", None) or self._pix.samples
+
+    def to_pil(self) -> Image.Image:
+        """Imagen 'L' de solo lectura sobre el buffer del pixmap."""
+        img = Image.frombuffer("L", (self.width, self.height), self.samples(), "raw", "L", self.stride, 1)
+        img._raster = self  # mantiene vivo el pixmap mientras viva la imagen
+        return img
+
+    def to_numpy(self) -> np.ndarray:
+        """Array uint8 (alto x ancho) sobre el buffer del pixmap."""
+        arr = np.frombuffer(self.samples(), dtype=np.uint8).reshape(self.height, self.stride)
+        return arr[:, :self.width]
+
+    def stats(self) -> Dict:
+        return {
+            "dpi": self.dpi,
+            "width_px": self.width,
+            "height_px": self.height,
+            "ocr_pixels": self.width * self.height,
+            "raster_bytes": self.nbytes,
+            "render_ms": round(self.render_ms, 2),
+            "process_peak_rss_mb": _process_peak_rss_mb(),
+        }
+
+
+def render_gray(page: "fitz.Page", dpi: int = 300, clip: Optional["fitz.Rect"] = None) -> RasterPage:
+    """Rasteriza la página (o el recorte `clip`, en coordenadas PDF) en gris y sin alpha."""
+    t0 = time.perf_counter()
+    mat = fitz.Matrix(dpi / 72.0, dpi / 72.0)
+    pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False, clip=clip)
+    return RasterPage(pix, dpi, clip, (time.perf_counter() - t0) * 1000.0)
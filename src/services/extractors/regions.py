@@ -0,0 +1,91 @@
+# src/services/extractors/regions.py
+"""Utilidades de rectángulos (coords PDF, top-left) para OCR por regiones."""
+from typing import List, Tuple
+
+Rect = Tuple[float, float, float, float]
+
+
+def expand_rect(r: Rect, margin: float) -> Rect:
+    x0, y0, x1, y1 = r
+    return (x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+
+
+def _overlaps(a: Rect, b: Rect) -> bool:
+    return not (a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1])
+
+
+def _intersects(a: Rect, b: Rect) -> bool:
+    """Solapamiento con área > 0 (rectángulos que sólo se tocan no cuentan)."""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def merge_rects(rects: List[Rect], touching: bool = True) -> List[Rect]:
+    """
+    Une los rectángulos que se solapan (o tocan, con touching=True) para no OCRear
+    dos veces la misma zona.
+    """
+    overlaps = _overlaps if touching else _intersects
+    pending = [tuple(float(c) for c in r) for r in rects if r[2] > r[0] and r[3] > r[1]]
+    merged: List[Rect] = []
+    while pending:
+        cur = pending.pop()
+        changed = True
+        while changed:
+            changed = False
+            rest = []
+            for r in pending:
+                if overlaps(cur, r):
+                    cur = (min(cur[0], r[0]), min(cur[1], r[1]), max(cur[2], r[2]), max(cur[3], r[3]))
+                    changed = True
+                else:
+                    rest.append(r)
+            pending = rest
+        merged.append(cur)
+    merged.sort(key=lambda r: (r[1], r[0]))
+    return merged
+
+
+def subtract_rect(r: Rect, hole: Rect) -> List[Rect]:
+    """Partes de `r` que no cubre `hole` (hasta 4 rectángulos)."""
+    if not _overlaps(r, hole):
+        return [r]
+    x0, y0, x1, y1 = r
+    hx0, hy0, hx1, hy1 = max(x0, hole[0]), max(y0, hole[1]), min(x1, hole[2]), min(y1, hole[3])
+    out = []
+    if hy0 > y0:
+        out.append((x0, y0, x1, hy0))          # arriba
+    if hy1 < y1:
+        out.append((x0, hy1, x1, y1))          # abajo
+    if hx0 > x0:
+        out.append((x0, hy0, hx0, hy1))        # izquierda
+    if hx1 < x1:
+        out.append((hx1, hy0, x1, hy1))        # derecha
+    return out
+
+
+def uncovered_regions(areas: List[Rect], holes: List[Rect], min_size: float = 8.0,
+                      max_pieces: int = 16) -> List[Rect]:
+    """
+    Para cada área, resta los huecos y devuelve los pedazos que quedan
+    (descartando restos más finos que `min_size` puntos), así una línea de texto
+    en medio de una imagen no obliga a OCRear la imagen entera. Áreas totalmente
+    cubiertas desaparecen. Si un área queda en más de `max_pieces` pedazos se
+    devuelve su bbox (una corrida de OCR en lugar de muchas chicas).
+    Pedazos de áreas distintas que se superponen se unen en su bbox.
+    """
+    out: List[Rect] = []
+    for area in areas:
+        pieces = [tuple(float(c) for c in area)]
+        for hole in holes:
+            if not _overlaps(area, hole):
+                continue
+            pieces = [p for piece in pieces for p in subtract_rect(piece, hole)
+                      if p[2] - p[0] >= min_size and p[3] - p[1] >= min_size]
+            if not pieces:
+                break
+        if len(pieces) > max_pieces:
+            pieces = [(min(p[0] for p in pieces), min(p[1] for p in pieces),
+                       max(p[2] for p in pieces), max(p[3] for p in pieces))]
+        out.extend(pieces)
+    # Los pedazos de una misma área sólo se tocan: no se vuelven a unir
+    return merge_rects(out, touching=False)
@@ -0,0 +1,40 @@
+# src/services/extractors/spatial_index.py
+"""
+Índice espacial de grilla uniforme sobre coordenadas de página.
+Cada caja se registra en todas las celdas que cubre; una consulta devuelve
+las cajas registradas en las celdas que toca el rectángulo pedido. Toda caja
+que se superpone (con área > 0) con la consultada comparte al menos una celda,
+así que los candidatos nunca dejan afuera una intersección real.
+"""
+import math
+from typing import Dict, List, Sequence, Set, Tuple
+
+Cell = Tuple[int, int]
+
+
+class GridIndex:
+    def __init__(self, cell_size: float = 32.0):
+        self.cell_size = float(cell_size)
+        self._cells: Dict[Cell, List[int]] = {}
+
+    def _span(self, rect: Sequence[float]) -> Tuple[range, range]:
+        x0, y0, x1, y1 = rect
+        cs = self.cell_size
+        return (range(math.floor(x0 / cs), math.floor(x1 / cs) + 1),
+                range(math.floor(y0 / cs), math.floor(y1 / cs) + 1))
+
+    def insert(self, item: int, rect: Sequence[float]) -> None:
+        xs, ys = self._span(rect)
+        for cx in xs:
+            for cy in ys:
+                self._cells.setdefault((cx, cy), []).append(item)
+
+    def query(self, rect: Sequence[float]) -> Set[int]:
+        xs, ys = self._span(rect)
+        out: Set[int] = set()
+        for cx in xs:
+            for cy in ys:
+                items = self._cells.get((cx, cy))
+                if items:
+                    out.update(items)
+        return out
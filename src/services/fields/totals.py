@@ -1,6 +1,10 @@
 import re
 import unicodedata
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Union
+
+import numpy as np
+
+from src.services.extractors.block_table import BlockTable, as_block_table
 
 # =========================================
 # Números (tolerante a miles con . o espacio y decimales con , o .)
@@ -89,46 +93,46 @@ def _find_value_inline(lab_text: str) -> Optional[str]:
 
 # -----------------------------
 # DERECHA y DEBAJO
+# (filtro geométrico sobre las columnas; texto sólo de las filas que pasan)
 # -----------------------------
 def _find_value_right(
-    blocks: List[Dict], lab: Dict, *, x_min_gap: float, y_tol: float
+    blocks: BlockTable, lab: int, *, x_min_gap: float, y_tol: float
 ) -> Optional[str]:
-    lx0, ly0, lx1, ly1 = lab["coordinates"]
+    lx0, ly0, lx1, ly1 = blocks.coords[lab].tolist()
     lcy = (ly0 + ly1)/2.0
+    x0s = blocks.coords[:, 0]
+    cys = (blocks.coords[:, 1] + blocks.coords[:, 3])/2.0
+    near = np.flatnonzero((x0s > lx1 + x_min_gap) & (np.abs(cys - lcy) <= y_tol))
     candidates = []
-    for b in blocks:
-        x0,y0,x1,y1 = b["coordinates"]
-        if x0 <= lx1 + x_min_gap:
-            continue
-        cy = (y0+y1)/2.0
-        num = _extract_number(b.get("text",""))
+    for i in near.tolist():
+        text = blocks.text[i]
+        num = _extract_number(text)
         if not num:
             continue
         # Evitar bloques que mezclan otros labels (para no traer "perc. rg ... 2.684.682,63")
-        if _has_any_label_tokens(b.get("text","")):
+        if _has_any_label_tokens(text):
             continue
-        if abs(cy - lcy) <= y_tol:
-            dist = (x0 - lx1) + abs(cy - lcy) * 0.5
-            candidates.append((dist, num))
+        dist = (float(x0s[i]) - lx1) + abs(float(cys[i]) - lcy) * 0.5
+        candidates.append((dist, num))
     if not candidates:
         return None
     candidates.sort(key=lambda t: t[0])
     return candidates[0][1]
 
 def _find_value_below(
-    blocks: List[Dict], lab: Dict, *, y_min_gap: float, x_overlap_tol: float
+    blocks: BlockTable, lab: int, *, y_min_gap: float, x_overlap_tol: float
 ) -> Optional[str]:
-    lx0, ly0, lx1, ly1 = lab["coordinates"]
+    lx0, ly0, lx1, ly1 = blocks.coords[lab].tolist()
+    below = np.flatnonzero(blocks.coords[:, 1] > ly1 + y_min_gap)  # debe estar debajo
     candidates = []
-    for b in blocks:
-        x0,y0,x1,y1 = b["coordinates"]
-        if y0 <= ly1 + y_min_gap:
-            continue  # debe estar debajo
-        num = _extract_number(b.get("text",""))
+    for i in below.tolist():
+        text = blocks.text[i]
+        num = _extract_number(text)
         if not num:
             continue
-        if _has_any_label_tokens(b.get("text","")):
+        if _has_any_label_tokens(text):
             continue
+        x0, y0, x1, y1 = blocks.coords[i].tolist()
         # Solape horizontal con el label
         overlap = max(0, min(lx1, x1) - max(lx0, x0))
         width_lab = max(1.0, (lx1 - lx0))
@@ -141,11 +145,11 @@ def _find_value_below(
     candidates.sort(key=lambda t: t[0])
     return candidates[0][1]
 
-def _candidate_labels(blocks: List[Dict], token_options: List[List[str]]) -> List[Dict]:
-    return [b for b in blocks if _is_label(b.get("text",""), token_options)]
+def _candidate_labels(blocks: BlockTable, token_options: List[List[str]]) -> List[int]:
+    return [i for i, text in enumerate(blocks.text) if _is_label(text, token_options)]
 
 def find_value_near_label(
-    blocks: List[Dict],
+    blocks: BlockTable,
     token_options: List[List[str]],
     *,
     x_min_gap: float = 6.0,
@@ -156,9 +160,10 @@ def find_value_near_label(
     labels = _candidate_labels(blocks, token_options)
     if not labels:
         return None
-    labels.sort(key=lambda b: (round(b["coordinates"][1],1), b["coordinates"][0]))
+    x0s, y0s = blocks.coords[:, 0].tolist(), blocks.coords[:, 1].tolist()
+    labels.sort(key=lambda i: (round(y0s[i],1), x0s[i]))
     lab = labels[0]
-    lab_text = lab.get("text","")
+    lab_text = blocks.text[lab]
 
     # 1) inline
     inline_num = _find_value_inline(lab_text)
@@ -177,14 +182,25 @@ def find_value_near_label(
 
     return None
 
+def is_totals_candidate(text: str, proveedor: Optional[str] = None) -> bool:
+    """
+    True si un bloque con este texto puede intervenir en extract_totals: es un label
+    del proveedor o tiene un número sin otros labels. El resto se puede descartar
+    antes de juntar los bloques de todo el documento.
+    """
+    if any(_is_label(text, opts) for opts in get_label_tokens_for_proveedor(proveedor).values()):
+        return True
+    return bool(_extract_number(text)) and not _has_any_label_tokens(text)
+
 # API principal
 def extract_totals(
-    blocks: List[Dict],
+    blocks: Union[BlockTable, List[Dict]],
     proveedor: Optional[str] = None,
     *,
     x_min_gap: float = 6.0,
     y_tolerance: float = 22.0
 ) -> Dict[str, Optional[str]]:
+    blocks = as_block_table(blocks)
     tokens = get_label_tokens_for_proveedor(proveedor)
     out: Dict[str, Optional[str]] = {}
     for key, token_opts in tokens.items():
@@ -0,0 +1,195 @@
+# src/services/jobs/runner.py
+"""
+Jobs de extracción asíncronos: el upload se guarda en JOBS_DIR, el estado en
+SQLite (JobStore) y la extracción corre en procesos worker. El progreso se
+reporta por página y el resultado queda en JOBS_DIR/results/<id>.json, así
+sobrevive a un reinicio; los jobs que quedaron en cola o a medio correr se
+vuelven a encolar al arrancar.
+
+Cada worker reclama el job en el store antes de correrlo (ver JobStore.claim) y
+renueva su lease mientras corre: con varios procesos de la app (uvicorn
+--workers N) todos re-encolan lo pendiente al arrancar, pero cada job corre una
+sola vez. Un job RUNNING cuyo dueño ya no existe se retoma al arrancar; si el
+dueño es de otro host (o no se puede saber) se retoma cuando vence su lease.
+
+Configuración:
+  JOBS_DIR      (default <tmp>/pdf_extractor/jobs)
+  JOBS_WORKERS  (default 1)
+  JOBS_LEASE_S  (default 60)
+"""
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from src.config import create_template_engine, get_region_ocr_margin
+from src.services.pageExtractorFactory import build_pdf_processor
+from src.services.pageSelection import parse_page_selection
+from src.services.templateExtraction import run_template_extraction
+from src.services.serialization import json_default
+from .store import JobStore, QUEUED, RUNNING
+
+logger = logging.getLogger(__name__)
+
+
+def _write_json_atomic(path: str, payload: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"), default=json_default)
+    os.replace(tmp, path)
+
+
+def _owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_gone(owner: Optional[str]) -> bool:
+    """True si `owner` es un proceso de este host que ya no existe (sin dueño: versión anterior)."""
+    if not owner:
+        return True
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or os.name == "nt":
+        return False  # en Windows os.kill(pid, 0) termina el proceso: sólo cuenta el lease
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (OSError, ValueError):
+        return False
+    return False
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _run_job(store_path: str, results_dir: str, job_id: str, lease_s: float) -> None:
+    """Worker: extrae el PDF del job (y aplica la plantilla) reportando progreso por página."""
+    store = JobStore(store_path)
+    owner = _owner_id()
+    if not store.claim(job_id, owner, lease_s):
+        return  # lo corre (o lo terminó) otro proceso
+    job = store.get(job_id)
+
+    stop = threading.Event()
+
+    def heartbeat() -> None:
+        while not stop.wait(lease_s / 3):
+            store.renew(job_id, owner, lease_s)
+
+    threading.Thread(target=heartbeat, name=f"job-lease-{job_id}", daemon=True).start()
+    try:
+        def on_page(done: int, total: int) -> None:
+            store.set_progress(job_id, done, total)
+
+        pdf = build_pdf_processor()
+        opts = job["options"]
+        pages = parse_page_selection(opts.get("pages"))
+        if job["plantilla_id"]:
+            result, _ = run_template_extraction(
+                job["file_path"], job["plantilla_id"], pdf, create_template_engine(),
+                debug=opts.get("debug", False),
+                region_pdf_factory=build_pdf_processor if opts.get("region_ocr", True) else None,
+                region_margin=get_region_ocr_margin(),
+                on_page=on_page,
+                pages=pages,
+            )
+        else:
+            result = pdf.process(job["file_path"], on_page=on_page, pages=pages)
+
+        result_path = os.path.join(results_dir, f"{job_id}.json")
+        _write_json_atomic(result_path, result)
+        store.mark_completed(job_id, result_path)
+    except Exception as e:
+        logger.exception("Job %s falló", job_id)
+        store.mark_failed(job_id, str(e))
+    finally:
+        stop.set()
+        _unlink(job["file_path"])
+
+
+class JobManager:
+    def __init__(self, base_dir: str, workers: int = 1, lease_s: float = 60.0):
+        self.files_dir = os.path.join(base_dir, "files")
+        self.results_dir = os.path.join(base_dir, "results")
+        os.makedirs(self.files_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        self.store = JobStore(os.path.join(base_dir, "jobs.sqlite"))
+        self.lease_s = lease_s
+        self._pool = ProcessPoolExecutor(max_workers=max(1, workers))
+        self._resume()
+
+    def _resume(self) -> None:
+        """Re-encola los jobs que quedaron pendientes o a medio correr en el proceso anterior."""
+        for job_id in self.store.ids_with_status(QUEUED, RUNNING):
+            self._resume_job(job_id)
+
+    def _resume_job(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in (QUEUED, RUNNING):
+            return
+        if job["status"] == RUNNING:
+            wait = (job["lease_until"] or 0) - time.time()
+            if _owner_gone(job["owner"]):
+                if not self.store.release(job_id, job["owner"]):
+                    return
+            elif wait > 0:
+                # Lo corre otro proceso vivo (o no se sabe): revisar cuando venza su lease
+                timer = threading.Timer(wait + 1, self._resume_job, args=(job_id,))
+                timer.daemon = True
+                timer.start()
+                return
+        if not os.path.exists(job["file_path"]):
+            self.store.mark_failed(job_id, "Archivo del job no encontrado tras reinicio", pending_only=True)
+            return
+        self._dispatch(job_id)
+
+    def _dispatch(self, job_id: str) -> None:
+        fut = self._pool.submit(_run_job, self.store.path, self.results_dir, job_id, self.lease_s)
+        fut.add_done_callback(lambda f: self._on_done(job_id, f))
+
+    def _on_done(self, job_id: str, fut) -> None:
+        # _run_job registra sus propios errores; esto cubre un worker caído (BrokenProcessPool)
+        exc = fut.exception()
+        if exc is not None and self.store.mark_failed(job_id, f"Worker terminado: {exc}", pending_only=True):
+            job = self.store.get(job_id)
+            _unlink(job["file_path"])
+
+    def submit(self, pdf_path: str, plantilla_id: Optional[str], options: Dict[str, Any]) -> str:
+        """Mueve el PDF al directorio de jobs y lo encola. Retorna el id del job."""
+        job_id = uuid.uuid4().hex
+        file_path = os.path.join(self.files_dir, f"{job_id}.pdf")
+        shutil.move(pdf_path, file_path)
+        self.store.create(job_id, file_path, plantilla_id, options)
+        self._dispatch(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Manager compartido por proceso (se crea al arrancar la app, ver main.py)."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                base_dir = os.getenv("JOBS_DIR") or os.path.join(
+                    tempfile.gettempdir(), "pdf_extractor", "jobs")
+                _manager = JobManager(base_dir, workers=int(os.getenv("JOBS_WORKERS", "1")),
+                                      lease_s=float(os.getenv("JOBS_LEASE_S", "60")))
+    return _manager
@@ -0,0 +1,128 @@
+# src/services/jobs/store.py
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobStore:
+    """
+    Estado de los jobs de extracción en un archivo SQLite local.
+    El resultado no se guarda acá sino en un JSON aparte (result_path), así
+    el polling de estado no carga documentos de cientos de páginas.
+    Seguro entre hilos y procesos (una conexión por operación, WAL).
+    Un job se ejecuta sólo después de reclamarlo con `claim` (UPDATE condicional):
+    queda a nombre de `owner` ("host:pid") con un lease que el dueño renueva; así,
+    con varios procesos de la app, cada job corre una sola vez.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    plantilla_id TEXT,
+                    options TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    pages_total INTEGER,
+                    pages_done INTEGER NOT NULL DEFAULT 0,
+                    result_path TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs(status)")
+            # Bases creadas antes del reclamo de jobs
+            cols = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in cols:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "lease_until" not in cols:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:  # commit / rollback
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id: str, file_path: str, plantilla_id: Optional[str], options: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, plantilla_id, options, file_path, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, plantilla_id, json.dumps(options), file_path, now, now),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        return job
+
+    def ids_with_status(self, *statuses: str) -> List[str]:
+        marks = ",".join("?" for _ in statuses)
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT id FROM jobs WHERE status IN ({marks}) ORDER BY created_at",
+                                statuses).fetchall()
+        return [r["id"] for r in rows]
+
+    def _update(self, job_id: str, where: str = "", params: tuple = (), **fields) -> bool:
+        """UPDATE de `fields`; `where` agrega condiciones. True si se actualizó la fila."""
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            cur = conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?{where}",
+                               (*fields.values(), job_id, *params))
+            return cur.rowcount == 1
+
+    def claim(self, job_id: str, owner: str, lease_s: float) -> bool:
+        """Pasa el job a RUNNING a nombre de `owner` si está en cola o su lease venció."""
+        now = time.time()
+        return self._update(job_id, " AND (status = ? OR (status = ? AND lease_until < ?))",
+                            (QUEUED, RUNNING, now),
+                            status=RUNNING, owner=owner, lease_until=now + lease_s,
+                            pages_done=0, error=None)
+
+    def renew(self, job_id: str, owner: str, lease_s: float) -> bool:
+        return self._update(job_id, " AND status = ? AND owner IS ?", (RUNNING, owner),
+                            lease_until=time.time() + lease_s)
+
+    def release(self, job_id: str, owner: str) -> bool:
+        """Devuelve a la cola un job RUNNING de `owner` (p. ej. un proceso que ya no existe)."""
+        return self._update(job_id, " AND status = ? AND owner IS ?", (RUNNING, owner),
+                            status=QUEUED, owner=None, lease_until=None, pages_done=0)
+
+    def set_progress(self, job_id: str, done: int, total: int) -> None:
+        self._update(job_id, pages_done=done, pages_total=total)
+
+    def mark_completed(self, job_id: str, result_path: str) -> None:
+        self._update(job_id, status=COMPLETED, result_path=result_path)
+
+    def mark_failed(self, job_id: str, error: str, pending_only: bool = False) -> bool:
+        """pending_only: sólo si sigue en cola o corriendo (no pisa un job ya terminado)."""
+        if pending_only:
+            return self._update(job_id, " AND status IN (?, ?)", (QUEUED, RUNNING),
+                                status=FAILED, error=error)
+        return self._update(job_id, status=FAILED, error=error)
@@ -1,6 +1,8 @@
 # services/page_extractor.py
 from typing import Dict, List
 from .extractors.base import IPageExtractor
+from .extractors.block_table import BlockTable, as_block_table
+from .deadline import DeadlineExceeded, OCR_CUT_OFF, SKIPPED
 
 class PageExtractor:
     """
@@ -20,17 +22,14 @@ class PageExtractor:
         "text": str,
         "character_count": int,
         "has_images": bool,
-        "blocks": [  # cada block incluye page/page_size y coords en top-left
-          {
-            "page": int,
-            "page_width": float,
-            "page_height": float,
-            "coordinates": [x0, y0, x1, y1],
-            "text": str
-          },
-          ...
-        ],
-        "error": str | None
+        "blocks": BlockTable,  # columnas; al serializar, un dict por bloque:
+          # {"page", "coordinates": [x0, y0, x1, y1] (top-left), "text",
+          #  "page_width", "page_height", "source", "kind", "conf"}
+        "error": str | None,
+        "ocr_decision": {"ocr": bool, "reason": str, ...},  # opcional
+        "ocr_stats": {...},  # opcional: dpi, px, bytes y ms de rasterización/OCR
+        "truncated": "skipped" | "ocr_cut_off",  # opcional: deadline del request agotado
+        "native_words": NativeWords  # opcional (native_mode="words"): palabras en arrays
       }
     """
 
@@ -42,56 +41,73 @@ class PageExtractor:
     def extract(self, page, page_num: int) -> Dict:
         pw = float(page.rect.width)
         ph = float(page.rect.height)
-        rotation = int(getattr(page, "rotation", 0))
-
-        result = {
-            "page": page_num,                
-            "page_number": page_num,
-            "origin": "top-left",            
-            "rotation": rotation,            
-            "strategy_used": None,
-            "page_width": pw,
-            "page_height": ph,
-            "text": "",
-            "character_count": 0,
-            "has_images": bool(len(page.get_images()) > 0),
-            "blocks": [],
-            "error": None,
-        }
+        result = self._base_result(page, page_num)
 
         try:
             extractor = self._select_strategy(page)
-            text, blocks = extractor.extract(page, page_num)
-
-            patched_blocks = []
-            for b in (blocks or []):
-                b = dict(b)
-                # asegurar consistencia
-                b["page"] = page_num
-                b["page_width"]  = float(b.get("page_width", pw))
-                b["page_height"] = float(b.get("page_height", ph))
+            out = extractor.extract(page, page_num)
+            text, blocks = out[0], out[1]
+            info = out[2] if len(out) > 2 else None
 
-                # coords como lista de floats
-                coords = b.get("coordinates", [0, 0, 0, 0])
-                x0, y0, x1, y1 = [float(c) for c in coords]
-                # Si alguna estrategia devolviera bottom-left, conviértela allí.
-                # Aquí asumimos top-left (fitz nativo).
-                b["coordinates"] = [x0, y0, x1, y1]
-
-                patched_blocks.append(b)
+            # Todas las filas en esta página; el tamaño de página se completa si falta.
+            # Se asume top-left (fitz nativo): una estrategia bottom-left debería convertir allí.
+            blocks = as_block_table(blocks).with_page(page_num, pw, ph, keep_size=True)
 
             result["text"] = text or ""
             result["character_count"] = len(result["text"])
-            result["blocks"] = patched_blocks
+            result["blocks"] = blocks
             result["strategy_used"] = self._strategy_name(extractor)
+            if info:
+                result.update(info)
 
+        except DeadlineExceeded as e:
+            result["error"] = str(e)
+            result["truncated"] = OCR_CUT_OFF
         except Exception as e:
             result["error"] = str(e)
         return result
 
+    def skipped(self, page, page_num: int) -> Dict:
+        """Resultado de una página que no se extrajo por agotarse el deadline."""
+        result = self._base_result(page, page_num)
+        result["error"] = str(DeadlineExceeded())
+        result["truncated"] = SKIPPED
+        return result
+
+    def config(self) -> Dict:
+        """Estrategias y sus parámetros, en orden (p.ej. para claves de cache)."""
+        return {
+            "strategies": [
+                {"name": s.__class__.__name__, **(s.config() if hasattr(s, "config") else {})}
+                for s in self._strategies
+            ]
+        }
+
     # -------------------- helpers --------------------
 
+    def _base_result(self, page, page_num: int) -> Dict:
+        pw = float(page.rect.width)
+        ph = float(page.rect.height)
+        rotation = int(getattr(page, "rotation", 0))
+
+        return {
+            "page": page_num,                
+            "page_number": page_num,
+            "origin": "top-left",            
+            "rotation": rotation,            
+            "strategy_used": None,
+            "page_width": pw,
+            "page_height": ph,
+            "text": "",
+            "character_count": 0,
+            "has_images": bool(len(page.get_images()) > 0),
+            "blocks": BlockTable.empty(),
+            "error": None,
+        }
+
     def _select_strategy(self, page) -> IPageExtractor:
+        # Las estrategias nativas/OCR deciden con has_native_text: el TextPage que arman
+        # acá es el mismo que después usa la extracción (ver extractors/native_text.py)
         for s in self._strategies:
             try:
                 if s.can_handle(page):
@@ -1,12 +1,31 @@
 # src/services/page_extractor_factory.py
-from typing import List
+from typing import List, Optional
 from .pageExtractor import PageExtractor
+from .pdfProcessor import PdfProcessor
 from .extractors.combined import CombinedExtractor
+from src.config import get_pdf_workers, get_pdf_chunk_size, get_pdf_max_pages_in_memory, get_native_mode
 
-def build_page_extractor_unified() -> PageExtractor:
+def build_page_extractor_unified(ocr_regions=None) -> PageExtractor:
     """
     Devuelve un PageExtractor con un único CombinedExtractor
-    que corre Nativo + OCR y devuelve salida unificada y consistente.
+    que corre Nativo + OCR (sólo en las páginas que lo necesitan)
+    y devuelve salida unificada y consistente.
+    Con ocr_regions el OCR se limita a las zonas que lee la plantilla.
+    NATIVE_MODE=words extrae el texto nativo por línea/palabra (ver CombinedExtractor).
     """
-    strategies = [CombinedExtractor(ocr_always=True, dpi=300, lang="spa+eng", min_conf=40)]
+    strategies = [CombinedExtractor(ocr_always=False, dpi=300, lang="spa+eng", min_conf=40,
+                                    ocr_regions=ocr_regions, ocr_scope="images",
+                                    native_mode=get_native_mode())]
     return PageExtractor(strategies)
+
+
+def build_pdf_processor(ocr_regions=None, workers: Optional[int] = None) -> PdfProcessor:
+    """
+    PdfProcessor de los endpoints y jobs de extracción
+    (PDF_WORKERS / PDF_CHUNK_SIZE / PDF_MAX_PAGES_IN_MEMORY).
+    `workers` fuerza la cantidad de procesos (el batch ya paraleliza por archivo).
+    """
+    return PdfProcessor(build_page_extractor_unified(ocr_regions),
+                        workers=get_pdf_workers() if workers is None else workers,
+                        chunk_size=get_pdf_chunk_size(),
+                        max_pages_in_memory=get_pdf_max_pages_in_memory())
@@ -0,0 +1,72 @@
+# services/pageSelection.py
+"""
+Selección de páginas (1-based) para extraer sólo parte de un PDF.
+Formato: "1-2,5" (rangos y páginas sueltas), "3-" (de la 3 al final) o "all".
+Las páginas que no existen en el documento se ignoran.
+"""
+from typing import Iterable, List, Optional, Tuple
+
+PageRange = Tuple[int, Optional[int]]  # (desde, hasta inclusive; None = hasta el final)
+
+
+class PageSelection:
+    def __init__(self, ranges: Iterable[PageRange] = ()):
+        self.ranges: Tuple[PageRange, ...] = tuple(sorted(ranges, key=lambda r: (r[0], r[1] or 0)))
+
+    @classmethod
+    def all(cls) -> "PageSelection":
+        return cls([(1, None)])
+
+    @classmethod
+    def of(cls, pages: Iterable[int]) -> "PageSelection":
+        return cls((p, p) for p in sorted(set(pages)))
+
+    def resolve(self, total: int) -> List[int]:
+        """Páginas seleccionadas que existen en un documento de `total` páginas, en orden."""
+        selected = set()
+        for start, end in self.ranges:
+            selected.update(range(start, min(end or total, total) + 1))
+        return sorted(selected)
+
+    def __str__(self) -> str:
+        # Forma canónica (va en la clave del cache)
+        return ",".join(
+            f"{a}-" if b is None else (str(a) if a == b else f"{a}-{b}")
+            for a, b in self.ranges
+        )
+
+    def __repr__(self) -> str:
+        return f"PageSelection({str(self)!r})"
+
+    def __bool__(self) -> bool:
+        return bool(self.ranges)
+
+
+def parse_page_selection(spec: Optional[str]) -> Optional[PageSelection]:
+    """
+    "1-2,5" -> PageSelection; vacío/None -> None (sin selección explícita).
+    Lanza ValueError si el formato es inválido.
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    if spec.lower() == "all":
+        return PageSelection.all()
+
+    ranges: List[PageRange] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start_s, sep, end_s = part.partition("-")
+        try:
+            start = int(start_s)
+            end = (int(end_s) if end_s.strip() else None) if sep else start
+        except ValueError:
+            raise ValueError(f"Rango de páginas inválido: '{part}'")
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Rango de páginas inválido: '{part}'")
+        ranges.append((start, end))
+    if not ranges:
+        raise ValueError(f"Selección de páginas vacía: '{spec}'")
+    return PageSelection(ranges)
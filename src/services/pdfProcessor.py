@@ -1,16 +1,117 @@
 # services/pdfProcessor.py
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Any, Iterator, List, Optional, Union
 import fitz
-from typing import Dict, Any
 from .pageExtractor import PageExtractor
+from .pageSelection import PageSelection
+from .deadline import Deadline, active
 from .statsAgregator import StatsAggregator
+from .extractors.ocr_pool import init_worker_ocr_pool
+
+# Ruta del PDF o su contenido en memoria (bytes/bytearray/memoryview, sin copiar)
+PdfSource = Union[str, bytes, bytearray, memoryview]
+
+_executors: Dict[int, ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido entre requests (uno por cantidad de workers).
+    Cada worker arranca con su propio pool OCR, de 1/workers del tamaño configurado.
+    """
+    with _executors_lock:
+        ex = _executors.get(workers)
+        if ex is None:
+            ex = ProcessPoolExecutor(max_workers=workers, initializer=init_worker_ocr_pool,
+                                     initargs=(workers,))
+            _executors[workers] = ex
+        return ex
+
+
+def open_pdf(source: PdfSource) -> fitz.Document:
+    """Abre el PDF desde su ruta o directamente desde memoria (sin archivo temporal)."""
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+@contextmanager
+def _as_file(source: PdfSource) -> Iterator[str]:
+    """Ruta del PDF; si está en memoria, la de una copia temporal que se borra al salir."""
+    if isinstance(source, str):
+        yield source
+        return
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+    try:
+        with tmp:
+            tmp.write(source)
+        yield tmp.name
+    finally:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+
+
+def _extract_page(page_extractor: PageExtractor, doc: fitz.Document, page_num: int,
+                  deadline: Optional[Deadline]) -> Dict:
+    """Extrae una página con el deadline activo; si ya venció la devuelve marcada como salteada."""
+    page = doc[page_num - 1]
+    if deadline is None:
+        return page_extractor.extract(page, page_num)
+    if deadline.expired():
+        return page_extractor.skipped(page, page_num)
+    with active(deadline):
+        return page_extractor.extract(page, page_num)
+
+
+def _extract_page_list(file_path: str, page_extractor: PageExtractor, page_numbers: List[int],
+                       deadline: Optional[Deadline] = None) -> List[Dict]:
+    """Worker: abre el documento por su cuenta y extrae las páginas indicadas (1-based)."""
+    with fitz.open(file_path) as doc:
+        return [_extract_page(page_extractor, doc, n, deadline) for n in page_numbers]
+
 
 class PdfProcessor:
-    """Encargado de procesar el PDF completo"""
-    def __init__(self, page_extractor: PageExtractor):
+    """
+    Encargado de procesar el PDF completo.
+    - workers=1: procesa las páginas en secuencia dentro del proceso actual.
+    - workers>1: reparte rangos de `chunk_size` páginas entre procesos que abren
+      el documento de forma independiente; los resultados vuelven en orden de página.
+    `on_page(done, total)` se llama a medida que avanzan las páginas (progreso de jobs).
+    `max_pages_in_memory` acota lo que retiene la extracción en sí: en paralelo, las
+    páginas extraídas por los workers que todavía no se consumieron (los rangos se envían
+    a medida que se consumen los anteriores); en secuencia, una página. Sólo el consumo
+    incremental (`iter_pages`/`stream`, NDJSON, plantilla con stream=True) aprovecha ese
+    tope: `process` y run_template_extraction devuelven todas las páginas en la
+    respuesta, así que su memoria sigue creciendo con el tamaño del documento.
+    `source` puede ser la ruta o el contenido del PDF en memoria; en paralelo un PDF
+    en memoria se vuelca a un archivo temporal mientras dura la extracción (los
+    workers abren el archivo por su ruta).
+    `pages` (PageSelection) limita la extracción a esas páginas; None = todas.
+    Con `deadline` las páginas que no llegan a extraerse salen marcadas "truncated"
+    (ver services/deadline.py) y el resultado lleva "partial" con cuáles fueron.
+    """
+    def __init__(self, page_extractor: PageExtractor, workers: int = 1, chunk_size: int = 4,
+                 max_pages_in_memory: int = 32):
         self.page_extractor = page_extractor
-    def process(self, file_path: str) -> Dict[str, Any]:
+        self.workers = max(1, int(workers or 1))
+        self.chunk_size = max(1, int(chunk_size or 1))
+        self.max_pages_in_memory = max(self.chunk_size, int(max_pages_in_memory or 1))
+
+    def process(self, source: PdfSource,
+                on_page: Optional[Callable[[int, int], None]] = None,
+                pages: Optional[PageSelection] = None,
+                deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         results = {
             "total_pages": 0,
+            "extracted_pages": 0,
             "pages": [],
             "extraction_stats": {
                 "native_text_pages": 0,
@@ -19,15 +120,116 @@ class PdfProcessor:
             }
         }
         stats = StatsAggregator()
+        for page_result in self.iter_pages(source, on_page, pages, deadline):
+            stats.add_page(page_result)
+            results["pages"].append(page_result)
+        # total_pages: páginas del documento; extracted_pages: las que trae el resultado
+        results["extracted_pages"] = len(results["pages"])
+        results["total_pages"] = results["extracted_pages"] if pages is None else self.page_count(source)
+        results["extraction_stats"].update(stats.to_dict())
+        partial = stats.partial()
+        if partial:
+            results["partial"] = partial
+        return results
+
+    def iter_pages(self, source: PdfSource,
+                   on_page: Optional[Callable[[int, int], None]] = None,
+                   pages: Optional[PageSelection] = None,
+                   deadline: Optional[Deadline] = None) -> Iterator[Dict]:
+        """Genera el resultado de cada página (seleccionada) en orden, a medida que se extrae."""
         try:
-            with fitz.open(file_path) as doc:
-                results["total_pages"] = len(doc)
-
-                for page_num, page in enumerate(doc, start=1):
-                    page_result = self.page_extractor.extract(page, page_num)
-                    results["pages"].append(page_result)
-                    stats.add(page_result["strategy_used"], page_result["character_count"])
-            results["extraction_stats"].update(stats.to_dict())
-            return results
+            with open_pdf(source) as doc:
+                page_numbers = pages.resolve(len(doc)) if pages is not None else list(range(1, len(doc) + 1))
+                total = len(page_numbers)
+                if self.workers > 1 and total > self.chunk_size:
+                    with _as_file(source) as file_path:
+                        yield from self._iter_parallel(file_path, page_numbers, on_page, deadline)
+                else:
+                    for done, page_num in enumerate(page_numbers, start=1):
+                        page_result = _extract_page(self.page_extractor, doc, page_num, deadline)
+                        if on_page:
+                            on_page(done, total)
+                        yield page_result
         except Exception as e:
             raise Exception(f"Error procesando PDF: {str(e)}")
+
+    def stream(self, source: PdfSource, pages: Optional[PageSelection] = None,
+               deadline: Optional[Deadline] = None) -> Iterator[Dict]:
+        """
+        Eventos para respuestas NDJSON: {"type": "page", ...página} por página y al final
+        {"type": "summary", "total_pages", "extracted_pages", "extraction_stats", "partial"?}.
+        Sólo retiene una página a la vez.
+        """
+        stats = StatsAggregator()
+        total = 0
+        for page_result in self.iter_pages(source, pages=pages, deadline=deadline):
+            total += 1
+            stats.add_page(page_result)
+            yield {"type": "page", **page_result}
+        summary = {"type": "summary",
+                   "total_pages": total if pages is None else self.page_count(source),
+                   "extracted_pages": total,
+                   "extraction_stats": stats.to_dict()}
+        partial = stats.partial()
+        if partial:
+            summary["partial"] = partial
+        yield summary
+
+    def config(self) -> Dict[str, Any]:
+        """Configuración que determina el resultado (workers/chunk_size no lo cambian)."""
+        return self.page_extractor.config()
+
+    def page_count(self, source: PdfSource) -> int:
+        """Páginas del documento."""
+        with open_pdf(source) as doc:
+            return len(doc)
+
+    def extract_pages(self, source: PdfSource, page_numbers: List[int],
+                      deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Extrae sólo las páginas indicadas (1-based), en el orden recibido."""
+        with open_pdf(source) as doc:
+            return [_extract_page(self.page_extractor, doc, n, deadline) for n in page_numbers]
+
+    def replace_pages(self, results: Dict[str, Any], new_pages: List[Dict]) -> Dict[str, Any]:
+        """Reemplaza páginas ya extraídas (mismo número de página) y recalcula extraction_stats."""
+        by_num = {p["page"]: p for p in new_pages}
+        results["pages"] = [by_num.get(p["page"], p) for p in results["pages"]]
+        results["extraction_stats"].update(self._collect_stats(results["pages"]))
+        return results
+
+    def _collect_stats(self, page_results: List[Dict]) -> Dict[str, Any]:
+        stats = StatsAggregator()
+        for page_result in page_results:
+            stats.add_page(page_result)
+        return stats.to_dict()
+
+    def _iter_parallel(self, file_path: str, page_numbers: List[int],
+                       on_page: Optional[Callable[[int, int], None]] = None,
+                       deadline: Optional[Deadline] = None) -> Iterator[Dict]:
+        executor = get_process_pool(self.workers)
+        total = len(page_numbers)
+        ranges = iter(range(0, total, self.chunk_size))
+        max_in_flight = max(1, self.max_pages_in_memory // self.chunk_size)
+        pending: Deque = deque()
+
+        def submit_next() -> None:
+            start = next(ranges, None)
+            if start is not None:
+                pending.append(executor.submit(_extract_page_list, file_path, self.page_extractor,
+                                               page_numbers[start:start + self.chunk_size], deadline))
+
+        for _ in range(max_in_flight):
+            submit_next()
+        done = 0
+        try:
+            while pending:  # en orden de envío => en orden de página
+                chunk = pending.popleft().result()
+                submit_next()
+                done += len(chunk)
+                if on_page:
+                    on_page(done, total)
+                yield from chunk
+        finally:
+            # Si el consumidor abandona el generador, no seguir extrayendo
+            for fut in pending:
+                fut.cancel()
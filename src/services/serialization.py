@@ -0,0 +1,30 @@
+# services/serialization.py
+"""
+JSON de los resultados de extracción.
+Algunos valores recorren el pipeline como objetos compactos (BlockTable, NativeWords,
+con arrays NumPy) y recién pasan a listas/dicts al serializar: todo objeto con
+`to_json()` se serializa con lo que ese método devuelva.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+
+def json_default(obj: Any) -> Any:
+    to_json = getattr(obj, "to_json", None)
+    if to_json is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return to_json()
+
+
+def dumps(obj: Any, **kwargs) -> str:
+    return json.dumps(obj, default=json_default, **kwargs)
+
+
+class ResultJSONResponse(JSONResponse):
+    """JSONResponse que entiende los objetos compactos del pipeline (ver json_default)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                     separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,49 @@
+# src/services/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlightTimeout(Exception):
+    """El líder de una clave no terminó dentro del timeout del seguidor."""
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas concurrentes (en un mismo event loop) con la misma clave:
+    la primera lanza `fn` (líder) y las demás esperan su resultado (seguidores).
+    `fn` corre en su propia task, así que si se cancela el request del líder
+    (cliente desconectado) los seguidores siguen recibiendo el resultado.
+    Si el líder tarda más que `timeout`, el seguidor deja de esperar con
+    SingleFlightTimeout y la clave se libera para que el próximo request no
+    se encole detrás de un líder trabado.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _release(self, key: str, fut: asyncio.Future) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+
+    def _done(self, key: str, fut: asyncio.Future) -> None:
+        self._release(key, fut)
+        if not fut.cancelled():
+            fut.exception()  # marcar como recuperada aunque nadie la espere
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: float) -> Tuple[Any, bool]:
+        """Retorna (resultado, coalesced). coalesced=True si se reutilizó la ejecución de otro request."""
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f: self._done(key, f))
+            return await asyncio.shield(fut), False
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), timeout), True
+        except asyncio.TimeoutError:
+            self._release(key, fut)
+            raise SingleFlightTimeout(f"La extracción en curso no terminó en {timeout:.0f}s")
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
@@ -1,17 +1,44 @@
+from typing import Optional
+
+from .deadline import SKIPPED
+
+
 class StatsAggregator:
     """Acumula metricas de extracion a nivel PDF."""
     def __init__(self):
         self._native_pages = 0
         self._ocr_pages = 0
         self._total_chars = 0
+        self._ocr_skipped_pages = 0
+        self._ocr_cache_hits = 0
+        self._ocr_cache_misses = 0
+        self._skipped_pages = []
+        self._cut_off_pages = []
 
-    def add(self, strategy_used: str, character_count: int) -> None:
+    def add(self, strategy_used: str, character_count: int, ocr_decision: dict = None,
+            ocr_stats: dict = None) -> None:
         """Suma metricas de una pagina procesada."""
         if strategy_used == "native_text":
             self._native_pages += 1
         else:
             self._ocr_pages += 1
         self._total_chars += int(character_count or 0)
+        if ocr_decision and not ocr_decision.get("ocr"):
+            self._ocr_skipped_pages += 1
+        if ocr_stats:
+            self._ocr_cache_hits += int(ocr_stats.get("cache_hits") or 0)
+            self._ocr_cache_misses += int(ocr_stats.get("cache_misses") or 0)
+
+    def add_page(self, page_result: dict) -> None:
+        """Suma un resultado de PageExtractor.extract (las páginas salteadas sólo se registran)."""
+        truncated = page_result.get("truncated")
+        if truncated == SKIPPED:
+            self._skipped_pages.append(page_result["page"])
+            return
+        if truncated:
+            self._cut_off_pages.append(page_result["page"])
+        self.add(page_result["strategy_used"], page_result["character_count"],
+                 page_result.get("ocr_decision"), page_result.get("ocr_stats"))
 
     def to_dict(self) -> dict:
         """Devuelve el snapshot de la metricas acumuladas"""
@@ -19,4 +46,17 @@ class StatsAggregator:
             "native_text_pages": self._native_pages,
             "ocr_pages": self._ocr_pages,
             "total_characters": self._total_chars,
+            "ocr_skipped_pages": self._ocr_skipped_pages,
+            "ocr_cache_hits": self._ocr_cache_hits,
+            "ocr_cache_misses": self._ocr_cache_misses,
+        }
+
+    def partial(self) -> Optional[dict]:
+        """Páginas salteadas o con OCR cortado por el deadline del request; None si no hubo."""
+        if not self._skipped_pages and not self._cut_off_pages:
+            return None
+        return {
+            "reason": "deadline_exceeded",
+            "skipped_pages": sorted(self._skipped_pages),
+            "cut_off_pages": sorted(self._cut_off_pages),
         }
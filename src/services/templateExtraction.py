@@ -0,0 +1,246 @@
+# services/templateExtraction.py
+"""
+Extracción + aplicación de plantilla + totales por proveedor.
+Compartido por los endpoints de extracción (y cualquier otro flujo que
+necesite el mismo resultado que /api/v1/extract-text/{plantilla_id}).
+"""
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .deadline import Deadline
+from .extractors.block_table import BlockTable, as_block_table
+from .pageSelection import PageSelection
+from .pdfProcessor import PdfProcessor, PdfSource
+from .statsAgregator import StatsAggregator
+from .fields.totals import extract_totals, infer_proveedor_from_template_id, is_totals_candidate
+
+logger = logging.getLogger(__name__)
+
+# Campos de cada página que usa StatsAggregator.add_page
+_STATS_KEYS = ("page", "strategy_used", "character_count", "ocr_decision", "ocr_stats", "truncated")
+
+
+def flatten_page_blocks(page: Dict[str, Any], default_page: int = 1) -> BlockTable:
+    """Blocks de una página con metadatos de tamaño y origen top-left (comparte columnas con la página)."""
+    pw = page.get("width") or page.get("page_width")
+    ph = page.get("height") or page.get("page_height")
+    page_num = int(page.get("page", default_page))
+    origin = (page.get("origin") or "top-left").lower()
+
+    blocks = as_block_table(page.get("blocks"))
+    # Si el extractor trae origen bottom-left, convertir a top-left
+    if origin == "bottom-left" and ph:
+        blocks = blocks.flipped_y(float(ph))
+    return blocks.with_page(page_num, float(pw) if pw else None, float(ph) if ph else None)
+
+
+def pages_without_anchors(region_pages: List[int], values: Optional[Dict]) -> List[int]:
+    """De las páginas OCReadas por regiones, las que no tienen ninguna ancla encontrada."""
+    anchors_dbg = ((values or {}).get("debug") or {}).get("anchors") or {}
+    out = []
+    for page_num in region_pages:
+        found = (anchors_dbg.get(page_num) or {}).get("found") or []
+        if not any(a.get("matched") for a in found):
+            out.append(page_num)
+    return out
+
+
+def apply_totals(tbx: Dict[str, Any], all_blocks: BlockTable, plantilla_id: str) -> None:
+    """Totales por proveedor (Guerrini, Pirelli, etc.) sobre tbx["values"]."""
+    try:
+        proveedor = infer_proveedor_from_template_id(plantilla_id)
+        totals = extract_totals(all_blocks, proveedor=proveedor, y_tolerance=24, x_min_gap=6.0)
+        vals = tbx.setdefault("values", {})
+
+        if totals.get("SUBTOTAL"):
+                vals["subtotal"] = totals["SUBTOTAL"]
+        if totals.get("IVA_21"):
+                vals["iva_21"] = totals["IVA_21"]
+        if totals.get("PERCEP"):
+                # si tenés campos separados de IIBB/perc, adaptá aquí
+                vals["percep_iibb"] = totals["PERCEP"]
+        if totals.get("TOTAL") and (not vals.get("total") or vals.get("total") == vals.get("subtotal")):
+                vals["total"] = totals["TOTAL"]
+    except Exception:
+        pass
+
+
+def iter_template_extraction(
+    source: PdfSource,
+    plantilla_id: str,
+    pdf: PdfProcessor,
+    tpl_engine,
+    *,
+    debug: bool = False,
+    region_pdf_factory: Optional[Callable[[Dict], PdfProcessor]] = None,
+    region_margin: float = 18.0,
+    on_page: Optional[Callable[[int, int], None]] = None,
+    pages: Optional[PageSelection] = None,
+    deadline: Optional[Deadline] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Extrae el PDF y aplica la plantilla como secuencia de eventos:
+      {"type": "page", ...página}                  a medida que se extrae cada página
+      {"type": "page", "retry": True, ...página}   páginas re-extraídas por el fallback
+      {"type": "summary", "total_pages", "extracted_pages", "extraction_stats",
+       "template_based_extraction", "partial"?}
+    total_pages es la cantidad de páginas del documento; extracted_pages, las extraídas.
+    Las páginas no se retienen: la plantilla se aplica página por página (PageApplication)
+    y de cada una sólo quedan sus métricas y los bloques candidatos a totales.
+    Con region_pdf_factory sólo se OCRean las zonas que lee la plantilla y las páginas
+    sin anclas se re-extraen con `pdf` (OCR de página completa). Si hay proveedor, la
+    última página extraída (la de los totales) va siempre con OCR de página completa.
+    `on_page(done, total)` reporta el avance de la extracción general.
+    Sin `pages` sólo se extraen las páginas que usa la plantilla (boxes y meta.pages) y,
+    si hay proveedor para los totales, la última página del documento (donde suelen
+    estar); PageSelection.all() fuerza el documento completo.
+    Con `deadline` la plantilla se aplica sobre las páginas que llegaron a extraerse y el
+    summary lleva "partial" (ver PdfProcessor); el fallback no corre con el deadline vencido.
+    Lanza ValueError si la plantilla no existe.
+    """
+    # Plantilla compilada (cacheada por versión) para todo el request
+    template = tpl_engine.compiled(plantilla_id)
+    proveedor = infer_proveedor_from_template_id(plantilla_id)
+    doc_pages = pdf.page_count(source)
+    if pages is None:
+        used = tpl_engine.template_pages(template)
+        if used and proveedor and doc_pages:
+            used = sorted(set(used) | {doc_pages})
+        pages = PageSelection.of(used) if used else None
+    # Página de totales: la última que se extrae (con proveedor)
+    totals_page = None
+    if proveedor and doc_pages:
+        selected = pages.resolve(doc_pages) if pages is not None else [doc_pages]
+        totals_page = selected[-1] if selected else None
+    region_pdf = None
+    if region_pdf_factory is not None:
+        regions = tpl_engine.ocr_regions(template, margin=region_margin)
+        if totals_page is not None:
+            # apply_totals busca labels en toda la página: OCR completo, no sólo los boxes
+            regions = {**regions, totals_page: None}
+        region_pdf = region_pdf_factory(regions)
+
+    # Aplicación incremental: cada página resuelve sus anclas y boxes al llegar
+    application = tpl_engine.begin_apply(template, include_debug=debug or region_pdf is not None)
+    block_counts: Dict[int, int] = {}
+    totals_blocks: Dict[int, BlockTable] = {}
+    page_stats: Dict[int, Dict[str, Any]] = {}
+    region_pages: List[int] = []
+    error: Optional[Exception] = None
+
+    def keep(page: Dict[str, Any], idx: int) -> None:
+        nonlocal error
+        num = int(page.get("page", idx))
+        blocks = flatten_page_blocks(page, idx)
+        block_counts[num] = len(blocks)
+        # Para totales sólo se guardan las filas de labels y números
+        totals_blocks[num] = blocks.take(
+            [i for i, text in enumerate(blocks.text) if is_totals_candidate(text, proveedor)])
+        page_stats[num] = {k: page.get(k) for k in _STATS_KEYS}
+        if (page.get("ocr_decision") or {}).get("scope") == "regions":
+            region_pages.append(num)
+        if error is None:
+            try:
+                application.add_page(num, blocks, page.get("native_words"))
+            except Exception as e:
+                logger.exception("Error aplicando plantilla")
+                error = e
+
+    def result():
+        nonlocal error
+        if error is not None or not any(block_counts.values()):
+            return None
+        try:
+            return application.result()
+        except Exception as e:
+            logger.exception("Error aplicando plantilla")
+            error = e
+            return None
+
+    # 1) Extracción general (guiada por la plantilla si hay region_pdf_factory)
+    total = 0
+    extracted = (region_pdf or pdf).iter_pages(source, on_page=on_page, pages=pages, deadline=deadline)
+    for idx, page in enumerate(extracted, start=1):
+        total += 1
+        keep(page, idx)
+        yield {"type": "page", **page}
+
+    # 2) Resultado de la plantilla con anclas
+    values = result()
+
+    # Fallback: páginas sin anclas => OCR de página completa y reaplicar
+    if region_pdf is not None and values is not None:
+        retry_pages = pages_without_anchors(region_pages, values)
+        if retry_pages and not (deadline is not None and deadline.expired()):
+            for page in pdf.extract_pages(source, retry_pages, deadline=deadline):
+                if page.get("truncated"):
+                    continue  # queda lo extraído por regiones
+                keep(page, page["page"])
+                yield {"type": "page", "retry": True, **page}
+            values = result()
+
+    has_blocks = any(block_counts.values())
+    if not has_blocks:
+        tbx = {
+            "warning": "No se encontraron bloques de texto para aplicar la plantilla",
+            "plantilla": plantilla_id,
+        }
+    elif error is not None:
+        tbx = {
+            "error": f"Error aplicando plantilla: {str(error)}",
+            "plantilla": plantilla_id,
+        }
+    else:
+        if not debug:
+            values.pop("debug", None)
+            values.pop("field_debug", None)
+        tbx = {
+            "plantilla": plantilla_id,
+            **values
+        }
+
+    # 3) Totales por proveedor
+    if has_blocks:
+        apply_totals(tbx, BlockTable.concat([totals_blocks[num] for num in sorted(totals_blocks)]),
+                     plantilla_id)
+
+    stats = StatsAggregator()
+    for page_stat in page_stats.values():
+        stats.add_page(page_stat)
+    summary = {
+        "type": "summary",
+        "total_pages": doc_pages,
+        "extracted_pages": total,
+        "extraction_stats": stats.to_dict(),
+        "template_based_extraction": tbx,
+    }
+    partial = stats.partial()
+    if partial:
+        summary["partial"] = partial
+    yield summary
+
+
+def run_template_extraction(source: PdfSource, plantilla_id: str, pdf: PdfProcessor, tpl_engine,
+                            **kwargs) -> Tuple[Dict[str, Any], bool]:
+    """
+    Igual que iter_template_extraction pero arma el resultado completo
+    ({total_pages, extracted_pages, pages, extraction_stats, template_based_extraction}).
+    Retiene todas las páginas (van en la respuesta): para documentos largos conviene
+    consumir iter_template_extraction (stream=True), que no las retiene.
+    Retorna (result, ok): ok=False si falló la aplicación de la plantilla o el resultado
+    es parcial por deadline (no conviene cachearlo).
+    """
+    result: Dict[str, Any] = {"total_pages": 0, "extracted_pages": 0, "pages": []}
+    index: Dict[int, int] = {}
+    for event in iter_template_extraction(source, plantilla_id, pdf, tpl_engine, **kwargs):
+        kind = event.pop("type")
+        if kind == "page":
+            retry = event.pop("retry", False)
+            if retry and event["page"] in index:
+                result["pages"][index[event["page"]]] = event
+            else:
+                index[event["page"]] = len(result["pages"])
+                result["pages"].append(event)
+        else:
+            result.update(event)
+    return result, "error" not in result["template_based_extraction"] and "partial" not in result
@@ -1,6 +1,9 @@
 import re
-from typing import Dict, Any, List, Tuple, Optional
-from .geometry import rect_intersects
+from typing import Dict, Any, Tuple, Optional
+import numpy as np
+
+from src.services.extractors.block_table import BlockTable
+from .geometry import rects_intersect
 from .transforms import to_pdf_scale_from_meta
 
 
@@ -18,47 +21,65 @@ def compile_anchor_pattern(anchor: Dict[str, Any]) -> re.Pattern:
     return re.compile(pat, flags)
 
 
-def find_anchor_Q(anchor: Dict[str, Any], page_blocks: List[Dict[str, Any]], page_meta: Dict[str, Any]) -> Optional[Tuple[float, float, Dict[str, Any]]]:
-    """Encuentra un anchor en los bloques de pagina. Devuelve (u, v, block) o None si no se encuentra"""
-    if not anchor.get("pattern"):
-        return None
+class CompiledAnchor:
+    """
+    Anchor listo para buscar: patrón compilado, searchBox y punto esperado ya en coords PDF.
+    Un anchor inválido (regex que no compila, sin x/y) falla recién al buscarlo, como antes.
+    """
+    __slots__ = ("id", "pattern", "search_rect", "src", "expected", "error")
 
-    scale = to_pdf_scale_from_meta(page_meta)
-
-    # Calcular rectangulo de busqueda
-    sb = anchor.get("searchBox") or {
-        "x": anchor["x"] - 50, "y": anchor["y"] - 20, "w": 100, "h": 40
-    }
-    rx0 = float(sb["x"]) * scale
-    ry0 = float(sb["y"]) * scale
-    rx1 = (float(sb["x"]) + float(sb["w"])) * scale
-    ry1 = (float(sb["y"]) + float(sb["h"])) * scale
-    search_rect = (rx0, ry0, rx1, ry1)
-
-    pattern = compile_anchor_pattern(anchor)
-    candidates = []
-
-    for block in page_blocks:
-        x0, y0, x1, y1 = block["coordinates"]
-        if rect_intersects(search_rect, (x0, y0, x1, y1), tol=0.5):
-            text = block.get("text", "")
-            if pattern.search(text):
-                candidates.append(block)
-
-    if not candidates:
-        return None
+    def __init__(self, anchor: Dict[str, Any], scale: float):
+        self.id = anchor.get("id")
+        self.pattern: Optional[re.Pattern] = None
+        self.error: Optional[Exception] = None
+        if not anchor.get("pattern"):
+            return
+        try:
+            # Calcular rectangulo de busqueda
+            sb = anchor.get("searchBox") or {
+                "x": anchor["x"] - 50, "y": anchor["y"] - 20, "w": 100, "h": 40
+            }
+            rx0 = float(sb["x"]) * scale
+            ry0 = float(sb["y"]) * scale
+            rx1 = (float(sb["x"]) + float(sb["w"])) * scale
+            ry1 = (float(sb["y"]) + float(sb["h"])) * scale
+            self.search_rect = (rx0, ry0, rx1, ry1)
+            self.pattern = compile_anchor_pattern(anchor)
+            self.src = (float(anchor["x"]), float(anchor["y"]))
+            self.expected = (self.src[0] * scale, self.src[1] * scale)
+        except Exception as e:
+            self.pattern, self.error = None, e
+
+    def find(self, page_blocks: BlockTable) -> Optional[Tuple[float, float, int]]:
+        """Devuelve (u, v, fila del bloque) o None si no se encuentra"""
+        if self.error is not None:
+            raise self.error
+        if self.pattern is None:
+            return None
+
+        inside = np.flatnonzero(rects_intersect(self.search_rect, page_blocks.coords, tol=0.5))
+        candidates = [i for i in inside.tolist() if self.pattern.search(page_blocks.text[i])]
 
-    # Encotnrar el mas cercano al punto esperado
-    exp_u = float(anchor["x"]) * scale
-    exp_v = float(anchor["y"]) * scale
+        if not candidates:
+            return None
 
-    def distance_squared(block):
-        x0, y0, _, _ = block["coordinates"]
-        dx = (x0 - exp_u)
-        dy = (y0 - exp_v)
-        return dx * dx + dy * dy
+        # Encotnrar el mas cercano al punto esperado
+        exp_u, exp_v = self.expected
 
-    best_block = min(candidates, key=distance_squared)
-    u, v = best_block["coordinates"][0], best_block["coordinates"][1]
+        def distance_squared(i):
+            x0, y0 = float(page_blocks.coords[i, 0]), float(page_blocks.coords[i, 1])
+            dx = (x0 - exp_u)
+            dy = (y0 - exp_v)
+            return dx * dx + dy * dy
 
-    return (u, v, best_block)
+        best = min(candidates, key=distance_squared)
+        u, v = float(page_blocks.coords[best, 0]), float(page_blocks.coords[best, 1])
+
+        return (u, v, best)
+
+
+def find_anchor_Q(anchor: Dict[str, Any], page_blocks: BlockTable, page_meta: Dict[str, Any]) -> Optional[Tuple[float, float, int]]:
+    """Encuentra un anchor en los bloques de pagina. Devuelve (u, v, fila del bloque) o None si no se encuentra"""
+    if not anchor.get("pattern"):
+        return None
+    return CompiledAnchor(anchor, to_pdf_scale_from_meta(page_meta)).find(page_blocks)
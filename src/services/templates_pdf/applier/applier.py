@@ -1,144 +1,75 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Union
 import numpy as np
 
+from src.services.extractors.block_table import BlockTable, NATIVE, as_block_table
+
 from .normalizers import apply_normalizers
-from .geometry import cluster_rows_and_order, rect_intersects
-from .transforms import to_pdf_scale_from_meta, transform_box, fit_affine, fit_similarity
-from .anchors import find_anchor_Q
+from .geometry import rects_intersect, row_order
+from .transforms import transform_box, fit_affine, fit_similarity
+from .compiled import CompiledField, CompiledTemplate, compile_template
 from .extractors import extract_with_regex, extract_value_below_label
-from .types import BoxData, FieldData
 
 class TemplateApplier:
     """Aplica plantillas sobre bloques de texto extraídos de PDF."""
     
-    def apply(self, template, pdf_text_blocks: List[Dict[str, Any]], *, 
+    def apply(self, template, pdf_text_blocks: Union[BlockTable, List[Dict[str, Any]]], *, 
               include_debug: bool = False) -> Dict[str, Any]:
-        # Inicialización
-        meta = template.meta or {}
-        pages_meta = self._prepare_pages_meta(meta)
-        boxes = self._prepare_boxes(template.boxes)
-        fields = self._prepare_fields(template.fields)
-        
-        # Agrupar bloques por página
-        by_page, page_size = self._group_blocks_by_page(pdf_text_blocks)
-        
-        # Procesar páginas
-        box_text_cache, debug_data = self._process_pages(
-            boxes, by_page, page_size, pages_meta, meta, include_debug
-        )
-        
-        # Extraer campos
-        result = self._extract_fields(fields, box_text_cache, include_debug)
-        
-        # Agregar debug si es necesario
-        if include_debug:
-            result["debug"] = debug_data
-            
-        return result
-
-    def _prepare_pages_meta(self, meta: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
-        """Prepara metadatos de páginas."""
-        pages_meta = {}
-        if "pages" in meta:
-            for k, v in meta["pages"].items():
-                pages_meta[int(k)] = v
-        return pages_meta
-
-    def _prepare_boxes(self, boxes: List[Any]) -> List[Dict[str, Any]]:
-        """Convierte boxes a diccionarios."""
-        return [b if isinstance(b, dict) else b.model_dump() for b in (boxes or [])]
+        # Agrupar bloques por página y aplicarlas una por una
+        by_page, _ = self._group_blocks_by_page(as_block_table(pdf_text_blocks))
+        application = self.begin(template, include_debug=include_debug)
+        for page_num, blocks in by_page.items():
+            application.add_page(page_num, blocks)
+        return application.result()
 
-    def _prepare_fields(self, fields: List[Any]) -> List[Dict[str, Any]]:
-        """Convierte fields a diccionarios."""
-        return [f if isinstance(f, dict) else f.model_dump() for f in (fields or [])]
+    def begin(self, template, *, include_debug: bool = False) -> "PageApplication":
+        """
+        Aplicación incremental: las páginas se agregan a medida que se extraen.
+        `template`: Template o CompiledTemplate (ver TemplateEngine.compiled).
+        """
+        return PageApplication(self, compile_template(template), include_debug)
 
-    def _group_blocks_by_page(self, pdf_text_blocks: List[Dict[str, Any]]) -> Tuple:
+    def _group_blocks_by_page(self, pdf_text_blocks: BlockTable) -> Tuple:
         """Agrupa bloques por página y calcula tamaños."""
-        by_page = {}
+        by_page = pdf_text_blocks.by_page()
         page_size = {}
-        
-        for block in pdf_text_blocks:
-            page_num = int(block.get("page", 1))
-            by_page.setdefault(page_num, []).append(block)
-            
-            pw = block.get("page_width")
-            ph = block.get("page_height")
-            if pw and ph:
-                page_size[page_num] = (float(pw), float(ph))
-        
-        # Fallback para páginas sin tamaño
-        for page_num, blocks in by_page.items():
-            if page_num not in page_size:
-                max_x = max((b["coordinates"][2] for b in blocks), default=600.0)
-                max_y = max((b["coordinates"][3] for b in blocks), default=800.0)
-                page_size[page_num] = (max_x, max_y)
-        
-        return by_page, page_size
 
-    def _process_pages(self, boxes, by_page, page_size, pages_meta, meta, include_debug):
-        """Procesa todas las páginas y extrae texto de boxes."""
-        T_by_page = {}
-        anchors_debug = {}
-        box_text_cache = {}
-        boxes_debug = {}
-
-        # Calcular transformaciones por página
         for page_num, blocks in by_page.items():
-            T_by_page[page_num] = self._calculate_page_transform(
-                page_num, blocks, pages_meta, page_size, meta, anchors_debug, include_debug
-            )
-
-        # Extraer texto de cada box
-        for box in boxes:
-            page_num = int(box.get("page", 1))
-            T = T_by_page.get(page_num, self._get_fallback_transform(page_num, page_size, meta))
-            
-            # Transformar box y extraer texto
-            pdf_rect = transform_box(T, box)
-            text = self._extract_text_from_rect(pdf_rect, by_page.get(page_num, []))
-            box_text_cache[box["id"]] = text
-            
-            if include_debug:
-                boxes_debug[box["id"]] = {
-                    "box_name": box.get("name"),
-                    "page": page_num,
-                    "rect_pdf": pdf_rect,
-                    "text_preview": text[:300]
-                }
-
-        debug_data = {
-            "anchors": anchors_debug,
-            "transforms": {p: T.tolist() for p, T in T_by_page.items()},
-            "boxes": boxes_debug,
-        }
+            # Tamaño de la última fila que lo trae
+            known = np.flatnonzero(np.all(np.nan_to_num(blocks.page_size) != 0, axis=1))
+            if len(known):
+                pw, ph = blocks.page_size[known[-1]].tolist()
+                page_size[page_num] = (pw, ph)
+            else:
+                # Fallback para páginas sin tamaño
+                page_size[page_num] = (float(blocks.coords[:, 2].max()), float(blocks.coords[:, 3].max()))
 
-        return box_text_cache, debug_data
+        return by_page, page_size
 
-    def _calculate_page_transform(self, page_num, blocks, pages_meta, page_size, meta, anchors_debug, include_debug):
+    def _calculate_page_transform(self, page_num, blocks, template: CompiledTemplate, page_size,
+                                  anchors_debug, include_debug):
         """Calcula transformación para una página."""
-        pm = pages_meta.get(page_num, {})
-        if not pm:
-            return self._get_fallback_transform(page_num, page_size, meta)
+        if page_num not in template.page_scale:
+            return self._get_fallback_transform(page_num, page_size, template.render_size)
 
-        scale = to_pdf_scale_from_meta(pm)
+        scale = template.page_scale[page_num]
         src_points = []
         dst_points = []
         found_anchors = []
 
         # Buscar anclas
-        for anchor in (pm.get("anchors") or []):
-            result = find_anchor_Q(anchor, blocks, pm)
+        for anchor in template.anchors[page_num]:
+            result = anchor.find(blocks)
             if result is None:
-                found_anchors.append({"id": anchor.get("id"), "matched": False})
+                found_anchors.append({"id": anchor.id, "matched": False})
                 continue
                 
-            u, v, block = result
-            src_points.append((float(anchor["x"]), float(anchor["y"])))
+            u, v, _ = result
+            src_points.append(anchor.src)
             dst_points.append((u, v))
             found_anchors.append({
-                "id": anchor.get("id"),
+                "id": anchor.id,
                 "matched": True,
-                "expected": (float(anchor["x"]) * scale, float(anchor["y"]) * scale),
+                "expected": anchor.expected,
                 "found": (u, v)
             })
 
@@ -161,24 +92,30 @@ class TemplateApplier:
 
         return T
 
-    def _get_fallback_transform(self, page_num, page_size, meta):
+    def _get_fallback_transform(self, page_num, page_size, render_size):
         """Transformación fallback cuando no hay metadatos de página."""
         pw, ph = page_size.get(page_num, (600.0, 800.0))
-        rw = float(meta.get("renderWidth") or 600.0)
-        rh = float(meta.get("renderHeight") or 800.0)
+        rw, rh = render_size
         sx, sy = pw / rw, ph / rh
         return np.array([[sx, 0, 0], [0, sy, 0]], dtype=float)
 
-    def _extract_text_from_rect(self, rect, page_blocks):
-        """Extrae texto de un rectángulo en los bloques de página."""
-        inside = [block for block in page_blocks 
-                 if rect_intersects(rect, tuple(block["coordinates"]), tol=0.75)]
+    def _extract_text_from_rect(self, rect, page_blocks, words=None):
+        """
+        Extrae texto de un rectángulo en los bloques de página.
+        Con `words` (NativeWords) lo nativo se toma palabra por palabra (centro dentro
+        del rectángulo) y de los bloques sólo se usan los que no son nativos (OCR).
+        """
+        mask = rects_intersect(rect, page_blocks.coords, tol=0.75)
+        if words is None:
+            inside = page_blocks.take(mask)
+        else:
+            inside = BlockTable.concat([page_blocks.take(mask & ~page_blocks.is_source(NATIVE)),
+                                        words.lines_in_rect(rect, tol=0.75)])
         
-        if not inside:
+        if not len(inside):
             return ""
             
-        ordered_blocks = cluster_rows_and_order(inside)
-        text = "\n".join(block.get("text", "") for block in ordered_blocks).strip()
+        text = "\n".join(inside.text[i] for i in row_order(inside.coords)).strip()
         return text
 
     def _extract_fields(self, fields, box_text_cache, include_debug):
@@ -188,19 +125,18 @@ class TemplateApplier:
         field_debug = {} if include_debug else None
 
         for field in fields:
-            key = field["key"]
-            box_id = field["boxId"]
-            raw_text = box_text_cache.get(box_id, "")
+            key = field.key
+            raw_text = box_text_cache.get(field.box_id, "")
             
             # Extraer valor
             value = self._extract_field_value(field, raw_text)
             
             # Aplicar normalizadores y cast
-            value = apply_normalizers(value, field.get("normalizers"))
-            value = self._apply_cast(value, field.get("cast"))
+            value = apply_normalizers(value, field.normalizers)
+            value = self._apply_cast(value, field.cast)
             
             # Verificar requeridos
-            if field.get("required") and not value:
+            if field.required and not value:
                 missing_required.append(key)
                 
             out[key] = value
@@ -208,7 +144,7 @@ class TemplateApplier:
             if include_debug:
                 field_debug[key] = {
                     "raw_text_preview": raw_text[:200],
-                    "pattern": field.get("regex"),
+                    "pattern": field.pattern,
                     "matched_value": value
                 }
 
@@ -219,19 +155,17 @@ class TemplateApplier:
             
         return result
 
-    def _extract_field_value(self, field, raw_text):
+    def _extract_field_value(self, field: CompiledField, raw_text):
         """Extrae valor de un campo usando regex y estrategias alternativas."""
-        pattern = field.get("regex")
-        if not pattern:
+        if not field.pattern:
             return raw_text
 
-        # Estrategia principal: regex
-        value = extract_with_regex(raw_text, pattern, case_sensitive=True)
+        # Estrategia principal: regex (ya compilado; inválido => vacío)
+        value = extract_with_regex(raw_text, field.regex) if field.regex is not None else ""
         
         # Estrategia alternativa para campos de monto
-        if not value and field["key"] in ["subtotal", "iva_21", "percep_iibb", "total"]:
-            label_pattern = pattern.split('(')[0].rstrip('\\s*')
-            value = extract_value_below_label(raw_text, label_pattern)
+        if not value and field.label is not None:
+            value = extract_value_below_label(raw_text, field.label)
             
         return value
 
@@ -248,4 +182,73 @@ class TemplateApplier:
         except (ValueError, TypeError):
             pass
             
-        return value
\ No newline at end of file
+        return value
+
+
+class PageApplication:
+    """
+    Aplicación de una plantilla página por página. Cada página calcula su
+    transformación (anclas) y el texto de sus boxes al agregarse, así no hace
+    falta retener los bloques de todo el documento. Volver a agregar una página
+    reemplaza lo calculado para ella (p. ej. tras re-extraerla con más OCR).
+    `words` (NativeWords de la página, native_mode="words") da boxes a nivel palabra.
+    Sin debug sólo se leen los boxes que usa algún campo.
+    """
+
+    def __init__(self, applier: TemplateApplier, template: CompiledTemplate, include_debug: bool):
+        self._applier = applier
+        self._template = template
+        self._include_debug = include_debug
+        self._boxes_by_page = template.boxes_by_page if include_debug else template.read_boxes_by_page
+
+        self._T_by_page = {}
+        self._anchors_debug = {}
+        self._box_text = {}
+        self._boxes_debug = {}
+
+    def add_page(self, page_num: int, blocks: BlockTable, words=None) -> None:
+        self._anchors_debug.pop(page_num, None)
+        self._T_by_page.pop(page_num, None)
+        if not len(blocks):
+            return  # sus boxes se resuelven con la transformación fallback en result()
+        _, page_size = self._applier._group_blocks_by_page(blocks)
+        T = self._applier._calculate_page_transform(
+            page_num, blocks, self._template, page_size,
+            self._anchors_debug, self._include_debug
+        )
+        self._T_by_page[page_num] = T
+        for box in self._boxes_by_page.get(page_num, []):
+            self._read_box(box, page_num, T, blocks, words)
+
+    def _read_box(self, box, page_num, T, page_blocks, words=None) -> None:
+        # Transformar box y extraer texto
+        pdf_rect = transform_box(T, box)
+        text = self._applier._extract_text_from_rect(pdf_rect, page_blocks, words)
+        self._box_text[box["id"]] = text
+
+        if self._include_debug:
+            self._boxes_debug[box["id"]] = {
+                "box_name": box.get("name"),
+                "page": page_num,
+                "rect_pdf": pdf_rect,
+                "text_preview": text[:300]
+            }
+
+    def result(self) -> Dict[str, Any]:
+        # Boxes de páginas sin bloques: transformación fallback y texto vacío
+        for page_num, boxes in self._boxes_by_page.items():
+            if page_num in self._T_by_page:
+                continue
+            T = self._applier._get_fallback_transform(page_num, {}, self._template.render_size)
+            for box in boxes:
+                self._read_box(box, page_num, T, BlockTable.empty())
+
+        result = self._applier._extract_fields(self._template.fields, self._box_text, self._include_debug)
+        if self._include_debug:
+            result["debug"] = {
+                "anchors": dict(sorted(self._anchors_debug.items())),
+                "transforms": {p: T.tolist() for p, T in sorted(self._T_by_page.items())},
+                "boxes": {b["id"]: self._boxes_debug[b["id"]] for b in self._template.boxes
+                          if b["id"] in self._boxes_debug},
+            }
+        return result
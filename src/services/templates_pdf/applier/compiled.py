@@ -0,0 +1,98 @@
+"""
+Plantilla lista para aplicar: todo lo que no depende del PDF se resuelve una
+sola vez (boxes/fields como dicts, meta.pages con claves int, escala por página,
+regex de anclas y de campos compilados, boxes que lee cada página).
+TemplateEngine la cachea por id + updated_at; aplicar una plantilla ya compilada
+es sólo buscar anclas y leer boxes sobre los bloques.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .anchors import CompiledAnchor
+from .extractors import compile_field_regex
+from .regions import template_ocr_regions, template_pages
+from .transforms import to_pdf_scale_from_meta
+from .types import Coordinates
+
+# Campos de monto: si el regex no matchea se busca el valor debajo del label
+AMOUNT_KEYS = ("subtotal", "iva_21", "percep_iibb", "total")
+
+
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    return obj if isinstance(obj, dict) else obj.model_dump()
+
+
+class CompiledField:
+    __slots__ = ("key", "box_id", "required", "normalizers", "cast", "pattern", "regex", "label")
+
+    def __init__(self, field: Dict[str, Any]):
+        self.key = field["key"]
+        self.box_id = field["boxId"]
+        self.required = field.get("required")
+        self.normalizers = field.get("normalizers")
+        self.cast = field.get("cast")
+        self.pattern: Optional[str] = field.get("regex")
+        # regex None con pattern => inválido (el campo queda vacío)
+        self.regex: Optional[re.Pattern] = None
+        self.label: Union[re.Pattern, str, None] = None
+        if not self.pattern:
+            return
+        try:
+            self.regex = compile_field_regex(self.pattern, case_sensitive=True)
+        except re.error:
+            pass
+        if self.key in AMOUNT_KEYS:
+            label_pattern = self.pattern.split('(')[0].rstrip('\\s*')
+            try:
+                self.label = re.compile(label_pattern, re.IGNORECASE)
+            except re.error:
+                self.label = label_pattern  # falla al usarse, como antes
+
+
+class CompiledTemplate:
+    def __init__(self, template, version: Optional[str] = None):
+        self.id = template.id
+        self.version = version if version is not None else str(template.updated_at)
+        self.template = template
+        self.meta: Dict[str, Any] = template.meta or {}
+        self.pages_meta: Dict[int, Dict[str, Any]] = {
+            int(k): v for k, v in (self.meta.get("pages") or {}).items()
+        }
+        # Escala plantilla -> PDF y anclas de cada página con meta
+        self.page_scale: Dict[int, float] = {}
+        self.anchors: Dict[int, List[CompiledAnchor]] = {}
+        for page_num, pm in self.pages_meta.items():
+            if not pm:
+                continue
+            scale = to_pdf_scale_from_meta(pm)
+            self.page_scale[page_num] = scale
+            self.anchors[page_num] = [CompiledAnchor(a, scale) for a in (pm.get("anchors") or [])]
+        # Tamaño de render global (transformación fallback de páginas sin meta)
+        self.render_size: Tuple[float, float] = (float(self.meta.get("renderWidth") or 600.0),
+                                                 float(self.meta.get("renderHeight") or 800.0))
+
+        self.boxes: List[Dict[str, Any]] = [_as_dict(b) for b in (template.boxes or [])]
+        self.fields: List[CompiledField] = [CompiledField(_as_dict(f)) for f in (template.fields or [])]
+        self.boxes_by_page: Dict[int, List[Dict[str, Any]]] = {}
+        for box in self.boxes:
+            self.boxes_by_page.setdefault(int(box.get("page", 1)), []).append(box)
+        # Sólo los boxes que algún campo lee (sin debug el resto no se lee)
+        read_ids = {f.box_id for f in self.fields}
+        self.read_boxes_by_page: Dict[int, List[Dict[str, Any]]] = {
+            page_num: [b for b in boxes if b["id"] in read_ids]
+            for page_num, boxes in self.boxes_by_page.items()
+        }
+
+        self.pages: List[int] = template_pages(template)
+        self._regions: Dict[float, Dict[int, Optional[List[Coordinates]]]] = {}
+
+    def ocr_regions(self, margin: float = 18.0) -> Dict[int, Optional[List[Coordinates]]]:
+        """template_ocr_regions, calculado una vez por margen."""
+        regions = self._regions.get(margin)
+        if regions is None:
+            regions = self._regions[margin] = template_ocr_regions(self.template, margin=margin)
+        return regions
+
+
+def compile_template(template) -> CompiledTemplate:
+    return template if isinstance(template, CompiledTemplate) else CompiledTemplate(template)
@@ -1,16 +1,24 @@
 import re
-from typing import List
+from typing import Union
 
-def extract_with_regex(raw: str, pattern:str, *, case_sensitive: bool = True) -> str:
-    """Extrae texto usando regex. Devuelve el primer grupo no vacio"""
+AMOUNT_RE = re.compile(r'([0-9][\d,]*\.[\d]{2})')
+
+def compile_field_regex(pattern: str, *, case_sensitive: bool = True) -> re.Pattern:
+    """Compila el regex de un campo (lanza re.error si es inválido)."""
     flags = re.MULTILINE | re.DOTALL
     if not case_sensitive:
         flags |= re.IGNORECASE
-    
-    try:
-        compiled_pattern = re.compile(pattern, flags)
-    except re.error:
-        return ""
+    return re.compile(pattern, flags)
+
+def extract_with_regex(raw: str, pattern: Union[str, re.Pattern], *, case_sensitive: bool = True) -> str:
+    """Extrae texto usando regex (str o ya compilado). Devuelve el primer grupo no vacio"""
+    if isinstance(pattern, re.Pattern):
+        compiled_pattern = pattern
+    else:
+        try:
+            compiled_pattern = compile_field_regex(pattern, case_sensitive=case_sensitive)
+        except re.error:
+            return ""
     
     match = compiled_pattern.search(raw)
     if not match:
@@ -25,16 +33,18 @@ def extract_with_regex(raw: str, pattern:str, *, case_sensitive: bool = True) ->
         return match.group(0)
     return match.group(0)
 
-def extract_value_below_label(text:str, label_pattern: str) -> str:
-    """Estrategia para valores en lineas siguientes a etiquetas."""
+def extract_value_below_label(text:str, label_pattern: Union[str, re.Pattern]) -> str:
+    """Estrategia para valores en lineas siguientes a etiquetas (label sin distinguir mayúsculas)."""
     lines = text.split('\n')
+    if not isinstance(label_pattern, re.Pattern):
+        label_pattern = re.compile(label_pattern, re.IGNORECASE)
     
     for i, line in enumerate(lines):
-        if re.search(label_pattern, line, re.IGNORECASE):
+        if label_pattern.search(line):
             # Buscar en las siguientes 3 lineas
             for j in range(i + 1, min(i + 4, len(lines))):
                 next_line = lines[j].strip()
-                amount_match = re.search(r'([0-9][\d,]*\.[\d]{2})', next_line)
+                amount_match = AMOUNT_RE.search(next_line)
                 if amount_match:
                     return amount_match.group(1)
     return ""
\ No newline at end of file
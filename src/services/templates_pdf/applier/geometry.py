@@ -1,4 +1,5 @@
 from typing import Dict, Any, List, Tuple
+import numpy as np
 from .types import Coordinates
 
 def rect_intersects(a: Coordinates, b: Coordinates, tol:float = 0.5) -> bool:
@@ -8,33 +9,48 @@ def rect_intersects(a: Coordinates, b: Coordinates, tol:float = 0.5) -> bool:
     ax0 -= tol; ay0 -= tol; ax1 += tol; ay1 += tol
     return not (ax1 <= bx0 or bx1 <= ax0 or ay1 <= by0 or by1 <= ay0)
 
-def cluster_rows_and_order(blocks: List[Dict[str, Any]], row_tol: float = 14.0)-> List[Dict[str, Any]]:
-    """Agrupa bloques por filas y ordena de arriba->abajo, izquierda->derecha."""
-    if not blocks:
+def rects_intersect(a: Coordinates, coords: np.ndarray, tol: float = 0.5) -> np.ndarray:
+    """rect_intersects de `a` contra cada fila de `coords` (n, 4): máscara booleana."""
+    ax0, ay0, ax1, ay1 = a
+    ax0 -= tol; ay0 -= tol; ax1 += tol; ay1 += tol
+    bx0, by0, bx1, by1 = coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3]
+    return ~((ax1 <= bx0) | (bx1 <= ax0) | (ay1 <= by0) | (by1 <= ay0))
+
+def row_order(coords: np.ndarray, row_tol: float = 14.0) -> List[int]:
+    """Índices de las cajas `coords` (n, 4) agrupadas por filas, de arriba->abajo e izquierda->derecha."""
+    if not len(coords):
         return []
-    
+    x0s, y0s = coords[:, 0].tolist(), coords[:, 1].tolist()
+
     # Ordenar por coordenada Y
-    bs = sorted(blocks, key=lambda b: b["coordinates"][1])
-    rows: List[List[Dict[str, Any]]] = []
-    current: List[Dict[str, Any]] = [bs[0]]
-    base_y = bs[0]["coordinates"][1]
-    
-    for b in bs[1:]:
-        y0 = b["coordinates"][1]
+    bs = sorted(range(len(y0s)), key=y0s.__getitem__)
+    rows: List[List[int]] = []
+    current: List[int] = [bs[0]]
+    base_y = y0s[bs[0]]
+
+    for i in bs[1:]:
+        y0 = y0s[i]
         if abs(y0 - base_y) <= row_tol:
-            current.append(b)
+            current.append(i)
         else:
-            current.sort(key=lambda k: k["coordinates"][0])
+            current.sort(key=x0s.__getitem__)
             rows.append(current)
-            current = [b]
+            current = [i]
             base_y = y0
-    
-    current.sort(key=lambda k: k["coordinates"][0])
+
+    current.sort(key=x0s.__getitem__)
     rows.append(current)
-    rows.sort(key=lambda row: row[0]["coordinates"][1])
-    
+    rows.sort(key=lambda row: y0s[row[0]])
+
     # Aplanar la lista
-    out: List[Dict[str, Any]] = []
+    out: List[int] = []
     for r in rows:
         out.extend(r)
-    return out
\ No newline at end of file
+    return out
+
+def cluster_rows_and_order(blocks: List[Dict[str, Any]], row_tol: float = 14.0)-> List[Dict[str, Any]]:
+    """Agrupa bloques por filas y ordena de arriba->abajo, izquierda->derecha."""
+    if not blocks:
+        return []
+    coords = np.array([b["coordinates"] for b in blocks], dtype=float)
+    return [blocks[i] for i in row_order(coords, row_tol)]
@@ -0,0 +1,62 @@
+from typing import Any, Dict, List, Optional
+
+from src.services.extractors.regions import expand_rect, merge_rects
+from .transforms import to_pdf_scale_from_meta
+from .types import Coordinates
+
+
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    return obj if isinstance(obj, dict) else obj.model_dump()
+
+
+def _scaled_rect(x: float, y: float, w: float, h: float, scale: float) -> Coordinates:
+    return (x * scale, y * scale, (x + w) * scale, (y + h) * scale)
+
+
+def template_ocr_regions(template, margin: float = 18.0) -> Dict[int, Optional[List[Coordinates]]]:
+    """
+    Zonas (coords PDF, top-left) que el applier realmente lee, por página:
+    los boxes y los searchBox de las anclas, con `margin` puntos de holgura
+    para absorber el corrimiento que luego corrigen las anclas.
+    Una página con boxes pero sin meta.pages queda en None (OCR de página completa).
+    """
+    meta = template.meta or {}
+    pages_meta = {int(k): v for k, v in (meta.get("pages") or {}).items()}
+
+    rects_by_page: Dict[int, List[Coordinates]] = {}
+    out: Dict[int, Optional[List[Coordinates]]] = {}
+
+    for box in (template.boxes or []):
+        b = _as_dict(box)
+        page = int(b.get("page", 1))
+        pm = pages_meta.get(page)
+        if not pm:
+            out[page] = None
+            continue
+        scale = to_pdf_scale_from_meta(pm)
+        rect = _scaled_rect(float(b["x"]), float(b["y"]), float(b["w"]), float(b["h"]), scale)
+        rects_by_page.setdefault(page, []).append(expand_rect(rect, margin))
+
+    for page, rects in rects_by_page.items():
+        if page in out:
+            continue
+        pm = pages_meta[page]
+        scale = to_pdf_scale_from_meta(pm)
+        for anchor in (pm.get("anchors") or []):
+            # mismo searchBox por defecto que find_anchor_Q
+            sb = anchor.get("searchBox") or {
+                "x": anchor["x"] - 50, "y": anchor["y"] - 20, "w": 100, "h": 40
+            }
+            rect = _scaled_rect(float(sb["x"]), float(sb["y"]), float(sb["w"]), float(sb["h"]), scale)
+            rects.append(expand_rect(rect, margin))
+        out[page] = merge_rects(rects)
+
+    return out
+
+
+def template_pages(template) -> List[int]:
+    """Páginas que la plantilla usa: las de sus boxes y las de meta.pages (anclas)."""
+    meta = template.meta or {}
+    pages = {int(k) for k in (meta.get("pages") or {})}
+    pages.update(int(_as_dict(b).get("page", 1)) for b in (template.boxes or []))
+    return sorted(pages)
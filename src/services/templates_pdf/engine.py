@@ -1,30 +1,124 @@
 # src/services/templates_pdf/engine.py
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
 from .repo import SQLTemplateRepository
 from .applier.applier import TemplateApplier
+from .applier.compiled import CompiledTemplate
 from .schemas import Template
 
+
+class CompiledTemplateCache:
+    """
+    CompiledTemplate por id (LRU, hasta `max_entries` plantillas). Una entrada sirve
+    sólo para la versión (updated_at) con la que se compiló: si la plantilla cambia,
+    la siguiente lectura la recompila.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_id: str, version: str) -> Optional[CompiledTemplate]:
+        with self._lock:
+            compiled = self._entries.get(template_id)
+            if compiled is None or compiled.version != version:
+                return None
+            self._entries.move_to_end(template_id)
+            return compiled
+
+    def put(self, compiled: CompiledTemplate) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[compiled.id] = compiled
+            self._entries.move_to_end(compiled.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, template_id: str) -> None:
+        with self._lock:
+            self._entries.pop(template_id, None)
+
+
+_compiled: Optional[CompiledTemplateCache] = None
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_templates() -> CompiledTemplateCache:
+    """Cache compartido por proceso (los TemplateEngine se crean por request). COMPILED_TEMPLATES_MAX (default 128)."""
+    global _compiled
+    if _compiled is None:
+        with _compiled_lock:
+            if _compiled is None:
+                _compiled = CompiledTemplateCache(int(os.getenv("COMPILED_TEMPLATES_MAX", "128")))
+    return _compiled
+
+
 class TemplateEngine:
-    def __init__(self, repo: SQLTemplateRepository):
+    def __init__(self, repo: SQLTemplateRepository, compiled: Optional[CompiledTemplateCache] = None):
         self.repo = repo
         self.applier = TemplateApplier()
+        self._compiled = compiled if compiled is not None else get_compiled_templates()
 
     def create_or_update(self, template_data: dict):
         template = Template(**template_data)
         self.repo.upsert(template)
+        self._compiled.invalidate(template.id)
         return {"status": "success", "id": template.id}
 
     def get_template(self, template_id: str):
         return self.repo.get(template_id)
 
+    def get_template_version(self, template_id: str) -> str:
+        version = self.repo.get_version(template_id)
+        if version is None:
+            raise ValueError(f"Template '{template_id}' no encontrado")
+        return version
+
+    def compiled(self, template_id: str) -> CompiledTemplate:
+        """
+        Plantilla compilada (regex, escalas, boxes por página). Sólo se consulta la
+        versión; el contenido se trae y compila cuando cambia. ValueError si no existe.
+        """
+        version = self.get_template_version(template_id)
+        compiled = self._compiled.get(template_id, version)
+        if compiled is None:
+            template = self.repo.get(template_id)
+            if not template:
+                raise ValueError(f"Template '{template_id}' no encontrado")
+            compiled = CompiledTemplate(template, version)
+            self._compiled.put(compiled)
+        return compiled
+
     def list_templates(self):
         return self.repo.list_all()
 
     def delete_template(self, template_id: str):
         self.repo.delete(template_id)
+        self._compiled.invalidate(template_id)
         return {"status": "deleted", "id": template_id}
 
-    def apply_template(self, template_id: str, pdf_text_blocks: list, *, include_debug: bool = False):
-        template = self.repo.get(template_id)
-        if not template:
-            raise ValueError(f"Template '{template_id}' no encontrado")
-        return self.applier.apply(template, pdf_text_blocks, include_debug=include_debug)
+    def _resolve(self, template: Union[str, CompiledTemplate]) -> CompiledTemplate:
+        return template if isinstance(template, CompiledTemplate) else self.compiled(template)
+
+    # Los métodos siguientes aceptan el id o una CompiledTemplate ya obtenida con compiled()
+
+    def apply_template(self, template: Union[str, CompiledTemplate], pdf_text_blocks: list, *,
+                       include_debug: bool = False):
+        return self.applier.apply(self._resolve(template), pdf_text_blocks, include_debug=include_debug)
+
+    def begin_apply(self, template: Union[str, CompiledTemplate], *, include_debug: bool = False):
+        """Aplicación incremental (página por página); ver PageApplication."""
+        return self.applier.begin(self._resolve(template), include_debug=include_debug)
+
+    def ocr_regions(self, template: Union[str, CompiledTemplate], *, margin: float = 18.0):
+        """Zonas por página (coords PDF) que la plantilla lee; ver template_ocr_regions."""
+        return self._resolve(template).ocr_regions(margin)
+
+    def template_pages(self, template: Union[str, CompiledTemplate]):
+        """Páginas (1-based) que lee la plantilla; ver template_pages."""
+        return self._resolve(template).pages
@@ -0,0 +1,222 @@
+# src/services/templates_pdf/pool.py
+"""
+Pool de conexiones DB-API (pyodbc u otro driver) thread-safe.
+
+- Las conexiones se abren a demanda hasta `max_size`; con todas en uso,
+  `connection()` espera hasta `timeout` segundos y después falla con PoolTimeout.
+- Una conexión que estuvo ociosa más de `check_idle_s` se verifica con
+  `check_query` al retirarla (si falló, p. ej. servidor reiniciado, se descarta
+  y se abre otra); las usadas hace poco no pagan ese round-trip.
+- Al devolverla se hace commit (rollback si hubo excepción), igual que
+  `with pyodbc.connect(...)`. Si el rollback falla la conexión está rota y se
+  descarta; `run` reintenta entonces la operación con otra conexión.
+- Hasta `min_size` conexiones ociosas no se cierran nunca por inactividad; las
+  demás se cierran después de `max_idle_s` sin uso.
+`connect` es cualquier callable que devuelva una conexión DB-API (p. ej.
+sqlite3.connect para probar sin SQL Server).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna conexión dentro del timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, connect: Callable[[], Any], *, min_size: int = 1, max_size: int = 5,
+                 timeout: float = 10.0, max_idle_s: float = 300.0, check_idle_s: float = 30.0,
+                 check_query: str = "SELECT 1"):
+        self._connect = connect
+        self.max_size = max(1, max_size)
+        self.min_size = min(max(0, min_size), self.max_size)
+        self.timeout = timeout
+        self.max_idle_s = max_idle_s
+        self.check_idle_s = check_idle_s
+        self.check_query = check_query
+        self._idle: List[Tuple[Any, float]] = []  # (conexión, devuelta en), la última es la más reciente
+        self._size = 0                            # abiertas o abriéndose (ociosas + en uso)
+        self._cond = threading.Condition()
+        self._local = threading.local()  # última conexión descartada por el hilo (ver run)
+        self._pid = os.getpid()
+        self._counters = {"checkouts": 0, "created": 0, "closed": 0, "health_failures": 0,
+                          "discarded": 0, "retries": 0, "timeouts": 0}
+        self._peak_in_use = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @staticmethod
+    def _close(conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn: Any) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.check_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _reset_after_fork(self) -> None:
+        # Las conexiones del proceso padre no se comparten: se olvidan sin cerrarlas
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._size = 0
+
+    def _trim_idle(self, now: float) -> List[Any]:
+        """Saca las ociosas vencidas por encima de min_size (se cierran fuera del lock)."""
+        expired = []
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle_s:
+            expired.append(self._idle.pop(0)[0])
+            self._size -= 1
+        return expired
+
+    def _record_wait(self, waited: float) -> None:
+        # Bajo el lock; incluye a los que terminan en PoolTimeout
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def _checkout(self) -> Tuple[Optional[Any], float]:
+        """
+        Retira una conexión ociosa (con el momento en que se devolvió) o reserva lugar
+        para abrir una nueva (None).
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            self._reset_after_fork()
+            expired = self._trim_idle(start)
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    self._record_wait(time.monotonic() - start)
+                    raise PoolTimeout(f"Sin conexiones libres a la base después de {self.timeout:g}s")
+                self._cond.wait(remaining)
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, 0.0
+                self._size += 1
+            self._record_wait(time.monotonic() - start)
+            self._counters["checkouts"] += 1
+            self._peak_in_use = max(self._peak_in_use, self._size - len(self._idle))
+        for c in expired:
+            self._close(c)
+        self._count("closed", len(expired))
+        return conn, returned_at
+
+    def _count(self, name: str, n: int = 1) -> None:
+        if n:
+            with self._cond:
+                self._counters[name] += n
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _acquire(self) -> Any:
+        conn, returned_at = self._checkout()
+        if conn is not None:
+            if time.monotonic() - returned_at <= self.check_idle_s or self._healthy(conn):
+                return conn
+            self._count("health_failures")
+            self._close(conn)
+        try:
+            conn = self._connect()
+        except BaseException:
+            self._release_slot()
+            raise
+        self._count("created")
+        return conn
+
+    def _release(self, conn: Any, ok: bool) -> None:
+        try:
+            if ok:
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            self._close(conn)
+            self._count("discarded")
+            self._release_slot()
+            self._local.discarded = conn
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            self._release(conn, ok=False)
+            raise
+        self._release(conn, ok=True)
+
+    def run(self, fn: Callable[[Any], T], retries: int = 1) -> T:
+        """
+        fn(conn) dentro de connection(). Si falla y la conexión quedó rota (descartada
+        al devolverla) se reintenta hasta `retries` veces con otra: así un corte de red
+        o un reinicio del servidor no se ven en las conexiones que no se verificaron.
+        fn debe ser idempotente: si la conexión se cortó durante un commit no se sabe si
+        llegó a aplicarse.
+        """
+        attempt = 0
+        while True:
+            used = []
+            self._local.discarded = None
+            try:
+                with self.connection() as conn:
+                    used.append(conn)
+                    return fn(conn)
+            except Exception:
+                broken = bool(used) and self._local.discarded is used[0]
+                if not broken or attempt >= retries:
+                    raise
+            attempt += 1
+            self._count("retries")
+
+    def close(self) -> None:
+        """Cierra las conexiones ociosas; las que están en uso vuelven al pool al liberarse."""
+        with self._cond:
+            idle = [c for c, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for c in idle:
+            self._close(c)
+        self._count("closed", len(idle))
+
+    def stats(self) -> Dict:
+        with self._cond:
+            in_use = self._size - len(self._idle)
+            checkouts = self._counters["checkouts"]
+            return {
+                **self._counters,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": in_use,
+                "peak_in_use": self._peak_in_use,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "utilization": round(in_use / self.max_size, 3),
+                "wait_avg_ms": round(self._wait_total / checkouts * 1000, 2) if checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 2),
+            }
@@ -1,25 +1,39 @@
 # REPO
-import pyodbc
 import json
-from typing import List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from .pool import ConnectionPool
 from .schemas import Box, Template, TemplateField
 
 class SQLTemplateRepository:
-    def __init__(self, connection_string: str = None):
+    def __init__(self, connection_string: str = None, pool: Optional[ConnectionPool] = None):
         self.conn_string = connection_string
+        # Sin pool explícito: uno propio con los tamaños por defecto
+        self.pool = pool if pool is not None else ConnectionPool(self._connect)
 
-    def get_connection(self):
+    def _connect(self):
+        # pyodbc sólo hace falta con la base: InMemoryTemplateRepository (workers del batch) no lo importa
+        import pyodbc
         return pyodbc.connect(self.conn_string)
 
+    # Cada operación corre con pool.run: si la conexión estaba rota (no se verifica
+    # en cada uso) se repite con otra; todas son idempotentes (MERGE, DELETE, SELECT)
+
+    def get_connection(self):
+        """Conexión del pool (context manager): commit al salir, rollback si hubo excepción."""
+        return self.pool.connection()
+
     def upsert(self, template: Template):
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            # Serializar boxes y fields como JSON
-            boxes_json = json.dumps([box.dict() for box in template.boxes])
-            fields_json = json.dumps([field.dict()
-                                     for field in template.fields])
-            meta_json = json.dumps(template.meta) if template.meta else "{}"
+        # Serializar boxes y fields como JSON
+        boxes_json = json.dumps([box.dict() for box in template.boxes])
+        fields_json = json.dumps([field.dict()
+                                 for field in template.fields])
+        meta_json = json.dumps(template.meta) if template.meta else "{}"
 
+        def op(conn):
+            cursor = conn.cursor()
             cursor.execute("""
                             MERGE cmPdfTemplates as target
                             USING (VALUES (?, ?, ?, ?, ?, GETDATE())) AS source (id, name, meta_data, boxes_data, fields_data, updated_at)
@@ -33,12 +47,14 @@ class SQLTemplateRepository:
                            """, template.id, template.name, meta_json, boxes_json, fields_json)
             conn.commit()
 
+        self.pool.run(op)
+
     def get(self, template_id: str) -> Optional[Template]:
-        with self.get_connection() as conn:
+        def op(conn):
             cursor = conn.cursor()
 
             cursor.execute("""
-                           SELECT id, name, meta_data, boxes_data, fields_data
+                           SELECT id, name, meta_data, boxes_data, fields_data, updated_at
                            FROM cmPdfTemplates
                            WHERE id = ?
             """, template_id)
@@ -58,17 +74,34 @@ class SQLTemplateRepository:
                 name=row.name,
                 meta=json.loads(row.meta_data) if row.meta_data else {},
                 boxes=boxes,
-                fields=fields
+                fields=fields,
+                updated_at=row.updated_at
             )
 
+        return self.pool.run(op)
+
+    def get_version(self, template_id: str) -> Optional[str]:
+        """Versión (updated_at) de la plantilla sin traer su contenido; None si no existe."""
+        def op(conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT updated_at FROM cmPdfTemplates WHERE id = ?", template_id)
+            row = cursor.fetchone()
+            if not row:
+                return None
+            return str(row[0])
+
+        return self.pool.run(op)
+
     def list_ids(self) -> List[str]:
-        with self.get_connection() as conn:
+        def op(conn):
             cursor = conn.cursor()
             cursor.execute("SELECT id, name FROM cmPdfTemplates ORDER BY name")
             return [row[0] for row in cursor.fetchall()]
 
+        return self.pool.run(op)
+
     def list_all(self) -> List[dict]:
-        with self.get_connection() as conn:
+        def op(conn):
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT id, name, meta_data, created_at, updated_at
@@ -86,9 +119,184 @@ class SQLTemplateRepository:
                 for row in cursor.fetchall()
             ]
 
+        return self.pool.run(op)
+
     def delete(self, template_id: str):
-        with self.get_connection() as conn:
+        def op(conn):
             cursor = conn.cursor()
             cursor.execute(
                 "DELETE FROM cmPdfTemplates WHERE id= ?", template_id)
             conn.commit()
+
+        self.pool.run(op)
+
+
+class InMemoryTemplateRepository:
+    """
+    Repositorio de sólo lectura con plantillas ya cargadas.
+    Sirve para leer cada plantilla una sola vez (p. ej. en un batch) y pasarla
+    a procesos worker sin que cada uno abra su propia conexión a la base.
+    """
+    def __init__(self, templates: List[Template]):
+        self._templates = {t.id: t for t in templates}
+
+    def get(self, template_id: str) -> Optional[Template]:
+        return self._templates.get(template_id)
+
+    def get_version(self, template_id: str) -> Optional[str]:
+        template = self._templates.get(template_id)
+        return str(template.updated_at) if template else None
+
+    def list_ids(self) -> List[str]:
+        return list(self._templates)
+
+
+class _Entry:
+    __slots__ = ("template", "version", "checked_at")
+
+    def __init__(self, template: Optional[Template], version: str, checked_at: float):
+        self.template = template      # None: sólo se conoce la versión
+        self.version = version
+        self.checked_at = checked_at  # última vez que la versión se confirmó contra la base
+
+
+class CachedTemplateRepository:
+    """
+    Cache de lectura en proceso delante de otro repositorio (LRU de hasta
+    `max_entries` plantillas).
+    - Dentro de `ttl_seconds` desde la última verificación, get/get_version no
+      tocan la base.
+    - Sin entrada, get trae la plantilla directamente (una sola consulta) y toma
+      la versión de su updated_at.
+    - Vencido el TTL se consulta sólo updated_at (get_version): si no cambió la
+      entrada se renueva; si cambió (p. ej. editada desde otro nodo) se vuelve a
+      traer la plantilla; si ya no existe se descarta.
+    - upsert/delete invalidan la entrada en el momento.
+    - ttl_seconds <= 0: cada lectura va a la base (sólo cuenta métricas).
+    Las plantillas devueltas se comparten entre requests: no modificarlas.
+    """
+
+    def __init__(self, repo, max_entries: int = 256, ttl_seconds: float = 30.0):
+        self._repo = repo
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "revalidated": 0, "stale": 0,
+                          "invalidations": 0, "evictions": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _fresh(self, template_id: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(template_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(template_id)
+            if time.monotonic() - entry.checked_at < self.ttl_seconds:
+                return entry
+            return None
+
+    def _known(self, template_id: str) -> bool:
+        with self._lock:
+            return template_id in self._entries
+
+    def _store(self, template_id: str, entry: _Entry) -> None:
+        with self._lock:
+            self._entries[template_id] = entry
+            self._entries.move_to_end(template_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _revalidate(self, template_id: str) -> Optional[str]:
+        """Consulta updated_at y actualiza la entrada; devuelve la versión (None si no existe)."""
+        version = self._repo.get_version(template_id)
+        if version is None:
+            self.invalidate(template_id, count=False)
+            return None
+        with self._lock:
+            entry = self._entries.get(template_id)
+            if entry is not None and entry.version == version:
+                entry.checked_at = time.monotonic()
+                self._counters["revalidated"] += 1
+                return version
+            if entry is not None:
+                self._counters["stale"] += 1
+        self._store(template_id, _Entry(None, version, time.monotonic()))
+        return version
+
+    def get(self, template_id: str) -> Optional[Template]:
+        entry = self._fresh(template_id)
+        # Sólo se revalida una entrada vencida; un miss en frío va directo a la plantilla
+        if entry is None and self.ttl_seconds > 0 and self._known(template_id):
+            if self._revalidate(template_id) is None:
+                return None
+            entry = self._fresh(template_id)
+        if entry is not None and entry.template is not None:
+            self._count("hits")
+            return entry.template
+
+        self._count("misses")
+        template = self._repo.get(template_id)
+        if template is None:
+            self.invalidate(template_id, count=False)
+            return None
+        # Versión recién leída con get_version si la hay (mismo formato que las próximas verificaciones)
+        version = entry.version if entry is not None else str(template.updated_at)
+        self._store(template_id, _Entry(template, version, time.monotonic()))
+        return template
+
+    def get_version(self, template_id: str) -> Optional[str]:
+        entry = self._fresh(template_id)
+        if entry is not None:
+            return entry.version
+        return self._revalidate(template_id)
+
+    def invalidate(self, template_id: str, count: bool = True) -> None:
+        with self._lock:
+            if self._entries.pop(template_id, None) is not None and count:
+                self._counters["invalidations"] += 1
+
+    def upsert(self, template: Template):
+        self._repo.upsert(template)
+        self.invalidate(template.id)
+
+    def delete(self, template_id: str):
+        self._repo.delete(template_id)
+        self.invalidate(template_id)
+
+    def list_ids(self) -> List[str]:
+        return self._repo.list_ids()
+
+    def list_all(self) -> List[dict]:
+        return self._repo.list_all()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": round(self._counters["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+_cached_repo: Optional[CachedTemplateRepository] = None
+_cached_repo_lock = threading.Lock()
+
+
+def get_cached_template_repository(make_repo: Callable[[], SQLTemplateRepository], *,
+                                   max_entries: int = 256, ttl_seconds: float = 30.0) -> CachedTemplateRepository:
+    """Repositorio cacheado compartido por proceso; `make_repo` y la configuración se usan al crearlo."""
+    global _cached_repo
+    if _cached_repo is None:
+        with _cached_repo_lock:
+            if _cached_repo is None:
+                _cached_repo = CachedTemplateRepository(make_repo(), max_entries=max_entries,
+                                                        ttl_seconds=ttl_seconds)
+    return _cached_repo
@@ -1,4 +1,5 @@
 #SCHEMA
+from datetime import datetime
 from typing import Dict, Any, List, Tuple, Optional
 from pydantic import BaseModel, Field
 
@@ -25,4 +26,5 @@ class Template(BaseModel):
     name: str
     boxes: List[Box] = Field(default_factory=list)
     fields: List[TemplateField] = Field(default_factory=list)
-    meta: Dict[str, Any] = Field(default_factory=dict)
\ No newline at end of file
+    meta: Dict[str, Any] = Field(default_factory=dict)
+    updated_at: Optional[datetime] = None
\ No newline at end of file
@@ -1,26 +1,140 @@
+import hashlib
 import os
 import tempfile
 import time
+import zipfile
+from typing import List, NamedTuple, Optional, Tuple, Union
 from fastapi import UploadFile, HTTPException
 
+CHUNK_SIZE = 1024 * 1024
+
+
+class StoredUpload(NamedTuple):
+    """PDF recibido: en disco (path) o en memoria (data), con su SHA-256 y tamaño."""
+    path: Optional[str]
+    data: Optional[bytearray]
+    sha256: str
+    size: int
+
+    @property
+    def source(self) -> Union[str, memoryview]:
+        """Lo que recibe PdfProcessor: la ruta o los bytes (sin copiarlos)."""
+        return self.path if self.path is not None else memoryview(self.data)
+
+
 class Uploads:
-    """Servicio para manejar archivos temporales subidos."""
-    def save_temp_pdf(self, file: UploadFile) -> str:
+    """
+    Servicio para manejar archivos temporales subidos.
+    - max_bytes: tamaño máximo de un PDF (413 si se supera); None = sin límite.
+    - in_memory_max_bytes: los PDFs de hasta ese tamaño se abren desde memoria
+      sin archivo temporal (0 = siempre a disco).
+    """
+    def __init__(self, max_bytes: Optional[int] = None, in_memory_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.in_memory_max_bytes = in_memory_max_bytes
+
+    def receive_pdf(self, file: UploadFile, *, allow_memory: bool = True) -> StoredUpload:
         """
-        Valida que el archivo sea PDF y lo guarda como archivo temporal.
-        Devuelve la ruta del archivo temporal.
+        Valida que el archivo sea PDF y lo lee por bloques calculando el SHA-256.
+        Se queda en memoria mientras no supere in_memory_max_bytes; si lo supera
+        (o allow_memory=False) se vuelca a un archivo temporal y sigue a disco.
         """
-        if not file.filename.lower().endswith(".pdf"):
+        if not (file.filename or "").lower().endswith(".pdf"):
             raise HTTPException(status_code=400, detail="El archivo debe ser un PDF")
 
+        limit = self.in_memory_max_bytes if allow_memory else 0
+        h = hashlib.sha256()
+        size = 0
+        buf: Optional[bytearray] = bytearray() if limit > 0 else None
+        tmp = None
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                content = file.file.read()  # importante: usar file.file.read() en lugar de await
-                tmp.write(content)
-                return tmp.name
+            # importante: usar file.file (sync) en lugar de await file.read()
+            for chunk in iter(lambda: file.file.read(CHUNK_SIZE), b""):
+                size += len(chunk)
+                if self.max_bytes is not None and size > self.max_bytes:
+                    raise HTTPException(status_code=413,
+                                        detail=f"El PDF supera el máximo de {self.max_bytes // (1024 * 1024)} MB")
+                h.update(chunk)
+                if buf is not None and size <= limit:
+                    buf += chunk
+                    continue
+                if tmp is None:
+                    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+                    if buf:
+                        tmp.write(buf)
+                    buf = None
+                tmp.write(chunk)
+            if tmp is None and buf is None:
+                # archivo vacío o sin modo memoria
+                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+            if tmp is not None:
+                tmp.close()
+                return StoredUpload(tmp.name, None, h.hexdigest(), size)
+            return StoredUpload(None, buf, h.hexdigest(), size)
         except Exception as e:
+            if tmp is not None:
+                tmp.close()
+                self.cleanup_temp_file(tmp.name)
+            if isinstance(e, HTTPException):
+                raise
             raise HTTPException(status_code=500, detail=f"Error guardando archivo temporal: {str(e)}")
 
+    def save_temp_pdf(self, file: UploadFile) -> str:
+        """
+        Valida que el archivo sea PDF y lo guarda como archivo temporal (por bloques).
+        Devuelve la ruta del archivo temporal.
+        """
+        return self.receive_pdf(file, allow_memory=False).path
+
+    def release(self, upload: StoredUpload) -> None:
+        """Libera el archivo temporal del upload (si quedó en disco)."""
+        if upload.path is not None:
+            self.cleanup_temp_file(upload.path)
+
+    def _too_big(self, filename: str) -> HTTPException:
+        return HTTPException(status_code=413,
+                             detail=f"'{filename}' supera el máximo de {self.max_bytes // (1024 * 1024)} MB")
+
+    def save_temp_batch(self, file: UploadFile, max_files: int) -> List[Tuple[str, str]]:
+        """
+        Guarda un PDF o los PDFs de un .zip como archivos temporales.
+        Devuelve [(nombre, ruta_temporal)]; las entradas del zip que no son PDF se ignoran.
+        """
+        name = file.filename or ""
+        if name.lower().endswith(".pdf"):
+            return [(name, self.save_temp_pdf(file))]
+        if not name.lower().endswith(".zip"):
+            raise HTTPException(status_code=400, detail=f"'{name}': se esperaba un PDF o un .zip")
+
+        saved: List[Tuple[str, str]] = []
+        try:
+            with zipfile.ZipFile(file.file) as zf:
+                members = [m for m in zf.infolist()
+                           if not m.is_dir() and m.filename.lower().endswith(".pdf")]
+                if len(members) > max_files:
+                    raise HTTPException(status_code=413,
+                                        detail=f"'{name}' contiene más de {max_files} PDFs")
+                for m in members:
+                    # file_size es lo que declara el zip: sirve para rechazar de entrada,
+                    # pero el límite se controla con los bytes realmente escritos
+                    if self.max_bytes is not None and m.file_size > self.max_bytes:
+                        raise self._too_big(m.filename)
+                    with zf.open(m) as src, tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                        saved.append((f"{name}/{m.filename}", tmp.name))
+                        written = 0
+                        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                            written += len(chunk)
+                            if self.max_bytes is not None and written > self.max_bytes:
+                                raise self._too_big(m.filename)
+                            tmp.write(chunk)
+            return saved
+        except zipfile.BadZipFile:
+            self.cleanup_temp_files([p for _, p in saved])
+            raise HTTPException(status_code=400, detail=f"'{name}' no es un zip válido")
+        except Exception:
+            self.cleanup_temp_files([p for _, p in saved])
+            raise
+
     def cleanup_temp_file(self, path: str) -> None:
         """
         Elimina un archivo temporal con hasta 3 reintentos.
@@ -34,3 +148,7 @@ class Uploads:
                 time.sleep(0.1 * (attempt + 1))
             except Exception:
                 break
+
+    def cleanup_temp_files(self, paths: List[str]) -> None:
+        for path in paths:
+            self.cleanup_temp_file(path)
@@ -0,0 +1,72 @@
+"""
+run_batch de punta a punta: archivos repartidos en el pool de procesos, con y sin plantilla.
+"""
+import fitz
+import pytest
+
+from src.services.batchExtraction import load_templates, run_batch
+from src.services.templates_pdf.engine import TemplateEngine
+from src.services.templates_pdf.repo import InMemoryTemplateRepository
+from src.services.templates_pdf.schemas import Template
+
+TEMPLATE = Template(
+    id="fact-test", name="Factura de prueba",
+    boxes=[{"id": "b1", "x": 90, "y": 90, "w": 300, "h": 40, "page": 1}],
+    fields=[{"id": "f1", "boxId": "b1", "key": "numero", "regex": r"(\d{4}-\d+)"}],
+    meta={"pages": {"1": {"pdfWidthBase": 595, "pdfHeightBase": 842, "renderWidth": 595,
+                          "renderHeight": 842, "viewportScale": 1,
+                          "anchors": [{"id": "a1", "x": 100, "y": 100, "pattern": "FACTURA", "kind": "text"}]}}},
+)
+
+
+def write_invoice(path, numero: str) -> str:
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((100, 112), f"FACTURA {numero}", fontsize=12)
+    # Texto suficiente para que el gate no pida OCR (densidad de caracteres nativos)
+    for i in range(12):
+        page.insert_text((60, 200 + 20 * i), f"Item {i + 1}: servicio de mantenimiento mensual", fontsize=10)
+    doc.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def items(tmp_path):
+    return [{"filename": f"f{i}.pdf", "path": write_invoice(tmp_path / f"f{i}.pdf", f"0001-00{i}"),
+             "plantilla": "fact-test"} for i in range(3)]
+
+
+def test_batch_with_template_runs_in_process_pool(items):
+    templates, missing = load_templates(TemplateEngine(InMemoryTemplateRepository([TEMPLATE])),
+                                        ["fact-test", "no-existe"])
+    assert set(missing) == {"no-existe"}
+    results = run_batch(items, templates, workers=2)
+    assert [r["status"] for r in results] == ["ok"] * len(items), results
+    for i, r in enumerate(results):
+        assert r["filename"] == f"f{i}.pdf"
+        assert r["result"]["template_based_extraction"]["values"]["numero"] == f"0001-00{i}"
+
+
+def test_batch_without_template(items):
+    for item in items:
+        item["plantilla"] = None
+    results = run_batch(items, InMemoryTemplateRepository([]), workers=2)
+    ok = sum(1 for r in results if r["status"] == "ok")
+    assert ok == len(results) == len(items)
+    for item, r in zip(items, results):
+        assert r["filename"] == item["filename"]
+        assert r["result"]["total_pages"] == 1
+        assert "FACTURA" in r["result"]["pages"][0]["text"]
+
+
+def test_batch_keeps_failed_items_in_place(items, tmp_path):
+    broken = tmp_path / "roto.pdf"
+    broken.write_bytes(b"no es un pdf")
+    items.insert(1, {"filename": "roto.pdf", "path": str(broken), "plantilla": None})
+    items.append({"filename": "sin-plantilla.pdf", "path": items[0]["path"], "plantilla": "no-existe",
+                  "error": "Template 'no-existe' no encontrado"})
+    templates, _ = load_templates(TemplateEngine(InMemoryTemplateRepository([TEMPLATE])), ["fact-test"])
+    results = run_batch(items, templates, workers=2)
+    assert [r["filename"] for r in results] == [i["filename"] for i in items]
+    assert [r["status"] for r in results] == ["ok", "error", "ok", "ok", "error"]
+    assert results[-1]["error"] == "Template 'no-existe' no encontrado"
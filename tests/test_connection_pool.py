@@ -0,0 +1,173 @@
+"""
+ConnectionPool contra un driver DB-API local: sqlite3 (archivo temporal) con
+conexiones que se pueden "cortar" para simular un reinicio del servidor.
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src.services.templates_pdf.pool import ConnectionPool, PoolTimeout
+
+
+class FlakyConnection:
+    """Conexión sqlite3 que, cortada, falla en toda operación (como un link caído)."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.broken = False
+
+    def _check(self):
+        if self.broken:
+            raise sqlite3.OperationalError("communication link failure")
+
+    def cursor(self):
+        self._check()
+        return self._conn.cursor()
+
+    def execute(self, *args):
+        self._check()
+        return self._conn.execute(*args)
+
+    def commit(self):
+        self._check()
+        self._conn.commit()
+
+    def rollback(self):
+        self._check()
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class FlakyDriver:
+    def __init__(self, path: str):
+        self.path = path
+        self.connections = []
+
+    def connect(self) -> FlakyConnection:
+        conn = FlakyConnection(self.path)
+        self.connections.append(conn)
+        return conn
+
+    def cut_all(self):
+        for conn in self.connections:
+            conn.broken = True
+
+
+@pytest.fixture
+def driver(tmp_path):
+    driver = FlakyDriver(str(tmp_path / "db.sqlite"))
+    conn = driver.connect()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.close()
+    driver.connections.clear()
+    return driver
+
+
+def count_rows(pool: ConnectionPool) -> int:
+    return pool.run(lambda conn: conn.execute("SELECT COUNT(*) FROM t").fetchone()[0])
+
+
+def test_reuses_connections(driver):
+    pool = ConnectionPool(driver.connect, max_size=3)
+    for i in range(10):
+        pool.run(lambda conn: conn.execute("INSERT INTO t VALUES (?)", (i,)))
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["checkouts"] == 10
+    assert stats["idle"] == 1 and stats["in_use"] == 0
+
+
+def test_commit_on_success_rollback_on_error(driver):
+    pool = ConnectionPool(driver.connect)
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("falla a mitad de la operación")
+    assert count_rows(pool) == 1
+    assert pool.stats()["discarded"] == 0
+
+
+def test_never_exceeds_max_size(driver):
+    pool = ConnectionPool(driver.connect, max_size=3, timeout=30)
+    errors = []
+
+    def work(i):
+        try:
+            with pool.connection() as conn:
+                conn.execute("INSERT INTO t VALUES (?)", (i,))
+                time.sleep(0.01)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert count_rows(pool) == 20
+    stats = pool.stats()
+    assert len(driver.connections) <= 3
+    assert stats["peak_in_use"] <= 3
+    assert stats["size"] <= 3
+
+
+def test_recently_used_connection_skips_health_check_and_retries(driver):
+    pool = ConnectionPool(driver.connect, check_idle_s=60)
+    count_rows(pool)
+    driver.cut_all()
+    # Sin SELECT 1 previo: la operación falla, la conexión se descarta y run reintenta
+    assert count_rows(pool) == 0
+    stats = pool.stats()
+    assert stats["health_failures"] == 0
+    assert stats["discarded"] == 1
+    assert stats["retries"] == 1
+    assert stats["created"] == 2
+
+
+def test_idle_connection_is_checked_and_replaced(driver):
+    pool = ConnectionPool(driver.connect, check_idle_s=0)
+    count_rows(pool)
+    driver.cut_all()
+    assert count_rows(pool) == 0
+    stats = pool.stats()
+    assert stats["health_failures"] == 1
+    assert stats["retries"] == 0
+    assert stats["created"] == 2
+
+
+def test_errors_on_healthy_connection_are_not_retried(driver):
+    pool = ConnectionPool(driver.connect)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.run(lambda conn: conn.execute("SELECT * FROM no_existe"))
+    assert pool.stats()["retries"] == 0
+
+
+def test_timeout_is_counted_in_wait_stats(driver):
+    pool = ConnectionPool(driver.connect, max_size=1, timeout=0.2)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["wait_max_ms"] >= 200
+
+
+def test_idle_connections_above_min_size_are_closed(driver):
+    pool = ConnectionPool(driver.connect, min_size=1, max_size=3, max_idle_s=0.05, timeout=5)
+    with pool.connection(), pool.connection(), pool.connection():
+        pass
+    assert pool.stats()["idle"] == 3
+    time.sleep(0.1)
+    count_rows(pool)
+    stats = pool.stats()
+    assert stats["closed"] == 2
+    assert stats["size"] == 1
@@ -0,0 +1,47 @@
+"""
+classify_page con texto nativo real: una fuente sin /ToUnicode da texto basura (CIDs
+crudos con TEXT_FLAGS) y tiene que mandar la página a OCR.
+"""
+import fitz
+
+from src.services.extractors.native_text import native_page
+from src.services.extractors.ocr_gate import classify_page
+
+LINE = "Factura B 0001-00001234 Total $ 1.234,56"
+
+
+def make_page(without_to_unicode: bool) -> "fitz.Page":
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    # Fuente embebida como Type0 Identity-H (CIDs): sin /ToUnicode los códigos no dicen nada
+    page.insert_font(fontname="F0", fontbuffer=fitz.Font("cour").buffer)
+    for i in range(20):
+        page.insert_text((40, 60 + 30 * i), LINE, fontname="F0", fontsize=11)
+    if without_to_unicode:
+        for font in page.get_fonts():
+            doc.xref_set_key(font[0], "ToUnicode", "null")
+    return fitz.open("pdf", doc.tobytes(garbage=3))[0]
+
+
+def decide(page: "fitz.Page"):
+    native = native_page(page)
+    return classify_page(page, native.text(), missing_unicode=native.missing_unicode())
+
+
+def test_font_without_to_unicode_goes_to_ocr():
+    page = make_page(without_to_unicode=True)
+    assert "Factura" not in native_page(page).text()  # texto basura, sin U+FFFD
+    assert "\ufffd" not in native_page(page).text()
+    decision = decide(page)
+    assert decision["ocr"] is True
+    assert decision["reason"] == "missing_unicode"
+    assert decision["signals"]["missing_unicode_ratio"] > 0.5
+
+
+def test_font_with_to_unicode_keeps_native_text():
+    page = make_page(without_to_unicode=False)
+    assert "Factura" in native_page(page).text()
+    assert native_page(page).missing_unicode() == 0
+    decision = decide(page)
+    assert decision["ocr"] is False
+    assert decision["reason"] == "native_text_ok"
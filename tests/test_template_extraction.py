@@ -0,0 +1,102 @@
+"""
+run_template_extraction sobre PDFs escaneados con OCR por regiones: los totales por
+proveedor tienen que salir aunque estén fuera de los boxes de la plantilla.
+Tesseract se reemplaza por un OCR que "lee" el texto del PDF original dentro del área
+rasterizada (página completa o recorte), así se ve exactamente qué se OCReó.
+"""
+import functools
+
+import fitz
+import pytest
+
+from src.services.extractors import ocr_text
+from src.services.extractors.block_table import BlockTable, OCR
+from src.services.pageExtractorFactory import build_pdf_processor
+from src.services.templateExtraction import run_template_extraction
+from src.services.templates_pdf.engine import TemplateEngine
+from src.services.templates_pdf.repo import InMemoryTemplateRepository
+from src.services.templates_pdf.schemas import Template
+
+TEMPLATE = Template(
+    id="fact-guerrini", name="Factura Guerrini",
+    boxes=[{"id": "b1", "x": 90, "y": 90, "w": 300, "h": 40, "page": 1}],
+    fields=[{"id": "f1", "boxId": "b1", "key": "numero", "regex": r"(\d{4}-\d+)"}],
+    meta={"pages": {"1": {"pdfWidthBase": 595, "pdfHeightBase": 842, "renderWidth": 595,
+                          "renderHeight": 842, "viewportScale": 1,
+                          "anchors": [{"id": "a1", "x": 100, "y": 100, "pattern": "FACTURA", "kind": "text"}]}}},
+)
+
+HEADER = [(100, 112, "FACTURA 0001-123")]
+TOTALS = [(300, 600, "Subtotal"), (450, 600, "1.000,00"),
+          (300, 630, "IVA 21%"), (450, 630, "210,00"),
+          (300, 660, "Total"), (450, 660, "1.210,00")]
+
+
+def scanned_pdf(tmp_path, pages):
+    """PDF con cada página como imagen (sin texto nativo) y el texto original por página."""
+    truth, scanned = fitz.open(), fitz.open()
+    for lines in pages:
+        page = truth.new_page(width=595, height=842)
+        for x, y, text in lines:
+            page.insert_text((x, y), text, fontsize=11)
+        scanned.new_page(width=595, height=842).insert_image(page.rect, pixmap=page.get_pixmap(dpi=72))
+    path = tmp_path / "scan.pdf"
+    scanned.save(str(path))
+    words = {}
+    for num, page in enumerate(truth, start=1):
+        rows = [b for b in page.get_text("blocks") if b[6] == 0]
+        words[num] = BlockTable.build([b[:4] for b in rows], [b[4].strip() for b in rows],
+                                      page=num, conf=95.0, source=OCR, kind="line")
+    return str(path), words
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    monkeypatch.setenv("OCR_CACHE_ENABLED", "0")
+    truth = {}
+    ocr_calls = []
+
+    def ocr_raster(raster, page_num, lang, min_conf, first_id=0):
+        x0, y0 = raster.origin
+        clip = fitz.Rect(x0, y0, x0 + raster.width / raster.scale, y0 + raster.height / raster.scale)
+        blocks = truth[page_num]
+        inside = [i for i, (bx0, by0, bx1, by1) in enumerate(blocks.coords.tolist())
+                  if clip.contains(fitz.Point((bx0 + bx1) / 2, (by0 + by1) / 2))]
+        ocr_calls.append((page_num, clip.contains(fitz.Rect(0, 0, 595, 842))))  # ¿página completa?
+        found = blocks.take(inside)
+        return "\n".join(found.text), found, 1.0, False
+
+    monkeypatch.setattr(ocr_text, "_ocr_raster", ocr_raster)
+    return truth, ocr_calls
+
+
+def extract(path):
+    return run_template_extraction(
+        path, TEMPLATE.id, build_pdf_processor(workers=1),
+        TemplateEngine(InMemoryTemplateRepository([TEMPLATE])),
+        region_pdf_factory=functools.partial(build_pdf_processor, workers=1),
+    )[0]
+
+
+def test_totals_survive_region_ocr_on_scanned_page(tmp_path, fake_ocr):
+    truth, ocr_calls = fake_ocr
+    path, words = scanned_pdf(tmp_path, [HEADER + TOTALS])
+    truth.update(words)
+    values = extract(path)["template_based_extraction"]["values"]
+    assert values["numero"] == "0001-123"
+    assert values.get("subtotal") and values.get("total")
+    # La página de la plantilla también es la de totales: una sola pasada de página completa
+    assert ocr_calls == [(1, True)]
+
+
+def test_last_page_added_for_totals_gets_full_page_ocr(tmp_path, fake_ocr):
+    truth, ocr_calls = fake_ocr
+    # Plantilla sólo en la página 1; los totales en la última (3), la 2 no se extrae
+    path, words = scanned_pdf(tmp_path, [HEADER, [(100, 112, "Detalle")], TOTALS])
+    truth.update(words)
+    result = extract(path)
+    assert (result["total_pages"], result["extracted_pages"]) == (3, 2)
+    values = result["template_based_extraction"]["values"]
+    assert values["numero"] == "0001-123"
+    assert values.get("subtotal") and values.get("total")
+    assert sorted(ocr_calls) == [(1, False), (3, True)]